@@ -0,0 +1,40 @@
+"""add scans_recorded counter to campaigns
+
+Revision ID: 5b1f0c7e9a21
+Revises: d28ca03a8465
+Create Date: 2025-07-20 10:12:41.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "5b1f0c7e9a21"
+down_revision: Union[str, None] = "d28ca03a8465"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column(
+        "campaigns",
+        sa.Column(
+            "scans_recorded", sa.Integer(), nullable=False, server_default=sa.text("0")
+        ),
+    )
+    # backfill from the scans recorded so far
+    op.execute(
+        """
+        UPDATE campaigns
+        SET scans_recorded = (
+            SELECT count(*) FROM scan_events
+            WHERE scan_events.campaign_id = campaigns.campaign_id
+        )
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("campaigns", "scans_recorded")
@@ -0,0 +1,28 @@
+"""add dedupe_window_minutes to campaigns
+
+Revision ID: 8c3d4e2f6b10
+Revises: 5b1f0c7e9a21
+Create Date: 2025-07-22 14:03:55.402117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "8c3d4e2f6b10"
+down_revision: Union[str, None] = "5b1f0c7e9a21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column(
+        "campaigns",
+        sa.Column("dedupe_window_minutes", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("campaigns", "dedupe_window_minutes")
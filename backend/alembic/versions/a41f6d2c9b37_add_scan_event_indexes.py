@@ -0,0 +1,68 @@
+"""add indexes for scan_events access patterns
+
+Revision ID: a41f6d2c9b37
+Revises: 8c3d4e2f6b10
+Create Date: 2025-07-24 09:41:17.220583
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY so the
+migration does not lock writes on a live scan_events table. CONCURRENTLY
+cannot run inside a transaction, hence the autocommit block; if a build
+fails it leaves an INVALID index behind that must be dropped before
+re-running.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "a41f6d2c9b37"
+down_revision: Union[str, None] = "8c3d4e2f6b10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # campaign scan listings / exports, keyset ordered
+    (
+        "ix_scan_events_campaign_id_scanned_at",
+        "scan_events",
+        ["campaign_id", "scanned_at", "scan_event_id"],
+    ),
+    # a scanner's own scan listing, keyset ordered
+    (
+        "ix_scan_events_scanner_user_id_scanned_at",
+        "scan_events",
+        ["scanner_user_id", "scanned_at", "scan_event_id"],
+    ),
+    # duplicate-scan window lookup
+    (
+        "ix_scan_events_campaign_id_device_fingerprint",
+        "scan_events",
+        ["campaign_id", "device_fingerprint", "scanned_at"],
+    ),
+    (
+        "ix_reporting_snapshots_campaign_id_snapshot_time",
+        "reporting_snapshots",
+        ["campaign_id", "snapshot_time"],
+    ),
+    ("ix_campaigns_advertiser_id", "campaigns", ["advertiser_id"]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
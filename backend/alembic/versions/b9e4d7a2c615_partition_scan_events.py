@@ -0,0 +1,105 @@
+"""partition scan_events by month and track archives
+
+Revision ID: b9e4d7a2c615
+Revises: f3a8d1b6c052
+Create Date: 2025-07-30 09:41:27.305118
+
+On Postgres, scan_events is rebuilt as a table range-partitioned on
+scanned_at. It gets one partition per month from its oldest scan through
+SCAN_PARTITION_MONTHS_AHEAD months ahead, plus a default partition. A
+partitioned table's primary key must include the partition key, so the key
+becomes (scan_event_id, scanned_at). It no longer rejects a reused
+scan_event_id with a different scanned_at, so scan ingest looks client ids
+up before inserting. The rows are copied under an exclusive
+lock, so run this in a maintenance window. Other databases only get the
+scan_archives table.
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from festserve_api.partitions import (
+    DEFAULT_PARTITION,
+    SCAN_PARTITION_MONTHS_AHEAD,
+    create_partition_sql,
+    month_start,
+    next_month,
+)
+
+revision: str = "b9e4d7a2c615"
+down_revision: Union[str, None] = "f3a8d1b6c052"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_scan_events_campaign_id_scanned_at": "campaign_id, scanned_at, scan_event_id",
+    "ix_scan_events_scanner_user_id_scanned_at": "scanner_user_id, scanned_at, scan_event_id",
+    "ix_scan_events_campaign_id_device_fingerprint": "campaign_id, device_fingerprint, scanned_at",
+}
+
+
+def _rebuild(partitioned: bool) -> None:
+    """Copy scan_events into a new (partitioned or plain) table and swap."""
+    partition_by = " PARTITION BY RANGE (scanned_at)" if partitioned else ""
+    key = "scan_event_id, scanned_at" if partitioned else "scan_event_id"
+    op.execute("LOCK TABLE scan_events IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        f"""
+        CREATE TABLE scan_events_new (
+            scan_event_id uuid NOT NULL,
+            campaign_id uuid NOT NULL REFERENCES campaigns (campaign_id),
+            scanner_user_id uuid NOT NULL REFERENCES scanner_users (user_id),
+            scanned_at timestamp without time zone NOT NULL,
+            device_fingerprint varchar,
+            CONSTRAINT scan_events_new_pkey PRIMARY KEY ({key})
+        ){partition_by}
+        """
+    )
+    if partitioned:
+        oldest = op.get_bind().execute(sa.text("SELECT min(scanned_at) FROM scan_events")).scalar()
+        month = month_start(oldest or datetime.utcnow())
+        last = month_start(datetime.utcnow())
+        for _ in range(SCAN_PARTITION_MONTHS_AHEAD):
+            last = next_month(last)
+        while month <= last:
+            op.execute(create_partition_sql(month, parent="scan_events_new"))
+            month = next_month(month)
+        op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF scan_events_new DEFAULT")
+
+    op.execute(
+        """
+        INSERT INTO scan_events_new
+            (scan_event_id, campaign_id, scanner_user_id, scanned_at, device_fingerprint)
+        SELECT scan_event_id, campaign_id, scanner_user_id, scanned_at, device_fingerprint
+        FROM scan_events
+        """
+    )
+    op.execute("DROP TABLE scan_events")
+    op.execute("ALTER TABLE scan_events_new RENAME TO scan_events")
+    op.execute("ALTER TABLE scan_events RENAME CONSTRAINT scan_events_new_pkey TO scan_events_pkey")
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON scan_events ({columns})")
+
+
+def upgrade():
+    op.create_table(
+        "scan_archives",
+        sa.Column("partition_name", sa.String(), primary_key=True),
+        sa.Column("range_start", sa.DateTime(), nullable=False),
+        sa.Column("range_end", sa.DateTime(), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild(partitioned=True)
+
+
+def downgrade():
+    # archived months stay in their export files
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild(partitioned=False)
+    op.drop_table("scan_archives")
@@ -0,0 +1,64 @@
+"""add scan_rollups time buckets
+
+Revision ID: e7b2c5a1d904
+Revises: a41f6d2c9b37
+Create Date: 2025-07-26 11:20:48.913260
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "e7b2c5a1d904"
+down_revision: Union[str, None] = "a41f6d2c9b37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# bucket truncation per granularity: (postgres date_trunc unit, sqlite format)
+# SQLAlchemy stores SQLite DateTimes as "YYYY-MM-DD HH:MM:SS.ffffff"; the
+# backfilled strings must match exactly or later upserts add duplicate rows
+BUCKETS = {
+    "minute": ("minute", "%Y-%m-%d %H:%M:00.000000"),
+    "hour": ("hour", "%Y-%m-%d %H:00:00.000000"),
+    "day": ("day", "%Y-%m-%d 00:00:00.000000"),
+}
+
+
+def upgrade():
+    op.create_table(
+        "scan_rollups",
+        sa.Column(
+            "campaign_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("campaigns.campaign_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("granularity", sa.String(length=8), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("scan_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("campaign_id", "granularity", "bucket_start"),
+    )
+
+    # backfill from the scans already recorded
+    postgres = op.get_bind().dialect.name == "postgresql"
+    for granularity, (unit, fmt) in BUCKETS.items():
+        bucket = (
+            f"date_trunc('{unit}', scanned_at)"
+            if postgres
+            else f"strftime('{fmt}', scanned_at)"
+        )
+        op.execute(
+            f"""
+            INSERT INTO scan_rollups (campaign_id, granularity, bucket_start, scan_count)
+            SELECT campaign_id, '{granularity}', {bucket}, count(*)
+            FROM scan_events
+            GROUP BY campaign_id, {bucket}
+            """
+        )
+
+
+def downgrade():
+    op.drop_table("scan_rollups")
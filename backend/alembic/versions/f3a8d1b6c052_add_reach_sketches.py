@@ -0,0 +1,66 @@
+"""add HyperLogLog reach sketches
+
+Revision ID: f3a8d1b6c052
+Revises: e7b2c5a1d904
+Create Date: 2025-07-28 16:05:12.664019
+
+Stall/day sketches are kept per advertiser, so a stall shared by several
+advertisers never reports one advertiser's reach to another.
+
+Sketches start empty; run ``python -m festserve_api.reach rebuild`` once
+after upgrading to fold in scans recorded before this revision.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "f3a8d1b6c052"
+down_revision: Union[str, None] = "e7b2c5a1d904"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "campaign_reach",
+        sa.Column(
+            "campaign_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("campaigns.campaign_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("sketch", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "stall_daily_reach",
+        sa.Column(
+            "stall_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("stalls.stall_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "advertiser_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("advertisers.advertiser_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("sketch", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("stall_id", "advertiser_id", "day"),
+    )
+    op.add_column(
+        "reporting_snapshots",
+        sa.Column("estimated_reach", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("reporting_snapshots", "estimated_reach")
+    op.drop_table("stall_daily_reach")
+    op.drop_table("campaign_reach")
@@ -0,0 +1,166 @@
+"""
+Throughput of sync (threadpool) vs async request handlers under concurrent load.
+
+Two otherwise identical handlers load a campaign by id: one is a sync
+``def`` using a sync Session (runs on the AnyIO threadpool), the other an
+``async def`` using an AsyncSession. Both are driven in-process through
+httpx's ASGI transport with N concurrent clients.
+
+SQLite answers in microseconds, so pass --db-latency-ms to model the
+network round trip of a remote Postgres (the sync handler sleeps in its
+thread, the async one awaits), or --database-url to point both engines at
+a real Postgres.
+
+Usage (from backend/):
+    python benchmarks/bench_async_db.py --requests 2000 --concurrency 200 --db-latency-ms 50
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+from common import BenchEnv  # noqa: F401  (puts src/ on sys.path)
+
+import anyio.to_thread
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from festserve_api import models
+from festserve_api.database import Base, async_database_url
+
+
+def build_app(database_url: str, latency: float, pool_size: int):
+    # same pool size for both, so the only difference is thread vs coroutine
+    engine = create_engine(database_url, pool_size=pool_size, max_overflow=0)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    async_engine = create_async_engine(
+        async_database_url(database_url), pool_size=pool_size, max_overflow=0
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+    Base.metadata.create_all(bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    bench = FastAPI()
+
+    @bench.get("/sync/{campaign_id}")
+    def read_sync(campaign_id: uuid.UUID, db: Session = Depends(get_db)):
+        campaign = db.get(models.Campaign, campaign_id)
+        if latency:
+            time.sleep(latency)
+        return {"total_scans": campaign.scans_recorded}
+
+    @bench.get("/async/{campaign_id}")
+    async def read_async(campaign_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+        campaign = await db.get(models.Campaign, campaign_id)
+        if latency:
+            await asyncio.sleep(latency)
+        return {"total_scans": campaign.scans_recorded}
+
+    return bench, SessionLocal, async_engine
+
+
+def seed_campaign(SessionLocal) -> uuid.UUID:
+    db = SessionLocal()
+    advertiser = models.Advertiser(name="Bench", contact_email="bench@example.com", password_hash="x")
+    stall = models.Stall(
+        location_name=f"Bench {uuid.uuid4()}", latitude=0, longitude=0, date=datetime.date.today()
+    )
+    product = models.Product(name="Bench")
+    db.add_all([advertiser, stall, product])
+    db.flush()
+    campaign = models.Campaign(
+        advertiser_id=advertiser.advertiser_id,
+        stall_id=stall.stall_id,
+        product_id=product.product_id,
+        units_allocated=100,
+        start_datetime=datetime.datetime(2025, 1, 1),
+        end_datetime=datetime.datetime(2999, 1, 1),
+    )
+    db.add(campaign)
+    db.commit()
+    campaign_id = campaign.campaign_id
+    db.close()
+    return campaign_id
+
+
+async def drive(bench: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=bench)
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(path)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            while not queue.empty():
+                url = queue.get_nowait()
+                resp = await client.get(url)
+                resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+async def run(args) -> None:
+    if args.thread_limit:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = args.thread_limit
+    limiter = anyio.to_thread.current_default_thread_limiter().total_tokens
+
+    bench, SessionLocal, async_engine = build_app(
+        args.database_url, args.db_latency_ms / 1000, args.pool_size
+    )
+    campaign_id = seed_campaign(SessionLocal)
+
+    print(
+        f"requests: {args.requests}, concurrency: {args.concurrency}, "
+        f"threadpool: {limiter}, DB pool: {args.pool_size}, "
+        f"simulated DB latency: {args.db_latency_ms} ms"
+    )
+    for kind in ("sync", "async"):
+        elapsed = await drive(bench, f"/{kind}/{campaign_id}", args.requests, args.concurrency)
+        print(f"{kind:>5} handlers: {elapsed:8.3f}s  {args.requests / elapsed:10.0f} req/s")
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--db-latency-ms", type=float, default=50.0)
+    parser.add_argument("--thread-limit", type=int, default=0, help="AnyIO threadpool size (default 40)")
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="festserve-bench-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+    try:
+        asyncio.run(run(args))
+    finally:
+        if tmpdir:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Render an advertiser dashboard the old way (list campaigns, then
+/scans/count and /snapshots per campaign) against one
+/api/dashboard/summary call.
+
+Usage (from backend/):
+    python benchmarks/bench_dashboard.py --campaigns 500 --rounds 5
+"""
+import argparse
+
+from common import BenchEnv, timed
+
+from festserve_api.tasks import snapshot_all_campaigns
+
+
+def seed(env: BenchEnv, campaigns: int, scans_per_campaign: int) -> None:
+    campaign_ids = [env.campaign_id] + [
+        env.create_campaign(units_allocated=1000, location=f"Dashboard Stall {i}")
+        for i in range(campaigns - 1)
+    ]
+    scans = [
+        {"campaign_id": campaign_id}
+        for campaign_id in campaign_ids
+        for _ in range(scans_per_campaign)
+    ]
+    for offset in range(0, len(scans), 1000):
+        env.client.post(
+            "/api/scan-events/batch", json=scans[offset:offset + 1000], headers=env.scanner_headers
+        ).raise_for_status()
+    db = env.SessionLocal()
+    snapshot_all_campaigns(db)
+    db.close()
+
+
+def per_campaign_calls(env: BenchEnv, rounds: int) -> int:
+    requests = 0
+    for _ in range(rounds):
+        campaigns = env.client.get("/api/campaigns/", headers=env.advertiser_headers).json()
+        requests += 1
+        for campaign in campaigns:
+            campaign_id = campaign["campaign_id"]
+            env.client.get(
+                f"/api/campaigns/{campaign_id}/scans/count", headers=env.advertiser_headers
+            ).raise_for_status()
+            env.client.get(
+                f"/api/campaigns/{campaign_id}/snapshots", headers=env.advertiser_headers
+            ).raise_for_status()
+            requests += 2
+    return requests
+
+
+def summary_calls(env: BenchEnv, rounds: int) -> int:
+    for _ in range(rounds):
+        env.client.get("/api/dashboard/summary", headers=env.advertiser_headers).raise_for_status()
+    return rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--campaigns", type=int, default=500)
+    parser.add_argument("--scans-per-campaign", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with BenchEnv(units_allocated=1000) as env:
+        seed(env, args.campaigns, args.scans_per_campaign)
+        legacy_requests, legacy = timed(per_campaign_calls, env, args.rounds)
+        _, summary = timed(summary_calls, env, args.rounds)
+
+    print(f"campaigns: {args.campaigns}, rounds: {args.rounds}")
+    print(f"per-campaign calls: {legacy / args.rounds * 1000:9.1f} ms/dashboard  "
+          f"({legacy_requests // args.rounds} requests each)")
+    print(f"summary endpoint:   {summary / args.rounds * 1000:9.1f} ms/dashboard  (1 request)")
+    print(f"speedup:            {legacy / summary:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
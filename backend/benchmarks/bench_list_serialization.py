@@ -0,0 +1,84 @@
+"""
+CPU time to load and encode a large scan listing: the previous path (ORM
+entities validated through the response_model and encoded with stdlib
+json, as FastAPI does) against column tuples encoded by jsonenc.
+
+Usage (from backend/):
+    python benchmarks/bench_list_serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from bench_snapshots import seed
+from common import BenchEnv
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+
+from festserve_api import jsonenc, models, schemas
+
+_COLUMNS = (
+    models.ScanEvent.scan_event_id,
+    models.ScanEvent.campaign_id,
+    models.ScanEvent.scanner_user_id,
+    models.ScanEvent.scanned_at,
+    models.ScanEvent.device_fingerprint,
+)
+_FIELDS = tuple(col.key for col in _COLUMNS)
+_RESPONSE_FIELD = create_response_field(name="scans", type_=List[schemas.ScanEventRead])
+
+
+def response_model_path(db, limit: int) -> bytes:
+    rows = db.scalars(select(models.ScanEvent).limit(limit)).all()
+    content = asyncio.run(serialize_response(field=_RESPONSE_FIELD, response_content=rows))
+    return JSONResponse(content).body
+
+
+def tuple_path(db, limit: int) -> bytes:
+    rows = db.execute(select(*_COLUMNS).limit(limit)).all()
+    return jsonenc.rows_json(_FIELDS, rows)
+
+
+def cpu_per_call(env: BenchEnv, fn, rows: int, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        db = env.SessionLocal()
+        try:
+            start = time.process_time()
+            fn(db, rows)
+            elapsed = time.process_time() - start
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with BenchEnv() as env:
+        seed(env, 1, args.rows)
+        db = env.SessionLocal()
+        try:
+            assert len(tuple_path(db, args.rows)) == len(response_model_path(db, args.rows))
+        finally:
+            db.close()
+        before = cpu_per_call(env, response_model_path, args.rows, args.repeat)
+        after = cpu_per_call(env, tuple_path, args.rows, args.repeat)
+
+    encoder = "orjson" if jsonenc.orjson is not None else "stdlib json"
+    scale = 10_000 / args.rows
+    print(f"ORM + response_model + json: {before * scale * 1000:8.1f} ms CPU per 10k rows")
+    print(f"tuples + {encoder + ':':<20}{after * scale * 1000:8.1f} ms CPU per 10k rows")
+    print(f"speedup:                     {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
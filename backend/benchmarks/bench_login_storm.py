@@ -0,0 +1,100 @@
+"""
+Login storm: N scanners hit /api/auth/token at once (shift change) while
+another client keeps polling /api/healthz/. Compares bcrypt run inline on
+the event loop against the dedicated password-hash pool.
+
+Usage (from backend/):
+    python benchmarks/bench_login_storm.py --scanners 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from common import BenchEnv
+
+import httpx
+
+from festserve_api import auth, models
+from festserve_api.main import app
+
+
+async def _inline_check_password(plain_password, hashed_password):
+    # the pre-pool behaviour: bcrypt runs on the event loop thread
+    return auth.pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def seed_scanners(env: BenchEnv, count: int, password: str) -> list[str]:
+    password_hash = auth.get_password_hash(password)
+    db = env.SessionLocal()
+    names = [f"storm-{i}" for i in range(count)]
+    db.add_all(models.ScannerUser(username=name, password_hash=password_hash) for name in names)
+    db.commit()
+    db.close()
+    return names
+
+
+async def storm(names: list[str], password: str) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        done = asyncio.Event()
+        probe_latencies = []
+
+        async def login(name):
+            resp = await client.post(
+                "/api/auth/token",
+                data={"username": name, "password": password, "scope": "scanner"},
+            )
+            resp.raise_for_status()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                (await client.get("/api/healthz/")).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(name) for name in names))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    probe_latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "probe_p50_ms": statistics.median(probe_latencies) * 1000,
+        "probe_max_ms": probe_latencies[-1] * 1000,
+        "probes": len(probe_latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scanners", type=int, default=200)
+    args = parser.parse_args()
+    password = "storm-password"
+
+    with BenchEnv() as env:
+        names = seed_scanners(env, args.scanners, password)
+        pooled_check = auth.check_password
+        results = {}
+        try:
+            auth.check_password = _inline_check_password
+            results["inline"] = asyncio.run(storm(names, password))
+        finally:
+            auth.check_password = pooled_check
+        results["pool"] = asyncio.run(storm(names, password))
+
+    print(f"scanners: {args.scanners}, password-hash workers: {auth.password_executor._max_workers}")
+    for mode, r in results.items():
+        print(
+            f"{mode:>6}: storm {r['elapsed']:6.2f}s  "
+            f"healthz p50 {r['probe_p50_ms']:8.1f} ms  max {r['probe_max_ms']:8.1f} ms  "
+            f"({r['probes']} probes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
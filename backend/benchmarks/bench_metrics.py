@@ -0,0 +1,54 @@
+"""
+Per-request cost of MetricsMiddleware: drive a trivial ASGI app directly
+(no server, no HTTP parsing) with and without the middleware.
+
+Usage (from backend/):
+    python benchmarks/bench_metrics.py --requests 200000
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (puts src/ on sys.path)
+
+from festserve_api.metrics import MetricsMiddleware
+
+
+class _Route:
+    path = "/api/campaigns/{campaign_id}"
+
+
+async def bare_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/x"}, receive, send)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(drive(bare_app, args.requests))
+    wrapped = asyncio.run(drive(MetricsMiddleware(bare_app), args.requests))
+    overhead_us = (wrapped - bare) / args.requests * 1e6
+    print(f"bare app:       {bare / args.requests * 1e6:6.2f} us/request")
+    print(f"with metrics:   {wrapped / args.requests * 1e6:6.2f} us/request")
+    print(f"overhead:       {overhead_us:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Compare single-scan ingestion against the batch endpoint.
+
+Usage (from backend/):
+    python benchmarks/bench_scan_ingest.py --scans 2000 --batch-size 200
+"""
+import argparse
+
+from common import BenchEnv, timed
+
+
+def ingest_single(env: BenchEnv, scans: int) -> None:
+    for i in range(scans):
+        resp = env.client.post(
+            "/api/scan-events/",
+            json={"campaign_id": env.campaign_id, "device_fingerprint": f"fp-{i}"},
+            headers=env.scanner_headers,
+        )
+        resp.raise_for_status()
+
+
+def ingest_batch(env: BenchEnv, scans: int, batch_size: int) -> None:
+    for offset in range(0, scans, batch_size):
+        count = min(batch_size, scans - offset)
+        resp = env.client.post(
+            "/api/scan-events/batch",
+            json=[
+                {"campaign_id": env.campaign_id, "device_fingerprint": f"fp-{offset + i}"}
+                for i in range(count)
+            ],
+            headers=env.scanner_headers,
+        )
+        resp.raise_for_status()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    with BenchEnv() as env:
+        _, single = timed(ingest_single, env, args.scans)
+        _, batch = timed(ingest_batch, env, args.scans, args.batch_size)
+
+    print(f"scans: {args.scans}, batch size: {args.batch_size}")
+    print(f"single endpoint: {single:8.3f}s  {args.scans / single:10.0f} scans/s")
+    print(f"batch endpoint:  {batch:8.3f}s  {args.scans / batch:10.0f} scans/s")
+    print(f"speedup:         {single / batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
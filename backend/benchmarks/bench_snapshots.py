@@ -0,0 +1,119 @@
+"""
+Compare the original per-campaign snapshot loop (COUNT per campaign, one ORM
+insert at a time) against the set-based snapshot_all_campaigns.
+
+Usage (from backend/):
+    python benchmarks/bench_snapshots.py --campaigns 10000 --scans 1000000
+"""
+import argparse
+import uuid
+from datetime import datetime, timedelta
+
+from common import BenchEnv, timed
+
+from sqlalchemy import func, insert, select
+
+from festserve_api import models
+from festserve_api.tasks import snapshot_all_campaigns
+
+SEED_CHUNK = 50_000
+
+
+def seed(env: BenchEnv, campaigns: int, scans: int) -> None:
+    db = env.SessionLocal()
+    template = db.get(models.Campaign, uuid.UUID(env.campaign_id))
+    scanner_id = db.scalar(select(models.ScannerUser.user_id).limit(1))
+    base = datetime(2025, 1, 2)
+    campaign_ids = [uuid.uuid4() for _ in range(campaigns)]
+    per_campaign = scans // campaigns
+    db.execute(
+        insert(models.Campaign),
+        [
+            {
+                "campaign_id": campaign_id,
+                "advertiser_id": template.advertiser_id,
+                "stall_id": template.stall_id,
+                "product_id": template.product_id,
+                "units_allocated": per_campaign * 2,
+                "scans_recorded": per_campaign,
+                # distinct start keeps uq_campaign_unique_run satisfied
+                "start_datetime": base + timedelta(seconds=i),
+                "end_datetime": datetime(2999, 1, 1),
+                "status": models.CampaignStatus.active,
+            }
+            for i, campaign_id in enumerate(campaign_ids)
+        ],
+    )
+    rows = (
+        {
+            "scan_event_id": uuid.uuid4(),
+            "campaign_id": campaign_ids[i % campaigns],
+            "scanner_user_id": scanner_id,
+            "scanned_at": base + timedelta(seconds=i),
+        }
+        for i in range(per_campaign * campaigns)
+    )
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK:
+            db.execute(insert(models.ScanEvent), chunk)
+            chunk = []
+    if chunk:
+        db.execute(insert(models.ScanEvent), chunk)
+    db.commit()
+    db.close()
+
+
+def snapshot_per_campaign(env: BenchEnv) -> int:
+    """The original implementation, kept here as the baseline."""
+    db = env.SessionLocal()
+    try:
+        campaigns = db.query(models.Campaign).all()
+        for campaign in campaigns:
+            total = (
+                db.query(func.count(models.ScanEvent.scan_event_id))
+                .filter(models.ScanEvent.campaign_id == campaign.campaign_id)
+                .scalar() or 0
+            )
+            db.add(
+                models.ReportingSnapshot(
+                    campaign_id=campaign.campaign_id,
+                    snapshot_time=datetime.utcnow(),
+                    total_scans=total,
+                    remaining_units=campaign.units_allocated - total,
+                )
+            )
+        db.commit()
+        return len(campaigns)
+    finally:
+        db.close()
+
+
+def snapshot_set_based(env: BenchEnv) -> int:
+    db = env.SessionLocal()
+    try:
+        return snapshot_all_campaigns(db)
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--campaigns", type=int, default=10_000)
+    parser.add_argument("--scans", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with BenchEnv() as env:
+        _, seeding = timed(seed, env, args.campaigns, args.scans)
+        print(f"seeded {args.campaigns} campaigns / {args.scans} scans in {seeding:.1f}s")
+        legacy_count, legacy = timed(snapshot_per_campaign, env)
+        set_count, set_based = timed(snapshot_set_based, env)
+
+    print(f"per-campaign loop: {legacy:8.3f}s  ({legacy_count} snapshots)")
+    print(f"set-based:         {set_based:8.3f}s  ({set_count} snapshots)")
+    print(f"speedup:           {legacy / set_based:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
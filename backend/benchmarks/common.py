@@ -0,0 +1,129 @@
+"""
+Shared setup for the FestServe benchmark scripts.
+
+Each script runs the real FastAPI app in-process against a throwaway
+SQLite file, seeded with the standard test users and one campaign.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from festserve_api.main import app  # noqa: E402
+from festserve_api.create_users import create_users  # noqa: E402
+from festserve_api.database import Base, get_async_db, get_db  # noqa: E402
+
+
+# Seconds a writer waits for SQLite's write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = 30
+
+
+def _sqlite_wal(dbapi_connection, _):
+    # readers no longer block the writer, nor the writer readers
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+
+class BenchEnv:
+    """A seeded app + database pair for one benchmark run."""
+
+    def __init__(self, units_allocated: int = 10_000_000):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="festserve-bench-")
+        self.db_path = os.path.join(self._tmpdir.name, "bench.sqlite")
+        self.engine = create_engine(
+            f"sqlite:///{self.db_path}",
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+        )
+        event.listen(self.engine, "connect", _sqlite_wal)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        # NullPool: the TestClient may serve each request on a fresh event loop
+        self.async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{self.db_path}",
+            poolclass=NullPool,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT},
+        )
+        event.listen(self.async_engine.sync_engine, "connect", _sqlite_wal)
+        self.AsyncSessionLocal = async_sessionmaker(
+            bind=self.async_engine, autoflush=False, expire_on_commit=False
+        )
+
+        def override_get_db():
+            db = self.SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def override_get_async_db():
+            async with self.AsyncSessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        Base.metadata.create_all(bind=self.engine)
+        db = self.SessionLocal()
+        create_users(db)
+        db.close()
+
+        self.client = TestClient(app)
+        self.advertiser_headers = self.login("adv@example.com", "advpassword123", "advertiser")
+        self.scanner_headers = self.login("scanner1", "scanpassword123", "scanner")
+        self.campaign_id = self.create_campaign(units_allocated)
+
+    def login(self, username: str, password: str, scope: str) -> dict:
+        resp = self.client.post(
+            "/api/auth/token",
+            data={"username": username, "password": password, "scope": scope},
+        )
+        resp.raise_for_status()
+        return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    def create_campaign(self, units_allocated: int, location: str = "Bench Stall") -> str:
+        stall_id = self.client.post(
+            "/api/stalls/",
+            json={"location_name": location, "latitude": 0.0, "longitude": 0.0, "date": "2025-01-01"},
+        ).json()["stall_id"]
+        product_id = self.client.post(
+            "/api/products/", json={"name": "Bench Product"}
+        ).json()["product_id"]
+        resp = self.client.post(
+            "/api/campaigns/",
+            json={
+                "stall_id": stall_id,
+                "product_id": product_id,
+                "units_allocated": units_allocated,
+                "start_datetime": "2025-01-01T00:00:00",
+                "end_datetime": "2999-01-01T00:00:00",
+            },
+            headers=self.advertiser_headers,
+        )
+        resp.raise_for_status()
+        return resp.json()["campaign_id"]
+
+    def close(self) -> None:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_async_db, None)
+        self.engine.dispose()
+        self._tmpdir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def timed(fn, *args, **kwargs):
+    """Run ``fn`` once and return ``(result, elapsed_seconds)``."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
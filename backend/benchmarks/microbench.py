@@ -0,0 +1,254 @@
+"""
+Micro-benchmarks of the hot paths, with stored baselines and a regression
+gate.
+
+Each benchmark calls one function (or one in-process HTTP request) in a
+loop against a SQLite file seeded with --campaigns campaigns and --scans
+scan events. A round repeats the call until it has run for at least
+--min-round-ms, and the reported time per call is the median over --rounds
+rounds.
+
+--save writes the results as the baseline. --compare checks them against
+the baseline and exits with status 1 if any benchmark got slower by more
+than --tolerance (default 20%). The committed baseline,
+benchmarks/microbench-baseline.json, was taken with the dataset of
+``make microbench``, which CI runs on every push with a wider tolerance
+since its runners differ from the machine that saved it. Refresh it with
+``make microbench-baseline`` when a change is meant to be slower or the
+reference machine changes.
+
+Usage (from backend/):
+    python benchmarks/microbench.py --campaigns 20 --scans 20000 --save
+    python benchmarks/microbench.py --campaigns 20 --scans 20000 --compare
+    python benchmarks/microbench.py --only scan --compare --tolerance 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import uuid
+from typing import List
+
+from bench_snapshots import seed
+from common import BenchEnv
+
+import httpx
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from festserve_api import auth, models, schemas
+from festserve_api.main import app
+from festserve_api.principals import principal_cache, token_cache
+from festserve_api.response_cache import response_cache
+from festserve_api.tasks import snapshot_all_campaigns
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "microbench-baseline.json")
+
+
+def measure(fn, rounds: int, min_round: float) -> dict:
+    """Time ``fn()`` in ``rounds`` rounds of enough calls to last ``min_round``."""
+    fn()  # warm-up: imports, caches, statement compilation
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round:
+            break
+        number *= 2 if elapsed * 10 < min_round else 1 + int(min_round / max(elapsed, 1e-9))
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        "calls_per_round": number,
+        "rounds": rounds,
+        "min_us": round(min(per_call) * 1e6, 2),
+        "median_us": round(statistics.median(per_call) * 1e6, 2),
+        "stdev_us": round(statistics.stdev(per_call) * 1e6, 2) if rounds > 1 else 0.0,
+    }
+
+
+class Suite:
+    """The benchmarks, sharing one seeded database and one event loop."""
+
+    def __init__(self, env: BenchEnv, args):
+        self.env = env
+        self.args = args
+        self.loop = asyncio.new_event_loop()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://microbench"
+        )
+        self.scanner_token = env.scanner_headers["Authorization"].split()[1]
+        db = env.SessionLocal()
+        try:
+            self.rows = db.scalars(
+                select(models.ScanEvent).limit(args.serialize_rows)
+            ).all()
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self.client.aclose())
+        self.loop.close()
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def benchmarks(self) -> dict:
+        return {
+            "auth.create_access_token": self.create_access_token,
+            "auth.get_current_user[cached]": self.get_current_user_cached,
+            "auth.get_current_user[cold]": self.get_current_user_cold,
+            "create_scan_event": self.create_scan_event,
+            "campaign_scan_count[cached]": self.campaign_scan_count_cached,
+            "campaign_scan_count[uncached]": self.campaign_scan_count_uncached,
+            "tasks.snapshot_all_campaigns": self.snapshot_all_campaigns,
+            "ScanEventRead list serialization": self.serialize_scan_events,
+        }
+
+    def create_access_token(self):
+        auth.create_access_token({"sub": str(uuid.uuid4()), "role": "scanner"})
+
+    async def _current_user(self):
+        async with self.env.AsyncSessionLocal() as db:
+            return await auth.get_current_user(self.scanner_token, db)
+
+    def get_current_user_cached(self):
+        self._run(self._current_user())
+
+    def get_current_user_cold(self):
+        # JWT verification plus the user lookup, as for a first request
+        principal_cache.clear()
+        token_cache.clear()
+        self._run(self._current_user())
+
+    def create_scan_event(self):
+        resp = self._run(
+            self.client.post(
+                "/api/scan-events/",
+                json={"campaign_id": self.env.campaign_id, "device_fingerprint": uuid.uuid4().hex},
+                headers=self.env.scanner_headers,
+            )
+        )
+        assert resp.status_code in (201, 202), resp.text
+
+    def _scan_count(self):
+        resp = self._run(
+            self.client.get(
+                f"/api/campaigns/{self.env.campaign_id}/scans/count",
+                headers=self.env.advertiser_headers,
+            )
+        )
+        assert resp.status_code == 200, resp.text
+
+    def campaign_scan_count_cached(self):
+        self._scan_count()
+
+    def campaign_scan_count_uncached(self):
+        response_cache.clear()
+        self._scan_count()
+
+    def snapshot_all_campaigns(self):
+        db = self.env.SessionLocal()
+        try:
+            snapshot_all_campaigns(db)
+        finally:
+            db.close()
+
+    _scan_events = TypeAdapter(List[schemas.ScanEventRead])
+
+    def serialize_scan_events(self):
+        # what a response_model=List[ScanEventRead] route does with ORM rows
+        self._scan_events.dump_json(
+            self._scan_events.validate_python(self.rows, from_attributes=True)
+        )
+
+
+def compare(results: dict, baseline: dict, tolerance: float, stat: str) -> List[str]:
+    """Print the change per benchmark; return the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':<36}{'baseline us':>13}{'now us':>11}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<36}{'-':>13}{result[stat]:>11}{'new':>9}")
+            continue
+        change = (result[stat] - before[stat]) / before[stat]
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36}{before[stat]:>13}{result[stat]:>11}{change * 100:>+8.0f}%{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--scans", type=int, default=100_000)
+    parser.add_argument("--serialize-rows", type=int, default=1000, help="ScanEventRead list length")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-ms", type=float, default=50.0)
+    parser.add_argument("--only", help="run only benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="allowed slowdown (0.20 = 20%%)")
+    parser.add_argument("--stat", choices=("median_us", "min_us"), default="median_us")
+    args = parser.parse_args()
+    dataset = {"campaigns": args.campaigns, "scans": args.scans, "serialize_rows": args.serialize_rows}
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            parser.error(f"no baseline at {args.baseline}; run with --save first")
+        if baseline["dataset"] != dataset:
+            parser.error(f"baseline was taken on {baseline['dataset']}, not {dataset}")
+
+    results = {}
+    with BenchEnv() as env:
+        seed(env, args.campaigns, args.scans)
+        suite = Suite(env, args)
+        try:
+            for name, fn in suite.benchmarks().items():
+                if args.only and args.only not in name:
+                    continue
+                results[name] = measure(fn, args.rounds, args.min_round_ms / 1000)
+                r = results[name]
+                print(
+                    f"{name:<36}median {r['median_us']:>12} us  min {r['min_us']:>12} us"
+                    f"  ({r['rounds']} x {r['calls_per_round']} calls)"
+                )
+        finally:
+            suite.close()
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "dataset": dataset, "results": results},
+                f,
+                indent=2,
+            )
+        print(f"\nbaseline written to {args.baseline}")
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], args.tolerance, args.stat)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,24 @@
 # auth.py
 # Authentication and authorization utilities for FestServe
 
+import asyncio
 import os
 import datetime
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from festserve_api import models
-from festserve_api.database import get_db
+from festserve_api.database import get_async_db
+from festserve_api.principals import principal_cache, to_principal, token_cache
 
 
 # Secret key for JWT. In production, set via environment variable.
@@ -21,8 +26,21 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context. Hashes made with other parameters are upgraded
+# transparently on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+)
+
+# bcrypt takes 100-300 ms of CPU per check; run it on a dedicated pool,
+# sized separately from the request threadpool, so logins never block the
+# event loop or starve other sync handlers
+password_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "4")),
+    thread_name_prefix="password-hash",
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
@@ -37,34 +55,56 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_advertiser(
-    db: Session, email: str, password: str
+async def check_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the password-hash pool. Returns ``(valid, new_hash)``
+    where ``new_hash`` is set when the stored hash uses outdated parameters.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor,
+        pwd_context.verify_and_update,
+        plain_password,
+        hashed_password,
+    )
+
+
+async def _verify_and_rehash(db: AsyncSession, user, password: str):
+    valid, new_hash = await check_password(password, user.password_hash)
+    if not valid:
+        return None
+    if new_hash is not None:
+        user.password_hash = new_hash
+        await db.commit()
+    return user
+
+
+async def authenticate_advertiser(
+    db: AsyncSession, email: str, password: str
 ) -> Optional[models.Advertiser]:
-    user = (
-        db.query(models.Advertiser)
-        .filter(models.Advertiser.contact_email == email)
-        .first()
+    user = await db.scalar(
+        select(models.Advertiser)
+        .where(models.Advertiser.contact_email == email)
+        .limit(1)
     )
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
-        return None
-    return user
+    return await _verify_and_rehash(db, user, password)
 
 
-def authenticate_scanner(
-    db: Session, username: str, password: str
+async def authenticate_scanner(
+    db: AsyncSession, username: str, password: str
 ) -> Optional[models.ScannerUser]:
-    user = (
-        db.query(models.ScannerUser)
-        .filter(models.ScannerUser.username == username)
-        .first()
+    user = await db.scalar(
+        select(models.ScannerUser)
+        .where(models.ScannerUser.username == username)
+        .limit(1)
     )
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
-        return None
-    return user
+    return await _verify_and_rehash(db, user, password)
 
 
 def create_access_token(
@@ -79,8 +119,24 @@ def create_access_token(
     return token
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+def decode_access_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, memoizing the result for repeated tokens until
+    they expire. Raises JWTError for invalid or expired tokens.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            return payload
+        token_cache.invalidate(token)
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if "exp" in payload:
+        token_cache.put(token, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -88,31 +144,30 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         role: str = payload.get("role")
         if user_id is None or role is None:
             raise credentials_exception
-    except JWTError:
+        user_uuid = uuid.UUID(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
+
+    # Repeat requests from the same user are answered from the cache
+    principal = principal_cache.get((role, user_id))
+    if principal is not None:
+        return principal
+
     # Choose model based on role
     if role == "advertiser":
-        user_uuid = uuid.UUID(user_id)
-        user = (
-            db.query(models.Advertiser)
-            .filter(models.Advertiser.advertiser_id == user_uuid)
-            .first()
-        )
+        user = await db.get(models.Advertiser, user_uuid)
     else:
-        user_uuid = uuid.UUID(user_id)
-        user = (
-            db.query(models.ScannerUser)
-            .filter(models.ScannerUser.user_id == user_uuid)
-            .first()
-        )
+        user = await db.get(models.ScannerUser, user_uuid)
     if user is None:
         raise credentials_exception
-    return user
+    principal = to_principal(user)
+    principal_cache.put((role, user_id), principal)
+    return principal
 
 
 # Auth router
@@ -121,15 +176,16 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 @router.post("/token")
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Determine whether this is an advertiser or scanner login
     # Use form_data.scopes to indicate role: e.g., ["advertiser"] or ["scanner"]
     if "advertiser" in form_data.scopes:
-        user = authenticate_advertiser(db, form_data.username, form_data.password)
+        user = await authenticate_advertiser(db, form_data.username, form_data.password)
         role = "advertiser"
     else:
-        user = authenticate_scanner(db, form_data.username, form_data.password)
+        user = await authenticate_scanner(db, form_data.username, form_data.password)
         role = "scanner"
     if not user:
         raise HTTPException(
@@ -1,12 +1,22 @@
 # festserve/backend/src/festserve_api/database.py
 """
 Database connection and session management for FestServe.
-Provides SQLAlchemy engine, Base, and the get_db dependency for FastAPI.
+Provides the SQLAlchemy engines, Base, and the get_db / get_async_db
+dependencies for FastAPI. Request handlers on the hot paths use the async
+engine; Alembic, scripts and the remaining sync routes use the sync one.
 """
 import os
+from datetime import datetime, timezone
+
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from festserve_api.metrics import instrument_engine
+from festserve_api.pool import PoolMonitor, engine_options
+
 # Read the database URL from environment, with a sensible default for Docker Compose
 
 DEFAULT_DATABASE_URL = os.getenv(
@@ -21,12 +31,18 @@ DATABASE_URL = (
 )
 
 
+# Pool settings come from DB_POOL_PROFILE and friends (see festserve_api.pool)
+sync_pool_monitor = PoolMonitor("sync")
+async_pool_monitor = PoolMonitor("async")
+
 # Create the SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
+    **engine_options(DATABASE_URL, sync_pool_monitor),
 )
 
+instrument_engine(engine, "sync")
+
 # Create a configured "SessionLocal" class
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -34,9 +50,66 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL onto the matching async driver."""
+    url = make_url(url)
+    if url.get_backend_name() == "postgresql":
+        return url.set(drivername="postgresql+asyncpg").render_as_string(
+            hide_password=False
+        )
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(
+            hide_password=False
+        )
+    return url.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+
+# Async engine for request handlers (asyncpg on Postgres, aiosqlite in tests)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(ASYNC_DATABASE_URL, async_pool_monitor, is_async=True),
+)
+
+instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base class for models to inherit
 Base = declarative_base()
 
+
+def naive_utc(ts: datetime) -> datetime:
+    """Stored timestamps are naive UTC; normalise aware query params to match."""
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def dialect_insert(bind, table):
+    """
+    Return an INSERT for ``table`` built with the bind's dialect, so callers
+    can use ``on_conflict_do_nothing`` / ``on_conflict_do_update`` on both
+    Postgres and the SQLite stand-in.
+    """
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def pool_stats() -> dict:
+    """Occupancy and checkout telemetry of both engines' pools."""
+    return {
+        "sync": sync_pool_monitor.stats(engine.pool),
+        "async": async_pool_monitor.stats(async_engine.pool),
+    }
+
 # Dependency for FastAPI requests
 
 
@@ -49,3 +122,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Yield an async database session to FastAPI endpoints and close it when done.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
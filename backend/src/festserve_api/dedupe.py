@@ -0,0 +1,106 @@
+# festserve_api/dedupe.py
+"""
+In-memory front for the per-campaign duplicate-scan window.
+
+Campaigns with ``dedupe_window_minutes`` set accept one scan per device
+fingerprint per window. The cache remembers the latest accepted scan for
+each (campaign, fingerprint) pair, so a repeated scan is refused without
+touching the DB. A miss is not proof of a fresh scan (the entry may have
+been evicted, recorded by another worker or before a restart), so callers
+fall back to a DB lookup on a miss.
+
+An entry carries the window that was current when it was stored. Updating
+or deleting a campaign evicts its entries in the worker that served the
+request; other workers pick up the new window once their entries'
+SCAN_DEDUPE_TTL_SECONDS lapse.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class DedupeCache:
+    """Bounded LRU of the last accepted scan per (campaign, fingerprint)."""
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._db_duplicates = 0
+        self._evictions = 0
+
+    def seen_recently(self, campaign_id, fingerprint: str, scanned_at: datetime) -> bool:
+        """True if a scan inside the window is known without asking the DB."""
+        key = (campaign_id, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                last_seen, window, expires = entry
+                if expires <= time.monotonic():
+                    # the campaign's window may have changed meanwhile
+                    del self._entries[key]
+                elif abs(scanned_at - last_seen) < window:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True
+            return False
+
+    def record_miss(self, count: int = 1) -> None:
+        """Count lookups that had to fall back to the DB."""
+        with self._lock:
+            self._misses += count
+
+    def record(
+        self, campaign_id, fingerprint: str, scanned_at: datetime, window: timedelta
+    ) -> None:
+        """Remember an accepted (or DB-confirmed) scan under ``window``."""
+        key = (campaign_id, fingerprint)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > scanned_at:
+                scanned_at = entry[0]
+            self._entries[key] = (scanned_at, window, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def record_db_duplicate(self) -> None:
+        with self._lock:
+            self._db_duplicates += 1
+
+    def invalidate_campaign(self, campaign_id) -> None:
+        """Forget a campaign's entries, e.g. after its window changed."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == campaign_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "db_duplicates": self._db_duplicates,
+                "evictions": self._evictions,
+            }
+
+
+dedupe_cache = DedupeCache(
+    max_entries=int(os.getenv("SCAN_DEDUPE_MAX_ENTRIES", "100000")),
+    ttl=float(os.getenv("SCAN_DEDUPE_TTL_SECONDS", "60")),
+)
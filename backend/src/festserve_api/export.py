@@ -0,0 +1,290 @@
+# festserve_api/export.py
+"""
+Bulk export of scan events for analysts: Parquet, Arrow IPC stream or
+gzipped CSV.
+
+The export query runs through a server-side cursor in EXPORT_BATCH_ROWS
+chunks. Each chunk becomes one Parquet row group, Arrow record batch or
+gzip block, and its bytes are handed on at once. Memory stays at about one
+chunk whatever the export size. ``pyarrow`` is optional; without it only
+``csv`` is available.
+
+    python -m festserve_api.export out.parquet --advertiser-id ... \
+        [--campaign-id ...] [--since ...] [--until ...] [--metadata]
+"""
+import argparse
+import csv
+import io
+import os
+import uuid
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from festserve_api import models
+from festserve_api.database import SessionLocal, naive_utc
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: Parquet / Arrow exports
+    pa = None
+
+# Rows per server-side fetch, and per row group / record batch
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+    "csv": ("application/gzip", ".csv.gz"),
+}
+
+# (name, column, arrow type); uuids are exported as strings
+_SCAN_COLUMNS = [
+    ("scan_event_id", models.ScanEvent.scan_event_id, "string"),
+    ("campaign_id", models.ScanEvent.campaign_id, "string"),
+    ("scanner_user_id", models.ScanEvent.scanner_user_id, "string"),
+    ("scanned_at", models.ScanEvent.scanned_at, "timestamp"),
+    ("device_fingerprint", models.ScanEvent.device_fingerprint, "string"),
+]
+_METADATA_COLUMNS = [
+    ("advertiser_id", models.Campaign.advertiser_id, "string"),
+    ("campaign_start", models.Campaign.start_datetime, "timestamp"),
+    ("campaign_end", models.Campaign.end_datetime, "timestamp"),
+    ("stall_id", models.Campaign.stall_id, "string"),
+    ("stall_location_name", models.Stall.location_name, "string"),
+    ("stall_date", models.Stall.date, "date"),
+    ("product_id", models.Campaign.product_id, "string"),
+    ("product_name", models.Product.name, "string"),
+]
+
+
+def export_available(fmt: str) -> bool:
+    return fmt == "csv" or (fmt in EXPORT_FORMATS and pa is not None)
+
+
+def export_columns(include_metadata: bool = False) -> list:
+    return _SCAN_COLUMNS + (_METADATA_COLUMNS if include_metadata else [])
+
+
+def export_query(
+    columns: list,
+    advertiser_id=None,
+    campaign_id=None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Select:
+    """
+    Scans in (scanned_at, scan_event_id) order; ``until`` is exclusive.
+    Aware bounds are converted to naive UTC.
+    """
+    stmt = (
+        select(*(col for _, col, _ in columns))
+        .select_from(models.ScanEvent)
+        .join(models.Campaign, models.Campaign.campaign_id == models.ScanEvent.campaign_id)
+    )
+    if any(col.class_ is models.Stall for _, col, _ in columns):
+        stmt = stmt.join(models.Stall).join(models.Product)
+    if advertiser_id is not None:
+        stmt = stmt.where(models.Campaign.advertiser_id == advertiser_id)
+    if campaign_id is not None:
+        stmt = stmt.where(models.ScanEvent.campaign_id == campaign_id)
+    if since is not None:
+        stmt = stmt.where(models.ScanEvent.scanned_at >= naive_utc(since))
+    if until is not None:
+        stmt = stmt.where(models.ScanEvent.scanned_at < naive_utc(until))
+    return stmt.order_by(models.ScanEvent.scanned_at, models.ScanEvent.scan_event_id)
+
+
+class _Sink:
+    """Write-only file object; ``take()`` returns the bytes written since."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _cell(value):
+    return str(value) if isinstance(value, uuid.UUID) else value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class CsvWriter:
+    """Gzipped CSV, one gzip member per batch so bytes can leave at once."""
+
+    def __init__(self, columns: list):
+        self.columns = columns
+        self._header = True
+
+    def write(self, rows: list) -> bytes:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if self._header:
+            writer.writerow([name for name, _, _ in self.columns])
+            self._header = False
+        for row in rows:
+            writer.writerow([_csv_cell(value) for value in row])
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(buf.getvalue().encode()) + compressor.flush()
+
+    def close(self) -> bytes:
+        # an empty export still gets its header
+        return self.write([]) if self._header else b""
+
+
+def _arrow_type(kind: str):
+    if kind == "timestamp":
+        return pa.timestamp("us")
+    return pa.date32() if kind == "date" else pa.string()
+
+
+class ArrowWriter:
+    """Parquet (one row group per batch) or Arrow IPC stream."""
+
+    def __init__(self, columns: list, fmt: str):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Parquet / Arrow exports")
+        self.columns = columns
+        self.schema = pa.schema([(name, _arrow_type(kind)) for name, _, kind in columns])
+        self._sink = _Sink()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._sink, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def write(self, rows: list) -> bytes:
+        if rows:
+            arrays = [
+                pa.array([_cell(row[i]) for row in rows], type=field.type)
+                for i, field in enumerate(self.schema)
+            ]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        return self._sink.take()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.take()
+
+
+def make_writer(fmt: str, columns: list):
+    return CsvWriter(columns) if fmt == "csv" else ArrowWriter(columns, fmt)
+
+
+def iter_export(batches: Iterable[list], fmt: str, columns: list) -> Iterator[bytes]:
+    """Encode row batches incrementally, yielding bytes as they are ready."""
+    writer = make_writer(fmt, columns)
+    for rows in batches:
+        data = writer.write(rows)
+        if data:
+            yield data
+    tail = writer.close()
+    if tail:
+        yield tail
+
+
+async def stream_export(db: AsyncSession, stmt: Select, fmt: str, columns: list):
+    """Async counterpart of ``iter_export`` reading ``stmt`` chunk by chunk."""
+    writer = make_writer(fmt, columns)
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+    async for partition in result.partitions():
+        # encoding a chunk is CPU work; keep it off the event loop
+        data = await run_in_threadpool(writer.write, partition)
+        if data:
+            yield data
+    tail = await run_in_threadpool(writer.close)
+    if tail:
+        yield tail
+
+
+def export_to_file(db: Session, path: str, fmt: str, **filters) -> int:
+    """Write an export to ``path``; returns the number of rows."""
+    include_metadata = filters.pop("include_metadata", False)
+    columns = export_columns(include_metadata)
+    result = db.execute(
+        export_query(columns, **filters).execution_options(yield_per=EXPORT_BATCH_ROWS)
+    )
+    count = 0
+
+    def batches():
+        nonlocal count
+        for partition in result.partitions():
+            count += len(partition)
+            yield partition
+
+    with open(path, "wb") as out:
+        for data in iter_export(batches(), fmt, columns):
+            out.write(data)
+    return count
+
+
+def _format_for(path: str) -> str:
+    for fmt, (_, extension) in EXPORT_FORMATS.items():
+        if path.endswith(extension):
+            return fmt
+    raise SystemExit(f"cannot infer the format of {path}; pass --format")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export scan events")
+    parser.add_argument("path", help="output file (.parquet, .arrows or .csv.gz)")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("--advertiser-id", type=uuid.UUID)
+    parser.add_argument("--campaign-id", type=uuid.UUID)
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    parser.add_argument("--metadata", action="store_true", help="add campaign, stall and product columns")
+    args = parser.parse_args()
+    fmt = args.format or _format_for(args.path)
+    if not export_available(fmt):
+        raise SystemExit(f"{fmt} export needs pyarrow; install it or use --format csv")
+    db = SessionLocal()
+    try:
+        count = export_to_file(
+            db,
+            args.path,
+            fmt,
+            advertiser_id=args.advertiser_id,
+            campaign_id=args.campaign_id,
+            since=args.since,
+            until=args.until,
+            include_metadata=args.metadata,
+        )
+    finally:
+        db.close()
+    print(f"exported {count} scans to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
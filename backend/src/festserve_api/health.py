@@ -1,8 +1,42 @@
 from fastapi import APIRouter
 
+from festserve_api.database import pool_stats
+from festserve_api.dedupe import dedupe_cache
+from festserve_api.live import live_hub
+from festserve_api.principals import principal_cache, token_cache
+from festserve_api.reach import reach_tracker
+from festserve_api.response_cache import response_cache
+from festserve_api.scan_buffer import scan_buffer
+from festserve_api.scheduler import job_runner
+
 health_router = APIRouter(prefix="/healthz")
 
 
 @health_router.get("/")
 def health_check():
     return {"status": "ok"}
+
+
+def _counters(stats: dict) -> dict:
+    """Numbers only: file paths, errors and other strings stay in-process."""
+    return {
+        key: _counters(value) if isinstance(value, dict) else value
+        for key, value in stats.items()
+        if isinstance(value, (dict, int, float))
+    }
+
+
+@health_router.get("/stats")
+def component_stats():
+    # unauthenticated, so only counters and gauges are exposed
+    return _counters({
+        "scan_buffer": scan_buffer.stats(),
+        "scan_dedupe": dedupe_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "live": live_hub.stats(),
+        "response_cache": response_cache.stats(),
+        "reach": reach_tracker.stats(),
+        "scheduler": job_runner.stats(),
+        "db_pool": pool_stats(),
+    })
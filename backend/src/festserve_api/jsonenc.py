@@ -0,0 +1,46 @@
+# festserve_api/jsonenc.py
+"""
+Fast JSON encoding for large list responses.
+
+Routes that return thousands of rows select plain column tuples and encode
+them here. That skips building ORM entities and skips the
+``response_model`` validation pass. The route keeps its ``response_model``
+for the OpenAPI schema. The output is the same as Pydantic's
+``dump_json``: compact, UTF-8, ISO 8601 datetimes and hyphenated UUIDs.
+``orjson`` is optional. Without it the stdlib encoder produces the same
+bytes, more slowly.
+"""
+import json
+import uuid
+from datetime import date
+from typing import Iterable, Sequence
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is the fallback
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):  # datetimes too
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def rows_json(keys: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """A JSON array of objects, one per row, with ``keys`` as field names."""
+    return dumps([dict(zip(keys, row)) for row in rows])
+
+
+def json_response(body: bytes, headers: dict = None) -> Response:
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,159 @@
+# festserve_api/live.py
+"""
+In-process pub/sub for live campaign counters.
+
+Ingest paths call ``live_hub.publish`` after committing a counter change.
+The hub keeps only the latest counters per campaign and wakes that
+campaign's subscribers at most LIVE_MAX_UPDATES_PER_SECOND times a second,
+however fast scans arrive: intermediate values are coalesced. All
+subscribers of a campaign wait on one shared future, so an idle subscriber
+costs a suspended coroutine rather than a DB query or a poll.
+
+``publish`` is thread-safe (the scan buffer flushes from its own thread);
+subscribers live on the event loop that serves them.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class _Channel:
+    """Subscribers of one campaign on one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.subscribers = 0
+        self.changed: asyncio.Future = loop.create_future()
+        self.scheduled = False
+        self.last_fired = 0.0
+        self.version = 0
+
+
+class LiveHub:
+    def __init__(self, max_updates_per_second: float = 2.0):
+        self.min_interval = 1.0 / max_updates_per_second
+        self._latest: dict = {}
+        self._channels: dict = {}
+        self._lock = threading.Lock()
+        self._published = 0
+        self._broadcasts = 0
+
+    def latest(self, campaign_id) -> Optional[dict]:
+        with self._lock:
+            return self._latest.get(campaign_id)
+
+    def publish(self, campaign_id, scans_recorded: int, units_allocated: int) -> None:
+        """Record new counters for a campaign and schedule a broadcast."""
+        payload = {
+            "campaign_id": str(campaign_id),
+            "total_scans": scans_recorded,
+            "remaining_units": units_allocated - scans_recorded,
+        }
+        with self._lock:
+            self._published += 1
+            channel = self._channels.get(campaign_id)
+            if channel is None:
+                # nobody is listening; nothing to remember either
+                self._latest.pop(campaign_id, None)
+                return
+            self._latest[campaign_id] = payload
+            if channel.scheduled:
+                return
+            channel.scheduled = True
+        try:
+            channel.loop.call_soon_threadsafe(self._schedule, campaign_id, channel)
+        except RuntimeError:
+            # the subscribers' loop has closed; they are gone
+            with self._lock:
+                channel.scheduled = False
+
+    def _schedule(self, campaign_id, channel: _Channel) -> None:
+        delay = channel.last_fired + self.min_interval - time.monotonic()
+        if delay > 0:
+            channel.loop.call_later(delay, self._fire, campaign_id, channel)
+        else:
+            self._fire(campaign_id, channel)
+
+    def _fire(self, campaign_id, channel: _Channel) -> None:
+        with self._lock:
+            channel.scheduled = False
+            self._broadcasts += 1
+        channel.last_fired = time.monotonic()
+        channel.version += 1
+        changed, channel.changed = channel.changed, channel.loop.create_future()
+        changed.set_result(None)
+
+    @asynccontextmanager
+    async def subscribe(self, campaign_id):
+        """
+        Yield ``next_update``: ``await next_update()`` returns the latest
+        counters for ``campaign_id`` once they change.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            channel = self._channels.get(campaign_id)
+            if channel is None or channel.loop is not loop:
+                channel = self._channels[campaign_id] = _Channel(loop)
+            channel.subscribers += 1
+
+        seen = channel.version
+
+        async def next_update():
+            # a broadcast that fired while the caller was busy is not lost:
+            # the version tells it there is something newer to read
+            nonlocal seen
+            if channel.version == seen:
+                # shield: a cancelled subscriber must not cancel the shared future
+                await asyncio.shield(channel.changed)
+            seen = channel.version
+            return self.latest(campaign_id)
+
+        try:
+            yield next_update
+        finally:
+            with self._lock:
+                channel.subscribers -= 1
+                if channel.subscribers == 0 and self._channels.get(campaign_id) is channel:
+                    del self._channels[campaign_id]
+                    self._latest.pop(campaign_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "campaigns": len(self._channels),
+                "subscribers": sum(c.subscribers for c in self._channels.values()),
+                "published": self._published,
+                "broadcasts": self._broadcasts,
+                "max_updates_per_second": round(1.0 / self.min_interval, 2),
+            }
+
+
+live_hub = LiveHub(
+    max_updates_per_second=float(os.getenv("LIVE_MAX_UPDATES_PER_SECOND", "2"))
+)
+
+
+# Seconds between keep-alive comments on an idle event stream
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+
+
+def _sse(payload: dict) -> str:
+    return f"event: counters\ndata: {json.dumps(payload)}\n\n"
+
+
+async def live_events(campaign_id, initial: dict, hub: LiveHub = live_hub):
+    """Server-Sent Events: the current counters, then every coalesced update."""
+    async with hub.subscribe(campaign_id) as next_update:
+        yield _sse(initial)
+        while True:
+            try:
+                counters = await asyncio.wait_for(next_update(), LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if counters is not None:
+                yield _sse(counters)
@@ -1,29 +1,39 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 
 # from festserve_api.health import router as health_router
 from festserve_api.health import health_router
+from festserve_api.metrics import MetricsMiddleware, metrics_router, multiprocess
 from festserve_api.auth import router as auth_router
 from festserve_api.routes.campaigns import router as campaigns_router
+from festserve_api.routes.dashboard import router as dashboard_router
+from festserve_api.routes.exports import router as exports_router
 from festserve_api.routes.scan_events import router as scan_events_router
 from festserve_api.routes.stalls import router as stalls_router
 from festserve_api.routes.products import router as products_router
-from festserve_api.tasks import snapshot_all_campaigns
+from festserve_api.partitions import ensure_scan_partitions
+from festserve_api.reach import REACH_FLUSH_MINUTES, flush_reach
+from festserve_api.tasks import reconcile_scan_counters, snapshot_all_campaigns
+from festserve_api.scan_buffer import scan_buffer
+from festserve_api.scheduler import job_runner
 
 
 import os
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
 # Register API routes first
 app.include_router(health_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
 app.include_router(auth_router)
 app.include_router(stalls_router)
 app.include_router(products_router)
 app.include_router(campaigns_router)
 app.include_router(scan_events_router)
+app.include_router(dashboard_router)
+app.include_router(exports_router)
 
 
 from fastapi import Depends
@@ -48,21 +58,46 @@ app.mount(
     name="static",
 )
 
-# On startup, spin up an AsyncIO scheduler
+# Periodic jobs: scheduled in every worker, run only by the leader
+# every hour on the hour:
+job_runner.add_job(snapshot_all_campaigns, minute=0)
+# nightly full recount, in case a counter drifted from scan_events
+job_runner.add_job(reconcile_scan_counters, hour=3, minute=30)
+# keep next months' scan_events partitions ready (no-op without partitioning)
+job_runner.add_job(ensure_scan_partitions, hour=2, minute=0)
+# every worker, leader or not: persist its pending reach registers
+job_runner.add_job(flush_reach, leader_only=False, minute=f"*/{REACH_FLUSH_MINUTES}")
+
+
 @app.on_event("startup")
 async def start_snapshot_scheduler():
-    scheduler = AsyncIOScheduler()
-    
-    # every hour on the hour:
-    scheduler.add_job(snapshot_all_campaigns, "cron", minute=0)
+    job_runner.start()
+
+
+# Buffered scan ingestion: start the flush thread (drained on shutdown)
+@app.on_event("startup")
+async def start_scan_buffer():
+    if scan_buffer.enabled:
+        scan_buffer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_background_work():
+    # in this order: the buffer's last flush feeds reach registers, which
+    # the final flush_reach persists before leadership is given up
+    scan_buffer.stop()
+    job_runner.run("flush_reach")
+    job_runner.stop()
+
+
+# Multi-worker metrics: share this worker's values with the others
+@app.on_event("startup")
+async def start_metrics_store():
+    if multiprocess is not None:
+        multiprocess.start()
 
-    # during development: run once every minute
-    #scheduler.add_job(snapshot_all_campaigns, "cron", minute="*")
-    
-    scheduler.start()
 
-# (Optionally, on shutdown you can shut it down)
 @app.on_event("shutdown")
-async def shutdown_snapshot_scheduler():
-    for job in AsyncIOScheduler().get_jobs():
-        job.remove()
+async def stop_metrics_store():
+    if multiprocess is not None:
+        multiprocess.stop()
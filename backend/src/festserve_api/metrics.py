@@ -0,0 +1,319 @@
+# festserve_api/metrics.py
+"""
+Prometheus metrics: request latency per route, in-flight requests, status
+counts, scan ingest, scheduled jobs and DB statements.
+
+Metrics live in plain dicts behind one lock. Recording a request costs two
+``perf_counter`` calls and two dict updates. ``GET /api/metrics`` renders
+them in the Prometheus text format (version 0.0.4).
+
+With several workers, set METRICS_MULTIPROC_DIR to a directory shared by
+the workers and emptied at deploy. Each worker writes its values to
+``metrics-<pid>.json`` there every METRICS_FLUSH_SECONDS, and again when it
+answers a scrape. A scrape sums every worker's file. Counters and
+histograms of workers that have exited keep counting. Gauges count only
+for live workers.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from fastapi import APIRouter, Response
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: list = []
+
+    def snapshot(self) -> dict:
+        """Copy of every metric's samples, JSON-serializable."""
+        with self.lock:
+            return {
+                metric.name: {
+                    "kind": metric.kind,
+                    "help": metric.help,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": [
+                        [list(labels), list(value) if isinstance(value, list) else value]
+                        for labels, value in metric.values.items()
+                    ],
+                }
+                for metric in self.metrics
+            }
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=(), registry: Optional[Registry] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or default_registry
+        self.lock = self.registry.lock
+        self.values: dict = {}
+        self.registry.metrics.append(self)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            # per-bucket (not cumulative) counts, +Inf last, then the sum
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+
+default_registry = Registry()
+
+
+def merge(snapshots: list) -> dict:
+    """Sum ``(snapshot, alive)`` pairs; gauges only from live workers."""
+    merged: dict = {}
+    for snapshot, alive in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if isinstance(value, list):
+                    target["samples"][key] = (
+                        value if current is None else [a + b for a, b in zip(current, value)]
+                    )
+                else:
+                    target["samples"][key] = value + (current or 0)
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(merged: dict) -> str:
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MultiprocessStore:
+    """Shares a registry's values with the other workers through files."""
+
+    def __init__(self, directory: str, interval: float, registry: Registry = default_registry):
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def dump(self) -> None:
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        partial = f"{path}.{threading.get_ident()}.partial"
+        with open(partial, "w") as out:
+            json.dump(self.registry.snapshot(), out)
+        os.replace(partial, path)
+
+    def collect(self) -> dict:
+        self.dump()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            try:
+                with open(path) as f:
+                    snapshots.append((json.load(f), _alive(pid)))
+            except (OSError, ValueError):
+                continue  # replaced or removed while reading
+        return merge(snapshots)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.dump()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.dump()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_multiproc_dir = os.getenv("METRICS_MULTIPROC_DIR")
+multiprocess = (
+    MultiprocessStore(_multiproc_dir, float(os.getenv("METRICS_FLUSH_SECONDS", "5")))
+    if _multiproc_dir
+    else None
+)
+
+
+def collect() -> dict:
+    if multiprocess is not None:
+        return multiprocess.collect()
+    return merge([(default_registry.snapshot(), True)])
+
+
+# --- application metrics ---------------------------------------------------
+
+http_requests = Counter(
+    "festserve_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status"),
+)
+http_duration = Histogram(
+    "festserve_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"),
+)
+http_in_flight = Gauge("festserve_http_requests_in_flight", "HTTP requests being served")
+scans_ingested = Counter(
+    "festserve_scans_ingested_total", "Scan events written, by ingest path", ("path",)
+)
+job_duration = Histogram(
+    "festserve_scheduled_job_duration_seconds", "Scheduled job run time", ("job",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+job_runs = Counter(
+    "festserve_scheduled_job_runs_total", "Scheduled job runs by outcome", ("job", "outcome")
+)
+job_last_success = Gauge(
+    "festserve_scheduled_job_last_success_timestamp_seconds",
+    "Unix time of the job's last successful run on this worker", ("job",),
+)
+db_statements = Counter(
+    "festserve_db_statements_total", "SQL statements executed, by engine", ("engine",)
+)
+
+
+def instrument_engine(engine, label: str) -> None:
+    """Count every statement ``engine`` (a sync Engine) executes."""
+    key = (label,)
+
+    def count(*_):
+        with db_statements.lock:
+            db_statements.values[key] = db_statements.values.get(key, 0) + 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            # route templates only: raw paths would make labels unbounded
+            route = scope.get("route")
+            path = getattr(route, "path", "other")
+            http_duration.observe(elapsed, scope["method"], path)
+            http_requests.inc(scope["method"], path, str(status))
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(render(collect()), media_type=CONTENT_TYPE)
@@ -8,6 +8,8 @@ import uuid
 
 from sqlalchemy import (
     Column,
+    Index,
+    LargeBinary,
     String,
     Integer,
     Date,
@@ -22,6 +24,7 @@ from sqlalchemy import (
 from sqlalchemy.dialects.postgresql import UUID
 
 # from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 
@@ -100,18 +103,27 @@ class Campaign(Base):
     __tablename__ = "campaigns"
     campaign_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     advertiser_id = Column(
-        UUID(as_uuid=True), ForeignKey("advertisers.advertiser_id"), nullable=False
+        UUID(as_uuid=True),
+        ForeignKey("advertisers.advertiser_id"),
+        nullable=False,
+        index=True,
     )
     stall_id = Column(UUID(as_uuid=True), ForeignKey("stalls.stall_id"), nullable=False)
     product_id = Column(
         UUID(as_uuid=True), ForeignKey("products.product_id"), nullable=False
     )
     units_allocated = Column(Integer, nullable=False)
+    # maintained by scan ingestion so usage is read in O(1)
+    scans_recorded = Column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
     start_datetime = Column(DateTime, nullable=False)
     end_datetime = Column(DateTime, nullable=False)
     status = Column(
         Enum(CampaignStatus), nullable=False, default=CampaignStatus.scheduled
     )
+    # one scan per device fingerprint per this many minutes; NULL disables
+    dedupe_window_minutes = Column(Integer, nullable=True)
 
     advertiser = relationship("Advertiser", back_populates="campaigns")
     stall = relationship("Stall", back_populates="campaigns")
@@ -119,6 +131,10 @@ class Campaign(Base):
     scan_events = relationship("ScanEvent", back_populates="campaign")
     snapshots = relationship("ReportingSnapshot", back_populates="campaign")
 
+    @hybrid_property
+    def units_remaining(self):
+        return self.units_allocated - self.scans_recorded
+
     __table_args__ = (
         UniqueConstraint(
             "advertiser_id",
@@ -145,12 +161,79 @@ class ScanEvent(Base):
     campaign = relationship("Campaign", back_populates="scan_events")
     scanner = relationship("ScannerUser", back_populates="scan_events")
 
+    # On Postgres the table is range-partitioned by month on scanned_at and
+    # its primary key is (scan_event_id, scanned_at); see festserve_api.partitions.
     __table_args__ = (
-        # index for fast time-based filtering
+        # keyset-ordered listings per campaign / per scanner
+        Index("ix_scan_events_campaign_id_scanned_at", "campaign_id", "scanned_at", "scan_event_id"),
+        Index("ix_scan_events_scanner_user_id_scanned_at", "scanner_user_id", "scanned_at", "scan_event_id"),
+        # duplicate-scan window lookup
+        Index("ix_scan_events_campaign_id_device_fingerprint", "campaign_id", "device_fingerprint", "scanned_at"),
         {"sqlite_autoincrement": True},
     )
 
 
+class ScanRollup(Base):
+    """Scans per campaign per minute/hour/day bucket, maintained at ingest."""
+
+    __tablename__ = "scan_rollups"
+    campaign_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("campaigns.campaign_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    granularity = Column(String(8), primary_key=True)  # "minute", "hour" or "day"
+    bucket_start = Column(DateTime, primary_key=True)
+    scan_count = Column(Integer, nullable=False, default=0)
+
+
+class CampaignReach(Base):
+    """HyperLogLog sketch of distinct device fingerprints per campaign."""
+
+    __tablename__ = "campaign_reach"
+    campaign_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("campaigns.campaign_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class StallDailyReach(Base):
+    """
+    HyperLogLog sketch of distinct device fingerprints per stall per day,
+    kept per advertiser so one advertiser's reach never includes another's.
+    """
+
+    __tablename__ = "stall_daily_reach"
+    stall_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("stalls.stall_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    advertiser_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("advertisers.advertiser_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day = Column(Date, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ScanArchive(Base):
+    """A monthly scan_events partition detached and exported to disk."""
+
+    __tablename__ = "scan_archives"
+    partition_name = Column(String, primary_key=True)
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class ReportingSnapshot(Base):
     __tablename__ = "reporting_snapshots"
     snapshot_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -160,9 +243,15 @@ class ReportingSnapshot(Base):
     snapshot_time = Column(DateTime, nullable=False, default=datetime.utcnow)
     total_scans = Column(Integer, nullable=False)
     remaining_units = Column(Integer, nullable=False)
+    # HyperLogLog estimate of distinct devices at snapshot time
+    estimated_reach = Column(Integer, nullable=True)
 
     campaign = relationship("Campaign", back_populates="snapshots")
 
+    __table_args__ = (
+        Index("ix_reporting_snapshots_campaign_id_snapshot_time", "campaign_id", "snapshot_time"),
+    )
+
 
 # Alembic env.py snippet to include metadata
 # in alembic/env.py:
@@ -0,0 +1,162 @@
+# festserve_api/pagination.py
+"""
+Keyset pagination and streaming exports for scan listings.
+
+Pages are ordered by ``(scanned_at, scan_event_id)``; the opaque cursor
+returned in the ``X-Next-Cursor`` header encodes the last row of a page and
+the next page starts strictly after it, so page cost does not grow with
+depth and rows inserted meanwhile are neither skipped nor repeated.
+
+Streaming variants read the same query through a server-side cursor
+(``yield_per``) and emit NDJSON or CSV row by row, so memory stays flat
+whatever the result size.
+
+``scan_page`` answers a page as JSON straight from the column tuples (see
+``jsonenc``), without building ORM entities or validating each row.
+"""
+import base64
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from festserve_api import models
+from festserve_api.database import naive_utc
+from festserve_api.jsonenc import json_response, rows_json
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Rows fetched per round trip when streaming
+STREAM_CHUNK_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+_SCAN_COLUMNS = (
+    models.ScanEvent.scan_event_id,
+    models.ScanEvent.campaign_id,
+    models.ScanEvent.scanner_user_id,
+    models.ScanEvent.scanned_at,
+    models.ScanEvent.device_fingerprint,
+)
+_SCAN_FIELDS = tuple(col.key for col in _SCAN_COLUMNS)
+_ORDER = (models.ScanEvent.scanned_at, models.ScanEvent.scan_event_id)
+
+
+def encode_cursor(scanned_at: datetime, scan_event_id: uuid.UUID) -> str:
+    raw = f"{scanned_at.isoformat()}|{scan_event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; a malformed cursor is a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        scanned_at, scan_event_id = raw.split("|")
+        return datetime.fromisoformat(scanned_at), uuid.UUID(scan_event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def scan_query(
+    *criteria, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> Select:
+    """
+    Scan rows matching ``criteria`` in keyset order; ``since`` is inclusive
+    and ``until`` exclusive. Aware bounds are converted to naive UTC.
+    """
+    stmt = select(*_SCAN_COLUMNS).where(*criteria)
+    if since is not None:
+        stmt = stmt.where(models.ScanEvent.scanned_at >= naive_utc(since))
+    if until is not None:
+        stmt = stmt.where(models.ScanEvent.scanned_at < naive_utc(until))
+    return stmt.order_by(*_ORDER)
+
+
+def page_query(stmt: Select, limit: int, cursor: Optional[str] = None) -> Select:
+    """``stmt`` resumed after ``cursor``, one row past ``limit`` to detect more."""
+    if cursor is not None:
+        stmt = stmt.where(tuple_(*_ORDER) > decode_cursor(cursor))
+    return stmt.limit(limit + 1)
+
+
+async def fetch_page(
+    db: AsyncSession,
+    stmt: Select,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> list:
+    """Run one page of ``stmt``, setting X-Next-Cursor if more rows follow."""
+    rows = (await db.execute(page_query(stmt, limit, cursor))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            last.scanned_at, last.scan_event_id
+        )
+    return rows
+
+
+async def scan_page(
+    db: AsyncSession, stmt: Select, limit: int, cursor: Optional[str] = None
+) -> Response:
+    """One page of ``scan_query`` rows as a JSON response."""
+    page = Response()
+    rows = await fetch_page(db, stmt, page, limit, cursor)
+    next_cursor = page.headers.get(NEXT_CURSOR_HEADER)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_response(rows_json(_SCAN_FIELDS, rows), headers)
+
+
+def _ndjson_line(row) -> str:
+    return json.dumps(
+        {
+            "scan_event_id": str(row.scan_event_id),
+            "campaign_id": str(row.campaign_id),
+            "scanner_user_id": str(row.scanner_user_id),
+            "scanned_at": row.scanned_at.isoformat(),
+            "device_fingerprint": row.device_fingerprint,
+        }
+    ) + "\n"
+
+
+def _csv_line(row) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(
+        [
+            row.scan_event_id,
+            row.campaign_id,
+            row.scanner_user_id,
+            row.scanned_at.isoformat(),
+            row.device_fingerprint or "",
+        ]
+    )
+    return buf.getvalue()
+
+
+async def _stream_rows(db: AsyncSession, stmt: Select, fmt: str):
+    if fmt == "csv":
+        yield ",".join(col.key for col in _SCAN_COLUMNS) + "\r\n"
+    render = _csv_line if fmt == "csv" else _ndjson_line
+    result = await db.stream(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    async for partition in result.partitions():
+        yield "".join(render(row) for row in partition)
+
+
+def stream_scans(db: AsyncSession, stmt: Select, fmt: str, filename: str) -> StreamingResponse:
+    headers = {}
+    if fmt == "csv":
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return StreamingResponse(
+        _stream_rows(db, stmt, fmt), media_type=STREAM_FORMATS[fmt], headers=headers
+    )
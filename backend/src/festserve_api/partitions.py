@@ -0,0 +1,263 @@
+# festserve_api/partitions.py
+"""
+Monthly range partitions of ``scan_events`` on Postgres, and archival of
+finished festivals.
+
+Partitions are named ``scan_events_yYYYYmMM`` and cover one calendar month
+of ``scanned_at``. ``scan_events_default`` catches rows outside every
+partition, for example an offline scan backdated into an archived month.
+``ensure_scan_partitions`` creates the current month's partition and
+SCAN_PARTITION_MONTHS_AHEAD months ahead. The scheduler runs it daily.
+
+``archive_completed_partitions`` archives every past month whose scans all
+belong to completed campaigns. It exports the partition to a gzipped CSV
+under SCAN_ARCHIVE_DIR, then detaches and drops it. Counters, rollups,
+snapshots and reach sketches are kept outside ``scan_events``, so reporting
+on archived campaigns is unchanged. Only scan listings lose the archived
+rows. To restore a month, run ``COPY scan_events FROM PROGRAM 'gunzip -c
+<file>' CSV HEADER``.
+
+On other databases (the SQLite stand-in) these functions do nothing.
+
+    python -m festserve_api.partitions ensure
+    python -m festserve_api.partitions archive [--dir DIR] [--dry-run]
+"""
+import argparse
+import csv
+import gzip
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.orm import Session
+
+from festserve_api import models
+from festserve_api.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Months of partitions kept ready beyond the current one
+SCAN_PARTITION_MONTHS_AHEAD = int(os.getenv("SCAN_PARTITION_MONTHS_AHEAD", "3"))
+SCAN_ARCHIVE_DIR = os.getenv("SCAN_ARCHIVE_DIR", "archive")
+
+PARENT_TABLE = "scan_events"
+DEFAULT_PARTITION = "scan_events_default"
+ARCHIVE_COLUMNS = (
+    "scan_event_id",
+    "campaign_id",
+    "scanner_user_id",
+    "scanned_at",
+    "device_fingerprint",
+)
+_PARTITION_NAME = re.compile(r"^scan_events_y(\d{4})m(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_range(name: str) -> Optional[tuple]:
+    """[start, end) covered by a monthly partition, or None for other tables."""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    start = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return start, next_month(start)
+
+
+def create_partition_sql(month: datetime, parent: str = PARENT_TABLE) -> str:
+    start = month_start(month)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} "
+        f"PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{next_month(start).isoformat(' ')}')"
+    )
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(
+        db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name"
+            ),
+            {"name": PARENT_TABLE},
+        ).scalar()
+    )
+
+
+def list_partitions(db: Session) -> List[str]:
+    return list(
+        db.scalars(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :name ORDER BY c.relname"
+            ),
+            {"name": PARENT_TABLE},
+        )
+    )
+
+
+def ensure_scan_partitions(db: Optional[Session] = None, now: Optional[datetime] = None) -> List[str]:
+    """
+    Create any missing partition from the current month through
+    SCAN_PARTITION_MONTHS_AHEAD months ahead; returns the names created.
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            return []
+        existing = set(list_partitions(db))
+        month = month_start(now or datetime.utcnow())
+        created = []
+        for _ in range(SCAN_PARTITION_MONTHS_AHEAD + 1):
+            if partition_name(month) not in existing:
+                db.execute(text(create_partition_sql(month)))
+                created.append(partition_name(month))
+            month = next_month(month)
+        db.commit()
+        if created:
+            logger.info("Created scan_events partitions %s", ", ".join(created))
+        return created
+    finally:
+        if owns_session:
+            db.close()
+
+
+def archivable_partitions(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """Past monthly partitions holding scans of completed campaigns only."""
+    current = month_start(now or datetime.utcnow())
+    names = []
+    for name in list_partitions(db):
+        bounds = partition_range(name)
+        if bounds is None or bounds[1] > current:
+            continue
+        scans = table(name, column("campaign_id"))
+        still_running = db.execute(
+            select(scans.c.campaign_id)
+            .join(models.Campaign, models.Campaign.campaign_id == scans.c.campaign_id)
+            .where(models.Campaign.status != models.CampaignStatus.completed)
+            .limit(1)
+        ).first()
+        if still_running is None:
+            names.append(name)
+    return names
+
+
+def export_rows(db: Session, table_name: str, path: str) -> int:
+    """Write ``table_name`` to ``path`` as gzipped CSV; returns the row count."""
+    scan_columns = models.ScanEvent.__table__.c
+    scans = table(table_name, *(column(name, scan_columns[name].type) for name in ARCHIVE_COLUMNS))
+    result = db.execute(
+        select(scans).order_by(scans.c.scanned_at).execution_options(yield_per=10_000)
+    )
+    count = 0
+    with gzip.open(path, "wt", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for row in result:
+            writer.writerow(
+                [row.scan_event_id, row.campaign_id, row.scanner_user_id,
+                 row.scanned_at.isoformat(), row.device_fingerprint or ""]
+            )
+            count += 1
+    return count
+
+
+def archive_partition(db: Session, name: str, directory: str = SCAN_ARCHIVE_DIR) -> models.ScanArchive:
+    """
+    Export one partition, then detach and drop it. Exporting happens while
+    the partition is still attached, so ingestion is never blocked for the
+    length of the export; the drop is aborted if rows arrived meanwhile.
+    """
+    start, end = partition_range(name)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+    partial = path + ".partial"
+    exported = export_rows(db, name, partial)
+    db.rollback()  # end the export's snapshot before taking locks
+
+    try:
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        remaining = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+        if remaining != exported:
+            raise RuntimeError(
+                f"{name} changed during export ({exported} exported, {remaining} now)"
+            )
+        os.replace(partial, path)
+        archive = models.ScanArchive(
+            partition_name=name,
+            range_start=start,
+            range_end=end,
+            row_count=exported,
+            path=os.path.abspath(path),
+            archived_at=datetime.utcnow(),
+        )
+        db.add(archive)
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    logger.info("Archived %s (%d scans) to %s", name, exported, path)
+    return archive
+
+
+def archive_completed_partitions(
+    db: Optional[Session] = None,
+    directory: str = SCAN_ARCHIVE_DIR,
+    dry_run: bool = False,
+) -> List[str]:
+    """Archive every archivable partition; returns their names."""
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            return []
+        names = archivable_partitions(db)
+        if not dry_run:
+            for name in names:
+                archive_partition(db, name, directory)
+        return names
+    finally:
+        if owns_session:
+            db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage scan_events partitions")
+    parser.add_argument("command", choices=["ensure", "archive"])
+    parser.add_argument("--dir", default=SCAN_ARCHIVE_DIR, help="archive directory")
+    parser.add_argument("--dry-run", action="store_true", help="only list partitions to archive")
+    args = parser.parse_args()
+    if args.command == "ensure":
+        created = ensure_scan_partitions()
+        print(f"created {len(created)} partitions: {', '.join(created) or '-'}")
+        return
+    names = archive_completed_partitions(directory=args.dir, dry_run=args.dry_run)
+    verb = "would archive" if args.dry_run else "archived"
+    print(f"{verb} {len(names)} partitions: {', '.join(names) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
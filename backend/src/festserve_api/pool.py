@@ -0,0 +1,136 @@
+# festserve_api/pool.py
+"""
+Connection pool profiles and pool telemetry.
+
+DB_POOL_PROFILE picks how the sync and async engines pool connections:
+
+- ``default``: a queue pool with pre-ping, as before.
+- ``fast``: the same pool without pre-ping. It relies on DB_POOL_RECYCLE
+  to retire old connections and saves a round trip per checkout.
+- ``pgbouncer``: no pooling in-process (NullPool) and no prepared
+  statements, for PgBouncer in transaction mode.
+
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+DB_POOL_PRE_PING override single settings of the profile. Every checkout
+is timed, pre-ping included. ``PoolMonitor.stats`` reports the checkouts,
+the time spent waiting and a latency histogram next to the pool's
+occupancy.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+POOL_PROFILES = {
+    "default": {"pooled": True, "pre_ping": True, "prepared_statements": True},
+    "fast": {"pooled": True, "pre_ping": False, "prepared_statements": True},
+    "pgbouncer": {"pooled": False, "pre_ping": False, "prepared_statements": False},
+}
+
+# Upper bounds (ms) of the checkout latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.lower() in ("1", "true", "yes")
+
+
+class PoolMonitor:
+    """Checkout counts and latencies of one engine's pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self._timeouts += 1
+            else:
+                self._checkouts += 1
+                self._buckets[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            labels = [f"le_{ms}ms" for ms in LATENCY_BUCKETS_MS] + ["inf"]
+            stats = {
+                "pool": type(pool).__name__,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 4),
+                "wait_seconds_max": round(self._wait_max, 4),
+                "checkout_latency": dict(zip(labels, self._buckets)),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+class _TimedPool:
+    """Mixin timing ``connect()``; ``monitor`` is set per engine."""
+
+    monitor: PoolMonitor
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except PoolTimeout:
+            self.monitor.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.monitor.observe(time.perf_counter() - started)
+        return conn
+
+
+def _timed_pool_class(base, monitor: PoolMonitor):
+    # a subclass per engine, so pools rebuilt by dispose() keep the monitor
+    return type(f"Timed{base.__name__}", (_TimedPool, base), {"monitor": monitor})
+
+
+def engine_options(url: str, monitor: PoolMonitor, is_async: bool = False, profile: str = None) -> dict:
+    """``create_engine`` / ``create_async_engine`` keyword arguments."""
+    profile = profile or os.getenv("DB_POOL_PROFILE", "default")
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"unknown DB_POOL_PROFILE {profile!r}; use one of {sorted(POOL_PROFILES)}")
+    settings = POOL_PROFILES[profile]
+    options = {"pool_pre_ping": _env_flag("DB_POOL_PRE_PING", settings["pre_ping"])}
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # SQLite picks its own pool per database kind; leave it alone
+        return options
+
+    if settings["pooled"]:
+        base = AsyncAdaptedQueuePool if is_async else QueuePool
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        )
+    else:
+        base = NullPool
+    options["poolclass"] = _timed_pool_class(base, monitor)
+
+    if not settings["prepared_statements"] and is_async:
+        # asyncpg caches prepared statements per connection; PgBouncer in
+        # transaction mode may hand each transaction a different one
+        options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    return options
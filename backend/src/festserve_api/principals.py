@@ -0,0 +1,170 @@
+# festserve_api/principals.py
+"""
+Cached authenticated principals for get_current_user.
+
+Resolving a bearer token normally costs a JWT decode plus a SELECT on
+``advertisers`` or ``scanner_users``. Both results are cached in-process:
+decoded tokens until they expire, and principals as immutable snapshots
+(not session-bound ORM objects) for PRINCIPAL_CACHE_TTL_SECONDS. Updates
+and deletes of users through the ORM evict their cached principal.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from festserve_api import models
+
+
+@dataclass(frozen=True)
+class AdvertiserPrincipal:
+    advertiser_id: uuid.UUID
+    name: str
+    contact_email: str
+    created_at: datetime
+
+
+@dataclass(frozen=True)
+class ScannerPrincipal:
+    user_id: uuid.UUID
+    username: str
+    assigned_stall_id: Optional[uuid.UUID]
+    created_at: datetime
+
+
+def to_principal(user):
+    """Snapshot an Advertiser or ScannerUser row."""
+    if isinstance(user, models.Advertiser):
+        return AdvertiserPrincipal(
+            advertiser_id=user.advertiser_id,
+            name=user.name,
+            contact_email=user.contact_email,
+            created_at=user.created_at,
+        )
+    return ScannerPrincipal(
+        user_id=user.user_id,
+        username=user.username,
+        assigned_stall_id=user.assigned_stall_id,
+        created_at=user.created_at,
+    )
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after a TTL."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key, value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def invalidate_where(self, predicate) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# (role, subject) -> AdvertiserPrincipal / ScannerPrincipal
+principal_cache = TTLCache(
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# raw bearer token -> decoded JWT payload, kept no longer than the token's exp
+token_cache = TTLCache(
+    ttl=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Invalidation
+
+_ROLES = {models.Advertiser: "advertiser", models.ScannerUser: "scanner"}
+
+
+def invalidate_principal(role: str, subject) -> None:
+    principal_cache.invalidate((role, str(subject)))
+
+
+@event.listens_for(models.Advertiser, "after_update")
+@event.listens_for(models.Advertiser, "after_delete")
+def _evict_advertiser(mapper, connection, target):
+    invalidate_principal("advertiser", target.advertiser_id)
+
+
+@event.listens_for(models.ScannerUser, "after_update")
+@event.listens_for(models.ScannerUser, "after_delete")
+def _evict_scanner(mapper, connection, target):
+    invalidate_principal("scanner", target.user_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _evict_on_bulk_write(orm_execute_state):
+    # query(...).update() / .delete() bypass the per-object events above
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    role = _ROLES.get(mapper.class_) if mapper is not None else None
+    if role is not None:
+        principal_cache.invalidate_where(lambda key: key[0] == role)
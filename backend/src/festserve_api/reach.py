@@ -0,0 +1,271 @@
+# festserve_api/reach.py
+"""
+Unique-device reach per campaign and per advertiser at a stall on a day.
+
+Ingest paths feed each new scan's device fingerprint to ``reach_tracker``,
+which folds it into in-process HyperLogLog registers (a dict lookup, no DB
+work). ``persist_reach`` merges those pending registers into the
+``campaign_reach`` / ``stall_daily_reach`` sketches. Every worker runs it
+(``flush_reach``) every REACH_FLUSH_MINUTES and at shutdown, whether or not
+it leads the scheduler; the snapshot job and ``POST /snapshots`` also call
+it before recording the campaign's estimate. Reads merge the stored sketch
+with this worker's pending registers, so estimates are current for this
+worker and at most one flush interval behind for the others.
+
+Pending registers are lost if a worker dies before they are persisted;
+``python -m festserve_api.reach rebuild`` folds ``scan_events`` back into
+every sketch.
+"""
+import argparse
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from festserve_api import models
+from festserve_api.database import SessionLocal, dialect_insert
+from festserve_api.hll import RELATIVE_ERROR, HyperLogLog, position
+
+# How often each worker persists its pending registers
+REACH_FLUSH_MINUTES = int(os.getenv("REACH_FLUSH_MINUTES", "5"))
+
+
+class ReachTracker:
+    """Sparse HLL registers per (campaign, day) not yet persisted."""
+
+    def __init__(self):
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._added = 0
+        self._persisted = 0
+
+    def add(self, campaign_id, fingerprint: str, scanned_at: datetime) -> None:
+        index, rank = position(fingerprint)
+        with self._lock:
+            registers = self._pending.setdefault((campaign_id, scanned_at.date()), {})
+            if rank > registers.get(index, 0):
+                registers[index] = rank
+            self._added += 1
+
+    def add_rows(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            if row["device_fingerprint"]:
+                self.add(row["campaign_id"], row["device_fingerprint"], row["scanned_at"])
+
+    def pending_sketch(self, campaign_ids, day: Optional[date] = None) -> Optional[HyperLogLog]:
+        """
+        This worker's not-yet-persisted registers for ``campaign_ids``
+        (on ``day`` only, if given).
+        """
+        campaign_ids = set(campaign_ids)
+        sketch = None
+        with self._lock:
+            for (campaign_id, scan_day), registers in self._pending.items():
+                if campaign_id in campaign_ids and day in (None, scan_day):
+                    sketch = sketch or HyperLogLog()
+                    for index, rank in registers.items():
+                        sketch.update(index, rank)
+        return sketch
+
+    def drain(self) -> dict:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def restore(self, drained: dict) -> None:
+        """Put back registers whose persist failed."""
+        with self._lock:
+            for key, registers in drained.items():
+                current = self._pending.setdefault(key, {})
+                for index, rank in registers.items():
+                    if rank > current.get(index, 0):
+                        current[index] = rank
+
+    def record_persisted(self, count: int) -> None:
+        with self._lock:
+            self._persisted += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_keys": len(self._pending),
+                "added": self._added,
+                "persisted_keys": self._persisted,
+            }
+
+
+reach_tracker = ReachTracker()
+
+
+def estimate(sketch: Optional[HyperLogLog]) -> dict:
+    """ReachEstimate fields for a (possibly missing) sketch."""
+    value = sketch.estimate() if sketch is not None else 0
+    return {
+        "estimated_reach": value,
+        "relative_error": round(RELATIVE_ERROR, 4),
+        "margin_95": round(1.96 * RELATIVE_ERROR * value),
+    }
+
+
+def merge_blobs(blobs: Iterable[bytes], pending: Optional[HyperLogLog] = None) -> Optional[HyperLogLog]:
+    """Union of stored sketches (and optionally pending registers)."""
+    sketch = pending
+    for blob in blobs:
+        stored = HyperLogLog.from_bytes(blob)
+        sketch = stored if sketch is None else sketch.merge(stored)
+    return sketch
+
+
+def _merge_into(db: Session, model, sketches: dict, now: datetime) -> None:
+    """
+    Union ``sketches`` (primary key tuple -> HyperLogLog) into ``model``'s
+    rows. New keys are inserted; existing rows are locked in key order and
+    merged register-wise, so concurrent workers cannot lose each other's
+    updates.
+    """
+    if not sketches:
+        return
+    table = model.__table__
+    key_columns = list(table.primary_key.columns)
+    keys = sorted(sketches, key=lambda key: tuple(map(str, key)))
+    inserted = set(
+        db.execute(
+            dialect_insert(db.get_bind(), table)
+            .on_conflict_do_nothing()
+            .returning(*key_columns),
+            [
+                {
+                    **{column.name: value for column, value in zip(key_columns, key)},
+                    "sketch": sketches[key].to_bytes(),
+                    "updated_at": now,
+                }
+                for key in keys
+            ],
+        ).tuples()
+    )
+    existing = [key for key in keys if key not in inserted]
+    if not existing:
+        return
+    rows = db.scalars(
+        select(model)
+        .where(tuple_(*key_columns).in_(existing))
+        .order_by(*key_columns)
+        .with_for_update()
+    )
+    for row in rows:
+        key = tuple(getattr(row, column.name) for column in key_columns)
+        row.sketch = HyperLogLog.from_bytes(row.sketch).merge(sketches[key]).to_bytes()
+        row.updated_at = now
+    db.flush()
+
+
+def persist_reach(db: Session) -> int:
+    """
+    Merge every pending register into the stored sketches and commit.
+    Returns the number of campaigns updated.
+    """
+    drained = reach_tracker.drain()
+    if not drained:
+        return 0
+    try:
+        per_campaign = defaultdict(HyperLogLog)
+        for (campaign_id, _), registers in drained.items():
+            for index, rank in registers.items():
+                per_campaign[campaign_id].update(index, rank)
+        stall_of = {
+            campaign_id: (stall_id, advertiser_id)
+            for campaign_id, stall_id, advertiser_id in db.execute(
+                select(
+                    models.Campaign.campaign_id,
+                    models.Campaign.stall_id,
+                    models.Campaign.advertiser_id,
+                ).where(models.Campaign.campaign_id.in_(list(per_campaign)))
+            )
+        }
+        per_stall_day = defaultdict(HyperLogLog)
+        for (campaign_id, day), registers in drained.items():
+            if campaign_id not in stall_of:
+                continue  # campaign deleted meanwhile
+            stall_id, advertiser_id = stall_of[campaign_id]
+            for index, rank in registers.items():
+                per_stall_day[(stall_id, advertiser_id, day)].update(index, rank)
+
+        now = datetime.utcnow()
+        _merge_into(
+            db,
+            models.CampaignReach,
+            {(cid,): sketch for cid, sketch in per_campaign.items() if cid in stall_of},
+            now,
+        )
+        _merge_into(db, models.StallDailyReach, dict(per_stall_day), now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        reach_tracker.restore(drained)
+        raise
+    reach_tracker.record_persisted(len(drained))
+    return len(stall_of)
+
+
+def flush_reach(db: Optional[Session] = None) -> int:
+    """Persist this worker's pending registers; returns campaigns updated."""
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        return persist_reach(db)
+    finally:
+        if owns_session:
+            db.close()
+
+
+def rebuild_reach_sketches(db: Session) -> int:
+    """
+    Fold every scan in scan_events into the stored sketches. Merging is
+    idempotent, so rebuilding recovers lost pending registers without
+    dropping the contribution of scans that have since been archived.
+    Returns campaigns covered.
+    """
+    per_campaign = defaultdict(HyperLogLog)
+    per_stall_day = defaultdict(HyperLogLog)
+    rows = db.execute(
+        select(
+            models.ScanEvent.campaign_id,
+            models.Campaign.stall_id,
+            models.Campaign.advertiser_id,
+            models.ScanEvent.device_fingerprint,
+            models.ScanEvent.scanned_at,
+        )
+        .join(models.Campaign)
+        .where(models.ScanEvent.device_fingerprint.is_not(None))
+        .execution_options(yield_per=10_000)
+    )
+    for campaign_id, stall_id, advertiser_id, fingerprint, scanned_at in rows:
+        index, rank = position(fingerprint)
+        per_campaign[campaign_id].update(index, rank)
+        per_stall_day[(stall_id, advertiser_id, scanned_at.date())].update(index, rank)
+
+    now = datetime.utcnow()
+    _merge_into(db, models.CampaignReach, {(cid,): s for cid, s in per_campaign.items()}, now)
+    _merge_into(db, models.StallDailyReach, dict(per_stall_day), now)
+    db.commit()
+    return len(per_campaign)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain reach sketches")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(f"rebuilt reach sketches for {rebuild_reach_sketches(db)} campaigns")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
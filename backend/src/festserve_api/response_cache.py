@@ -0,0 +1,105 @@
+# festserve_api/response_cache.py
+"""
+Conditional GET for per-campaign reporting responses.
+
+Each campaign has an in-process version that every write path touching it
+(scan ingestion, campaign update/delete, snapshots, reconciliation) bumps.
+Serialized responses are cached per (route, campaign) together with the
+version they were built at and a strong ETag of the body; a cached entry
+is served only while its version is current, so a poll with a matching
+If-None-Match gets a 304 without a DB query.
+
+Versions are per worker process: a write served by another worker is
+picked up once the entry's RESPONSE_CACHE_TTL_SECONDS lapse.
+"""
+import hashlib
+import itertools
+import os
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+from festserve_api.principals import TTLCache
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    version: int
+    advertiser_id: object
+    etag: str
+    body: bytes
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self._entries = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._versions: dict = {}
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def version(self, campaign_id) -> int:
+        with self._lock:
+            return self._versions.get(campaign_id, 0)
+
+    def bump(self, campaign_id) -> None:
+        """Mark every cached response of the campaign as stale."""
+        # O(1): stale entries are skipped by get() and age out of the LRU
+        with self._lock:
+            self._versions[campaign_id] = next(self._clock)
+
+    def get(self, route: str, campaign_id) -> Optional[CachedResponse]:
+        cached = self._entries.get((route, campaign_id))
+        if cached is not None and cached.version == self.version(campaign_id):
+            return cached
+        return None
+
+    def put(self, route: str, campaign_id, version: int, advertiser_id, body: bytes) -> CachedResponse:
+        """Cache ``body`` unless the campaign changed since ``version`` was read."""
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        cached = CachedResponse(version, advertiser_id, etag, body)
+        if version == self.version(campaign_id):
+            self._entries.put((route, campaign_id), cached)
+        return cached
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+response_cache = ResponseCache(
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def conditional_response(
+    request: Request,
+    route: str,
+    campaign_id,
+    advertiser_id,
+    build: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """
+    Serve a campaign's reporting response from the cache when it is current,
+    otherwise ``build()`` it (ownership checks included) and cache it.
+    Answers 304 when If-None-Match matches.
+    """
+    cached = response_cache.get(route, campaign_id)
+    if cached is None or cached.advertiser_id != advertiser_id:
+        version = response_cache.version(campaign_id)
+        cached = response_cache.put(route, campaign_id, version, advertiser_id, await build())
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,65 @@
+# festserve_api/rollups.py
+"""
+Time-bucketed scan counts for charts.
+
+Every ingest path (single scan, batch, buffered flush) adds its new rows to
+``scan_rollups`` in the same transaction that inserts them, one row per
+(campaign, granularity, bucket). The time-series endpoint then reads
+O(buckets) rows instead of counting raw scans.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from festserve_api import models
+from festserve_api.database import dialect_insert
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Most buckets one time-series request may cover
+MAX_TIMESERIES_BUCKETS = 10_000
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Truncate ``ts`` to the start of its bucket."""
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_upsert(bind, rows):
+    """
+    Return ``(statement, params)`` adding ``rows`` (scan_events dicts) to
+    their buckets, or None when there is nothing to add. Params are sorted
+    so concurrent writers lock bucket rows in the same order.
+    """
+    counts = Counter(
+        (row["campaign_id"], granularity, bucket_start(row["scanned_at"], granularity))
+        for row in rows
+        for granularity in GRANULARITIES
+    )
+    if not counts:
+        return None
+    table = models.ScanRollup.__table__
+    stmt = dialect_insert(bind, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.campaign_id, table.c.granularity, table.c.bucket_start],
+        set_={"scan_count": table.c.scan_count + stmt.excluded.scan_count},
+    )
+    params = [
+        {
+            "campaign_id": campaign_id,
+            "granularity": granularity,
+            "bucket_start": start,
+            "scan_count": count,
+        }
+        for (campaign_id, granularity, start), count in sorted(
+            counts.items(), key=lambda item: (str(item[0][0]), item[0][1], item[0][2])
+        )
+    ]
+    return stmt, params
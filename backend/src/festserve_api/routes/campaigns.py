@@ -1,17 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from uuid import UUID
-from sqlalchemy import func
 
+import json
 from datetime import datetime
 
 from festserve_api import models, schemas
-from festserve_api.database import get_db
+from festserve_api.database import get_async_db, get_db, naive_utc
 from festserve_api.auth import get_current_user
+from festserve_api.dedupe import dedupe_cache
+from festserve_api.hll import HyperLogLog
+from festserve_api.jsonenc import rows_json
+from festserve_api.live import live_events
+from festserve_api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    scan_page,
+    scan_query,
+    stream_scans,
+)
+from festserve_api.reach import estimate, merge_blobs, persist_reach, reach_tracker
+from festserve_api.response_cache import conditional_response, response_cache
+from festserve_api.rollups import GRANULARITIES, MAX_TIMESERIES_BUCKETS, bucket_start
 
 router = APIRouter(prefix="/api/campaigns", tags=["campaigns"])
 
+_SNAPSHOT_COLUMNS = (
+    models.ReportingSnapshot.snapshot_id,
+    models.ReportingSnapshot.campaign_id,
+    models.ReportingSnapshot.snapshot_time,
+    models.ReportingSnapshot.total_scans,
+    models.ReportingSnapshot.remaining_units,
+    models.ReportingSnapshot.estimated_reach,
+)
+_SNAPSHOT_FIELDS = tuple(col.key for col in _SNAPSHOT_COLUMNS)
+
+
+def campaigns_query(advertiser_id) -> Select:
+    """All of one advertiser's campaigns."""
+    return select(models.Campaign).where(models.Campaign.advertiser_id == advertiser_id)
+
+
+def snapshots_query(campaign_id) -> Select:
+    """A campaign's snapshot rows, oldest first."""
+    return (
+        select(*_SNAPSHOT_COLUMNS)
+        .where(models.ReportingSnapshot.campaign_id == campaign_id)
+        .order_by(models.ReportingSnapshot.snapshot_time.asc())
+    )
+
+
 @router.post("/", response_model=schemas.CampaignRead, status_code=status.HTTP_201_CREATED)
 def create_campaign(
     payload: schemas.CampaignCreate,
@@ -38,6 +80,7 @@ def create_campaign(
         start_datetime=payload.start_datetime,
         end_datetime=payload.end_datetime,
         status=models.CampaignStatus.scheduled,
+        dedupe_window_minutes=payload.dedupe_window_minutes,
     )
     db.add(campaign)
     db.commit()
@@ -45,33 +88,35 @@ def create_campaign(
     return campaign
 
 @router.get("/", response_model=List[schemas.CampaignRead])
-def list_campaigns(
-    db: Session = Depends(get_db),
+async def list_campaigns(
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     if not hasattr(current_user, "advertiser_id"):
         raise HTTPException(status_code=403, detail="Only advertisers may list campaigns")
 
-    campaigns = (
-        db.query(models.Campaign)
-        .filter(models.Campaign.advertiser_id == current_user.advertiser_id)
-        .all()
-    )
-    return campaigns
+    campaigns = await db.scalars(campaigns_query(current_user.advertiser_id))
+    return campaigns.all()
 
 @router.get("/{campaign_id}", response_model=schemas.CampaignRead, status_code=status.HTTP_200_OK)
-def get_campaign(
+async def get_campaign(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     if not hasattr(current_user, "advertiser_id"):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    campaign = db.get(models.Campaign, campaign_id)
-    if not campaign or campaign.advertiser_id != current_user.advertiser_id:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-    return campaign
+    async def build():
+        campaign = await db.get(models.Campaign, campaign_id)
+        if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        return schemas.CampaignRead.model_validate(campaign).model_dump_json().encode()
+
+    return await conditional_response(
+        request, "campaign", campaign_id, current_user.advertiser_id, build
+    )
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Reporting endpoints
@@ -81,35 +126,149 @@ def get_campaign(
     response_model=dict,
     status_code=status.HTTP_200_OK,
 )
-def campaign_scan_count(
+async def campaign_scan_count(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     # only advertisers
     if not hasattr(current_user, "advertiser_id"):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    # verify campaign exists and belongs to this advertiser
-    campaign = db.get(models.Campaign, campaign_id)
+    async def build():
+        # verify campaign exists and belongs to this advertiser
+        campaign = await db.get(models.Campaign, campaign_id)
+        if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        return json.dumps(
+            {
+                "campaign_id": str(campaign_id),
+                "total_scans": campaign.scans_recorded,
+                "remaining_units": campaign.units_remaining,
+            }
+        ).encode()
+
+    return await conditional_response(
+        request, "scan_count", campaign_id, current_user.advertiser_id, build
+    )
+
+@router.get(
+    "/{campaign_id}/reach",
+    response_model=schemas.ReachEstimate,
+    status_code=status.HTTP_200_OK,
+)
+async def campaign_reach(
+    campaign_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # only advertisers
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    campaign = await db.get(models.Campaign, campaign_id)
+    if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    # distinct devices: stored sketch plus this worker's unpersisted scans
+    blobs = await db.scalars(
+        select(models.CampaignReach.sketch).where(
+            models.CampaignReach.campaign_id == campaign_id
+        )
+    )
+    return estimate(merge_blobs(blobs, reach_tracker.pending_sketch([campaign_id])))
+
+@router.get("/{campaign_id}/live", status_code=status.HTTP_200_OK)
+async def campaign_live(
+    campaign_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # only advertisers
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    campaign = await db.get(models.Campaign, campaign_id)
+    if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    initial = {
+        "campaign_id": str(campaign_id),
+        "total_scans": campaign.scans_recorded,
+        "remaining_units": campaign.units_remaining,
+    }
+    # the stream may stay open for hours; give the connection back now
+    await db.close()
+
+    return StreamingResponse(
+        live_events(campaign_id, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get(
+    "/{campaign_id}/timeseries",
+    response_model=List[schemas.TimeseriesPoint],
+    status_code=status.HTTP_200_OK,
+)
+async def campaign_timeseries(
+    campaign_id: UUID,
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # only advertisers
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign or campaign.advertiser_id != current_user.advertiser_id:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    total = (
-        db.query(func.count(models.ScanEvent.scan_event_id))
-        .filter(models.ScanEvent.campaign_id == campaign_id)
-        .scalar()
+    # defaults: from the campaign start (or as far back as the bucket cap
+    # allows) up to now; buckets without scans are omitted
+    step = GRANULARITIES[granularity]
+    explicit = from_ is not None and to is not None
+    to = naive_utc(to) if to else datetime.utcnow()
+    from_ = naive_utc(from_) if from_ else None
+    if from_ is None:
+        from_ = max(campaign.start_datetime, to - step * MAX_TIMESERIES_BUCKETS)
+    if from_ >= to:
+        if explicit:
+            raise HTTPException(status_code=422, detail="'from' must be before 'to'")
+        return []  # e.g. a campaign that has not started yet
+    if (to - from_) / step > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Range exceeds {MAX_TIMESERIES_BUCKETS} {granularity} buckets",
+        )
+
+    rows = await db.execute(
+        select(models.ScanRollup.bucket_start, models.ScanRollup.scan_count)
+        .where(
+            models.ScanRollup.campaign_id == campaign_id,
+            models.ScanRollup.granularity == granularity,
+            models.ScanRollup.bucket_start >= bucket_start(from_, granularity),
+            models.ScanRollup.bucket_start < to,
+        )
+        .order_by(models.ScanRollup.bucket_start)
     )
-    return {"campaign_id": campaign_id, "total_scans": total}
+    return [{"bucket_start": start, "scans": count} for start, count in rows]
 
 @router.get(
     "/{campaign_id}/scans",
     response_model=List[schemas.ScanEventRead],
     status_code=status.HTTP_200_OK,
 )
-def campaign_scan_list(
+async def campaign_scan_list(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     # only advertisers
@@ -117,16 +276,37 @@ def campaign_scan_list(
         raise HTTPException(status_code=403, detail="Forbidden")
 
     # verify campaign exists and belongs to this advertiser
-    campaign = db.get(models.Campaign, campaign_id)
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign or campaign.advertiser_id != current_user.advertiser_id:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    scans = (
-        db.query(models.ScanEvent)
-        .filter(models.ScanEvent.campaign_id == campaign_id)
-        .all()
+    # one page in (scanned_at, scan_event_id) order; X-Next-Cursor fetches the next
+    stmt = scan_query(
+        models.ScanEvent.campaign_id == campaign_id, since=since, until=until
     )
-    return scans
+    return await scan_page(db, stmt, limit, cursor)
+
+@router.get("/{campaign_id}/scans/stream", status_code=status.HTTP_200_OK)
+async def campaign_scan_stream(
+    campaign_id: UUID,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # only advertisers
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    campaign = await db.get(models.Campaign, campaign_id)
+    if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    stmt = scan_query(
+        models.ScanEvent.campaign_id == campaign_id, since=since, until=until
+    )
+    return stream_scans(db, stmt, format, filename=f"scans-{campaign_id}")
 
 # ──────────────────────────────────────────────────────────────────────────────
 
@@ -149,11 +329,28 @@ def update_campaign(
     if not campaign or campaign.advertiser_id != current_user.advertiser_id:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
+    changes = payload.model_dump(exclude_unset=True)
+    # only the dedupe window may be cleared; the other columns are NOT NULL
+    nulled = sorted(
+        field for field, value in changes.items()
+        if value is None and field != "dedupe_window_minutes"
+    )
+    if nulled:
+        raise HTTPException(status_code=422, detail=f"{', '.join(nulled)} cannot be null")
+    if changes.get("units_allocated", campaign.units_allocated) < campaign.scans_recorded:
+        raise HTTPException(
+            status_code=422,
+            detail="units_allocated cannot be lower than scans already recorded",
+        )
+
     # apply any provided fields
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    for field, value in changes.items():
         setattr(campaign, field, value)
 
     db.commit()
+    response_cache.bump(campaign_id)
+    if "dedupe_window_minutes" in changes:
+        dedupe_cache.invalidate_campaign(campaign_id)
     db.refresh(campaign)
     return campaign
 
@@ -175,6 +372,8 @@ def delete_campaign(
 
     db.delete(campaign)
     db.commit()
+    response_cache.bump(campaign_id)
+    dedupe_cache.invalidate_campaign(campaign_id)
     return
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -199,22 +398,18 @@ def create_snapshot(
     if not campaign or campaign.advertiser_id != current_user.advertiser_id:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    # Compute metrics
-    total = (
-        db.query(func.count(models.ScanEvent.scan_event_id))
-        .filter(models.ScanEvent.campaign_id == campaign_id)
-        .scalar()
-    )
-    remaining = campaign.units_allocated - total
-
+    persist_reach(db)
+    sketch = db.get(models.CampaignReach, campaign_id)
     snapshot = models.ReportingSnapshot(
         campaign_id=campaign_id,
         snapshot_time=datetime.utcnow(),
-        total_scans=total,
-        remaining_units=remaining,
+        total_scans=campaign.scans_recorded,
+        remaining_units=campaign.units_remaining,
+        estimated_reach=HyperLogLog.from_bytes(sketch.sketch).estimate() if sketch else 0,
     )
     db.add(snapshot)
     db.commit()
+    response_cache.bump(campaign_id)
     db.refresh(snapshot)
     return snapshot
 
@@ -223,22 +418,24 @@ def create_snapshot(
     response_model=List[schemas.SnapshotRead],
     status_code=status.HTTP_200_OK,
 )
-def list_snapshots(
+async def list_snapshots(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     # Only advertisers
     if not hasattr(current_user, "advertiser_id"):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    campaign = db.get(models.Campaign, campaign_id)
-    if not campaign or campaign.advertiser_id != current_user.advertiser_id:
-        raise HTTPException(status_code=404, detail="Campaign not found")
+    async def build():
+        campaign = await db.get(models.Campaign, campaign_id)
+        if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+            raise HTTPException(status_code=404, detail="Campaign not found")
 
-    return (
-        db.query(models.ReportingSnapshot)
-        .filter(models.ReportingSnapshot.campaign_id == campaign_id)
-        .order_by(models.ReportingSnapshot.snapshot_time.asc())
-        .all()
+        snapshots = await db.execute(snapshots_query(campaign_id))
+        return rows_json(_SNAPSHOT_FIELDS, snapshots)
+
+    return await conditional_response(
+        request, "snapshots", campaign_id, current_user.advertiser_id, build
     )
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from festserve_api import models, schemas
+from festserve_api.database import get_async_db
+from festserve_api.auth import get_current_user
+from festserve_api.reach import estimate, merge_blobs, reach_tracker
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary", response_model=schemas.DashboardSummary, status_code=status.HTTP_200_OK)
+async def dashboard_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Every campaign of the advertiser with its totals, last-hour scan rate
+    and latest snapshot, in one SQL statement however many campaigns.
+    """
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    # last-hour rate summed from minute rollups (O(60) rows per campaign)
+    since = datetime.utcnow() - timedelta(hours=1)
+    scans_last_hour = (
+        select(func.coalesce(func.sum(models.ScanRollup.scan_count), 0))
+        .where(
+            models.ScanRollup.campaign_id == models.Campaign.campaign_id,
+            models.ScanRollup.granularity == "minute",
+            models.ScanRollup.bucket_start >= since,
+        )
+        .scalar_subquery()
+    )
+
+    # newest snapshot per campaign
+    ranked = (
+        select(
+            models.ReportingSnapshot,
+            func.row_number()
+            .over(
+                partition_by=models.ReportingSnapshot.campaign_id,
+                order_by=models.ReportingSnapshot.snapshot_time.desc(),
+            )
+            .label("rank"),
+        )
+        .join(models.Campaign)
+        .where(models.Campaign.advertiser_id == current_user.advertiser_id)
+        .subquery()
+    )
+
+    rows = await db.execute(
+        select(
+            models.Campaign,
+            scans_last_hour.label("scans_last_hour"),
+            ranked.c.snapshot_id,
+            ranked.c.snapshot_time,
+            ranked.c.total_scans,
+            ranked.c.remaining_units,
+            ranked.c.estimated_reach,
+        )
+        .outerjoin(
+            ranked,
+            and_(ranked.c.campaign_id == models.Campaign.campaign_id, ranked.c.rank == 1),
+        )
+        .where(models.Campaign.advertiser_id == current_user.advertiser_id)
+        .order_by(models.Campaign.start_datetime, models.Campaign.campaign_id)
+    )
+
+    campaigns = []
+    for (
+        campaign,
+        last_hour,
+        snapshot_id,
+        snapshot_time,
+        snap_total,
+        snap_remaining,
+        snap_reach,
+    ) in rows:
+        latest = None
+        if snapshot_id is not None:
+            latest = {
+                "snapshot_id": snapshot_id,
+                "campaign_id": campaign.campaign_id,
+                "snapshot_time": snapshot_time,
+                "total_scans": snap_total,
+                "remaining_units": snap_remaining,
+                "estimated_reach": snap_reach,
+            }
+        campaigns.append(
+            {
+                "campaign_id": campaign.campaign_id,
+                "stall_id": campaign.stall_id,
+                "product_id": campaign.product_id,
+                "status": campaign.status,
+                "start_datetime": campaign.start_datetime,
+                "end_datetime": campaign.end_datetime,
+                "units_allocated": campaign.units_allocated,
+                "total_scans": campaign.scans_recorded,
+                "remaining_units": campaign.units_remaining,
+                "scans_last_hour": last_hour,
+                "latest_snapshot": latest,
+            }
+        )
+    return {
+        "total_scans": sum(c["total_scans"] for c in campaigns),
+        "scans_last_hour": sum(c["scans_last_hour"] for c in campaigns),
+        "campaigns": campaigns,
+    }
+
+
+@router.get("/reach", response_model=schemas.ReachEstimate, status_code=status.HTTP_200_OK)
+async def dashboard_reach(
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """Distinct devices across all of the advertiser's campaigns."""
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    rows = (
+        await db.execute(
+            select(models.Campaign.campaign_id, models.CampaignReach.sketch)
+            .outerjoin(models.CampaignReach)
+            .where(models.Campaign.advertiser_id == current_user.advertiser_id)
+        )
+    ).all()
+    # sketches merge losslessly, so a device seen by two campaigns counts once
+    pending = reach_tracker.pending_sketch(campaign_id for campaign_id, _ in rows)
+    return estimate(merge_blobs((sketch for _, sketch in rows if sketch), pending))
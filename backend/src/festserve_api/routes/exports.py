@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from festserve_api import models
+from festserve_api.database import get_async_db
+from festserve_api.auth import get_current_user
+from festserve_api.export import (
+    EXPORT_FORMATS,
+    export_available,
+    export_columns,
+    export_query,
+    stream_export,
+)
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+
+@router.get("/scans")
+async def export_scans(
+    format: Literal["parquet", "arrow", "csv"] = "csv",
+    campaign_id: Optional[UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    metadata: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """Stream the advertiser's scans as Parquet, Arrow IPC or gzipped CSV."""
+    # only advertisers
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not export_available(format):
+        raise HTTPException(
+            status_code=400, detail=f"{format} export is not available on this server; use csv"
+        )
+
+    if campaign_id is not None:
+        campaign = await db.get(models.Campaign, campaign_id)
+        if not campaign or campaign.advertiser_id != current_user.advertiser_id:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+
+    columns = export_columns(metadata)
+    stmt = export_query(
+        columns,
+        advertiser_id=current_user.advertiser_id,
+        campaign_id=campaign_id,
+        since=since,
+        until=until,
+    )
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"scans-{campaign_id or current_user.advertiser_id}{extension}"
+    return StreamingResponse(
+        stream_export(db, stmt, format, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,51 +1,446 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import Select, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 
 from festserve_api import models, schemas
-from festserve_api.database import get_db
+from festserve_api.database import dialect_insert, get_async_db
 from festserve_api.auth import get_current_user
+from festserve_api.dedupe import dedupe_cache
+from festserve_api.live import live_hub
+from festserve_api.metrics import scans_ingested
+from festserve_api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    scan_page,
+    scan_query,
+    stream_scans,
+)
+from festserve_api.reach import reach_tracker
+from festserve_api.response_cache import response_cache
+from festserve_api.rollups import rollup_upsert
+from festserve_api.scan_buffer import scan_buffer
 
 router = APIRouter(prefix="/api/scan-events", tags=["scan-events"])
 
+# Upper bound on scans accepted in one batch request
+MAX_SCAN_BATCH = 1000
+
+# How far ahead of the server clock a client-supplied scanned_at may be
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def _scanned_at(payload: schemas.ScanEventCreate, now: datetime) -> datetime:
+    """Client timestamp (normalised to naive UTC) or the server time."""
+    if payload.scanned_at is None:
+        return now
+    if payload.scanned_at.tzinfo is not None:
+        return payload.scanned_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return payload.scanned_at
+
+
+async def _replay(db: AsyncSession, scan_event_id, scanner_id, response: Response):
+    """
+    Return the stored scan for a retried client-generated id, or None if
+    the id has not been recorded yet.
+    """
+    # not db.get: on a partitioned table the key is (scan_event_id, scanned_at)
+    existing = await db.scalar(
+        select(models.ScanEvent).where(models.ScanEvent.scan_event_id == scan_event_id).limit(1)
+    )
+    if existing is None:
+        return None
+    if existing.scanner_user_id != scanner_id:
+        raise HTTPException(status_code=409, detail="Scan id already used")
+    response.status_code = status.HTTP_200_OK
+    return existing
+
+
+def recent_scans_query(campaign_id, fingerprints, after: datetime, before: datetime) -> Select:
+    """(scanned_at, device_fingerprint) of stored scans by these devices strictly between the bounds."""
+    return select(models.ScanEvent.scanned_at, models.ScanEvent.device_fingerprint).where(
+        models.ScanEvent.campaign_id == campaign_id,
+        models.ScanEvent.device_fingerprint.in_(fingerprints),
+        models.ScanEvent.scanned_at > after,
+        models.ScanEvent.scanned_at < before,
+    )
+
+
+async def _recent_scan(db: AsyncSession, campaign_id, fingerprint: str, scanned_at: datetime, window: timedelta):
+    """scanned_at of a stored scan by this device inside the window, if any."""
+    dedupe_cache.record_miss()
+    return await db.scalar(
+        recent_scans_query(
+            campaign_id, [fingerprint], scanned_at - window, scanned_at + window
+        ).limit(1)
+    )
+
+
+async def _duplicate(db: AsyncSession, payload: schemas.ScanEventCreate, scanner_id, response: Response):
+    """
+    Handle a scan inside the dedupe window: a retried client id still gets
+    its original row back, anything else is refused.
+    """
+    if payload.scan_event_id is not None:
+        existing = await _replay(db, payload.scan_event_id, scanner_id, response)
+        if existing is not None:
+            return existing
+    raise HTTPException(status_code=409, detail="Duplicate scan")
+
+
 @router.post("/", response_model=schemas.ScanEventRead, status_code=status.HTTP_201_CREATED)
-def create_scan_event(
+async def create_scan_event(
     payload: schemas.ScanEventCreate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     # Only scanner users can record scans
     if not hasattr(current_user, "user_id"):
         raise HTTPException(status_code=403, detail="Only scanner users may scan")
+    scanner_id = current_user.user_id
+
+    now = datetime.utcnow()
+    scanned_at = _scanned_at(payload, now)
+    if scanned_at > now + MAX_CLOCK_SKEW:
+        raise HTTPException(status_code=422, detail="scanned_at is in the future")
+    row = {
+        "scan_event_id": payload.scan_event_id or uuid.uuid4(),
+        "campaign_id": payload.campaign_id,
+        "scanner_user_id": scanner_id,
+        "scanned_at": scanned_at,
+        "device_fingerprint": payload.device_fingerprint,
+    }
+
+    # A device scanned again inside its campaign's dedupe window is refused
+    # from memory, before any DB work
+    fingerprint = payload.device_fingerprint
+    if fingerprint and dedupe_cache.seen_recently(payload.campaign_id, fingerprint, scanned_at):
+        return await _duplicate(db, payload, scanner_id, response)
+
+    # A retried client id gets its original row back. This has to be checked
+    # up front: on Postgres the key is (scan_event_id, scanned_at), so a
+    # retry whose scanned_at defaulted to a later server time would not hit
+    # the insert's conflict clause
+    if payload.scan_event_id is not None:
+        existing = await _replay(db, payload.scan_event_id, scanner_id, response)
+        if existing is not None:
+            return existing
+
+    # Buffered mode: queue the scan for the background writer and acknowledge
+    if scan_buffer.enabled:
+        campaign = await db.get(models.Campaign, payload.campaign_id)
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        pending = scan_buffer.pending(campaign.campaign_id)
+        if campaign.units_remaining - pending <= 0:
+            raise HTTPException(status_code=409, detail="Campaign units exhausted")
+        window = None
+        if fingerprint and campaign.dedupe_window_minutes:
+            window = timedelta(minutes=campaign.dedupe_window_minutes)
+            previous = await _recent_scan(db, campaign.campaign_id, fingerprint, scanned_at, window)
+            if previous is not None:
+                dedupe_cache.record_db_duplicate()
+                dedupe_cache.record(campaign.campaign_id, fingerprint, previous, window)
+                return await _duplicate(db, payload, scanner_id, response)
+        if not scan_buffer.put(row):
+            raise HTTPException(
+                status_code=503,
+                detail="Scan buffer full, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        if window:
+            dedupe_cache.record(campaign.campaign_id, fingerprint, scanned_at, window)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return row
+
+    # Reserve one unit; the WHERE clause keeps concurrent scanners from
+    # pushing the counter past units_allocated
+    result = await db.execute(
+        update(models.Campaign)
+        .where(
+            models.Campaign.campaign_id == payload.campaign_id,
+            models.Campaign.scans_recorded < models.Campaign.units_allocated,
+        )
+        .values(scans_recorded=models.Campaign.scans_recorded + 1)
+        .returning(
+            models.Campaign.dedupe_window_minutes,
+            models.Campaign.scans_recorded,
+            models.Campaign.units_allocated,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    reserved = result.first()
+    if reserved is None:
+        await db.rollback()
+        if await db.get(models.Campaign, payload.campaign_id) is None:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        raise HTTPException(status_code=409, detail="Campaign units exhausted")
 
-    # Verify the campaign exists
-    campaign = db.get(models.Campaign, payload.campaign_id)
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
+    # Cache miss: confirm against the DB so the window holds across
+    # restarts, evictions and other workers
+    window = None
+    if fingerprint and reserved.dedupe_window_minutes:
+        window = timedelta(minutes=reserved.dedupe_window_minutes)
+        previous = await _recent_scan(db, payload.campaign_id, fingerprint, scanned_at, window)
+        if previous is not None:
+            await db.rollback()
+            dedupe_cache.record_db_duplicate()
+            dedupe_cache.record(payload.campaign_id, fingerprint, previous, window)
+            return await _duplicate(db, payload, scanner_id, response)
 
-    # Create the scan event
-    scan = models.ScanEvent(
-        campaign_id=payload.campaign_id,
-        scanner_user_id=current_user.user_id,
-        device_fingerprint=payload.device_fingerprint,
+    # Insert in the same transaction as the counter update; a concurrent
+    # retry of the same client id (and scanned_at) hits the conflict clause
+    # and releases the reserved unit
+    inserted = await db.execute(
+        dialect_insert(db.bind, models.ScanEvent.__table__)
+        .values(**row)
+        .on_conflict_do_nothing()
     )
-    db.add(scan)
-    db.commit()
-    db.refresh(scan)
-    return scan
+    if inserted.rowcount == 0:
+        await db.rollback()
+        existing = await _replay(db, row["scan_event_id"], scanner_id, response)
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Scan id already used")
+        return existing
+    await db.execute(*rollup_upsert(db.bind, [row]))
+    await db.commit()
+    response_cache.bump(payload.campaign_id)
+    live_hub.publish(payload.campaign_id, reserved.scans_recorded, reserved.units_allocated)
+    scans_ingested.inc("single")
+    if fingerprint:
+        reach_tracker.add(payload.campaign_id, fingerprint, scanned_at)
+    if window:
+        dedupe_cache.record(payload.campaign_id, fingerprint, scanned_at, window)
+    return row
+
+@router.post("/batch", response_model=List[schemas.ScanBatchResult])
+async def create_scan_events_batch(
+    payload: List[schemas.ScanEventCreate],
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Record many scans at once. Also used by devices syncing an offline
+    backlog: client-generated ids already recorded come back as
+    "duplicate" (or are rejected if another scanner recorded them) and
+    client scanned_at timestamps are kept.
+    """
+    # Only scanner users can record scans
+    if not hasattr(current_user, "user_id"):
+        raise HTTPException(status_code=403, detail="Only scanner users may scan")
+    scanner_id = current_user.user_id
+    if len(payload) > MAX_SCAN_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {MAX_SCAN_BATCH} scans",
+        )
+
+    # Resolve and lock every referenced campaign with a single query
+    campaign_ids = {item.campaign_id for item in payload}
+    result = await db.execute(
+        select(
+            models.Campaign.campaign_id,
+            models.Campaign.units_remaining,
+            models.Campaign.dedupe_window_minutes,
+        )
+        .where(models.Campaign.campaign_id.in_(campaign_ids))
+        .with_for_update()
+    )
+    campaigns = result.all()
+    remaining = {c.campaign_id: c.units_remaining for c in campaigns}
+    windows = {
+        c.campaign_id: timedelta(minutes=c.dedupe_window_minutes)
+        for c in campaigns
+        if c.dedupe_window_minutes
+    }
+
+    # Client ids that were already recorded by an earlier sync, and by whom
+    client_ids = {item.scan_event_id for item in payload if item.scan_event_id}
+    recorded = {}
+    if client_ids:
+        recorded = dict(
+            (
+                await db.execute(
+                    select(
+                        models.ScanEvent.scan_event_id, models.ScanEvent.scanner_user_id
+                    ).where(models.ScanEvent.scan_event_id.in_(client_ids))
+                )
+            ).all()
+        )
+
+    now = datetime.utcnow()
+
+    # Dedupe: scans the cache already knows about are refused outright; for
+    # the rest, fetch the stored scans inside the window with one query per
+    # dedupe-enabled campaign
+    cached_duplicates = set()
+    unresolved = defaultdict(list)
+    for index, item in enumerate(payload):
+        window = windows.get(item.campaign_id)
+        if window is None or not item.device_fingerprint:
+            continue
+        scanned_at = _scanned_at(item, now)
+        if dedupe_cache.seen_recently(item.campaign_id, item.device_fingerprint, scanned_at):
+            cached_duplicates.add(index)
+        else:
+            unresolved[item.campaign_id].append((item.device_fingerprint, scanned_at))
+    seen = defaultdict(list)
+    for campaign_id, lookups in unresolved.items():
+        window = windows[campaign_id]
+        dedupe_cache.record_miss(len(lookups))
+        fingerprints = {fingerprint for fingerprint, _ in lookups}
+        times = [scanned_at for _, scanned_at in lookups]
+        stored = await db.execute(
+            recent_scans_query(
+                campaign_id, fingerprints, min(times) - window, max(times) + window
+            )
+        )
+        for scanned_at, fingerprint in stored:
+            seen[(campaign_id, fingerprint)].append(scanned_at)
+
+    rows = []
+    results = []
+    for index, item in enumerate(payload):
+        scan_event_id = item.scan_event_id or uuid.uuid4()
+        scanned_at = _scanned_at(item, now)
+        window = windows.get(item.campaign_id)
+        key = (item.campaign_id, item.device_fingerprint)
+        reason = None
+        if scan_event_id in recorded and recorded[scan_event_id] != scanner_id:
+            results.append(
+                schemas.ScanBatchResult(
+                    index=index, status="rejected", reason="Scan id already used"
+                )
+            )
+            continue
+        if scan_event_id in recorded:
+            results.append(
+                schemas.ScanBatchResult(
+                    index=index, status="duplicate", scan_event_id=scan_event_id
+                )
+            )
+            continue
+        if item.campaign_id not in remaining:
+            reason = "Campaign not found"
+        elif scanned_at > now + MAX_CLOCK_SKEW:
+            reason = "scanned_at is in the future"
+        elif remaining[item.campaign_id] <= 0:
+            reason = "Campaign units exhausted"
+        elif window and item.device_fingerprint and (
+            index in cached_duplicates
+            or any(abs(scanned_at - other) < window for other in seen[key])
+        ):
+            reason = "Duplicate scan"
+        if reason:
+            results.append(
+                schemas.ScanBatchResult(index=index, status="rejected", reason=reason)
+            )
+            continue
+        remaining[item.campaign_id] -= 1
+        recorded[scan_event_id] = scanner_id
+        if window and item.device_fingerprint:
+            seen[key].append(scanned_at)
+        rows.append(
+            {
+                "scan_event_id": scan_event_id,
+                "campaign_id": item.campaign_id,
+                "scanner_user_id": scanner_id,
+                "scanned_at": scanned_at,
+                "device_fingerprint": item.device_fingerprint,
+            }
+        )
+        results.append(
+            schemas.ScanBatchResult(
+                index=index, status="accepted", scan_event_id=scan_event_id
+            )
+        )
+
+    # Insert all accepted scans and bump the counters in one transaction.
+    # Ids that a concurrent sync recorded in the meantime are skipped by the
+    # conflict clause and reported as duplicates.
+    updated = {}
+    new_rows = []
+    if rows:
+        inserted = set(
+            await db.scalars(
+                dialect_insert(db.bind, models.ScanEvent.__table__)
+                .on_conflict_do_nothing()
+                .returning(models.ScanEvent.__table__.c.scan_event_id),
+                rows,
+            )
+        )
+        new_rows = [row for row in rows if row["scan_event_id"] in inserted]
+        accepted_per_campaign = Counter(row["campaign_id"] for row in new_rows)
+        for result in results:
+            if result.status == "accepted" and result.scan_event_id not in inserted:
+                result.status = "duplicate"
+        for campaign_id, accepted in accepted_per_campaign.items():
+            counters = await db.execute(
+                update(models.Campaign)
+                .where(models.Campaign.campaign_id == campaign_id)
+                .values(scans_recorded=models.Campaign.scans_recorded + accepted)
+                .returning(models.Campaign.scans_recorded, models.Campaign.units_allocated)
+                .execution_options(synchronize_session=False)
+            )
+            updated[campaign_id] = counters.one()
+        upsert = rollup_upsert(db.bind, new_rows)
+        if upsert is not None:
+            await db.execute(*upsert)
+    await db.commit()
+    for campaign_id, (scans_recorded, units_allocated) in updated.items():
+        response_cache.bump(campaign_id)
+        live_hub.publish(campaign_id, scans_recorded, units_allocated)
+    reach_tracker.add_rows(new_rows)
+    scans_ingested.inc("batch", amount=len(new_rows))
+
+    for row in rows:
+        window = windows.get(row["campaign_id"])
+        if window and row["device_fingerprint"]:
+            dedupe_cache.record(
+                row["campaign_id"], row["device_fingerprint"], row["scanned_at"], window
+            )
+    return results
 
 @router.get("/", response_model=List[schemas.ScanEventRead])
-def list_scan_events(
-    db: Session = Depends(get_db),
+async def list_scan_events(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    # Only scanner users see their own scans
+    if not hasattr(current_user, "user_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    stmt = scan_query(
+        models.ScanEvent.scanner_user_id == current_user.user_id,
+        since=since,
+        until=until,
+    )
+    return await scan_page(db, stmt, limit, cursor)
+
+@router.get("/stream")
+async def stream_scan_events(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     # Only scanner users see their own scans
     if not hasattr(current_user, "user_id"):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    scans = (
-        db.query(models.ScanEvent)
-        .filter(models.ScanEvent.scanner_user_id == current_user.user_id)
-        .all()
+    stmt = scan_query(
+        models.ScanEvent.scanner_user_id == current_user.user_id,
+        since=since,
+        until=until,
     )
-    return scans
+    return stream_scans(db, stmt, format, filename=f"scans-{current_user.user_id}")
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, status
+from datetime import date
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from festserve_api import models, schemas
 from festserve_api.database import get_db
+from festserve_api.auth import get_current_user
+from festserve_api.reach import estimate, merge_blobs, reach_tracker
 
 router = APIRouter(prefix="/api/stalls", tags=["stalls"])
 
@@ -13,3 +19,30 @@ def create_stall(payload: schemas.StallCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(stall)
     return stall
+
+@router.get("/{stall_id}/reach", response_model=schemas.ReachEstimate, status_code=status.HTTP_200_OK)
+def stall_reach(
+    stall_id: UUID,
+    day: date,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Distinct devices that scanned the caller's campaigns at a stall on one
+    day; other advertisers' scans at the same stall are not counted.
+    """
+    if not hasattr(current_user, "advertiser_id"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    campaign_ids = db.scalars(
+        select(models.Campaign.campaign_id).where(
+            models.Campaign.stall_id == stall_id,
+            models.Campaign.advertiser_id == current_user.advertiser_id,
+        )
+    ).all()
+    if not campaign_ids:
+        raise HTTPException(status_code=404, detail="Stall not found")
+
+    row = db.get(models.StallDailyReach, (stall_id, current_user.advertiser_id, day))
+    return estimate(
+        merge_blobs([row.sketch] if row else [], reach_tracker.pending_sketch(campaign_ids, day))
+    )
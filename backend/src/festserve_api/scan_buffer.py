@@ -0,0 +1,291 @@
+# festserve_api/scan_buffer.py
+"""
+Write-behind buffer for scan ingestion.
+
+When SCAN_INGEST_MODE=buffered, validated scans are queued in-process and
+acknowledged with 202; a background thread writes them to ``scan_events``
+in bulk whenever the queue reaches SCAN_BUFFER_FLUSH_SIZE rows or every
+SCAN_BUFFER_FLUSH_INTERVAL seconds, whichever comes first.
+
+Each flush also advances ``campaigns.scans_recorded`` for the rows it
+writes. Until then the queued rows are reported by ``pending()`` so the
+ingest route can keep campaigns from being over-allocated; the check is
+per-process, so with several workers a campaign can overshoot by at most
+the scans still in flight when it runs out.
+
+A flush the database refuses because of the rows themselves (an integrity
+or data error, e.g. a scan whose campaign was deleted while it was queued)
+is split in halves until the offending rows are isolated; those are
+appended to SCAN_BUFFER_DEAD_LETTER_FILE (JSON lines) and the rest are
+written. Any other failure (the database being unreachable) leaves the rows
+queued for the next flush. Rows still queued when ``stop()`` cannot write
+them go to the dead-letter file too. Both are counted in ``stats()``.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from festserve_api import models
+from festserve_api.database import SessionLocal, dialect_insert
+from festserve_api.jsonenc import dumps
+from festserve_api.live import live_hub
+from festserve_api.metrics import scans_ingested
+from festserve_api.reach import reach_tracker
+from festserve_api.response_cache import response_cache
+from festserve_api.rollups import rollup_upsert
+
+logger = logging.getLogger(__name__)
+
+# Failures caused by the rows rather than by the database being unavailable
+_ROW_ERRORS = (IntegrityError, DataError)
+
+DEAD_LETTER_FILE = os.getenv(
+    "SCAN_BUFFER_DEAD_LETTER_FILE",
+    os.path.join(tempfile.gettempdir(), "festserve-scan-dead-letters.jsonl"),
+)
+
+
+class ScanBuffer:
+    """Bounded, thread-safe queue of scan rows flushed to the DB in bulk."""
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        enabled: bool = False,
+        session_factory: Callable[[], Session] = SessionLocal,
+        dead_letter_file: str = DEAD_LETTER_FILE,
+    ):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.session_factory = session_factory
+        self.dead_letter_file = dead_letter_file
+
+        self._rows: deque = deque()
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._enqueued = 0
+        self._rejected = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._flush_errors = 0
+        self._dead_lettered = 0
+        self._dropped_at_shutdown = 0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ScanBuffer":
+        return cls(
+            max_size=int(os.getenv("SCAN_BUFFER_MAX_SIZE", "10000")),
+            flush_size=int(os.getenv("SCAN_BUFFER_FLUSH_SIZE", "500")),
+            flush_interval=float(os.getenv("SCAN_BUFFER_FLUSH_INTERVAL", "1.0")),
+            enabled=os.getenv("SCAN_INGEST_MODE", "sync") == "buffered",
+        )
+
+    def put(self, row: dict) -> bool:
+        """
+        Queue one scan row. Returns False when the buffer is full so the
+        caller can apply backpressure.
+        """
+        with self._lock:
+            if len(self._rows) >= self.max_size:
+                self._rejected += 1
+                return False
+            self._rows.append(row)
+            self._pending[row["campaign_id"]] += 1
+            self._enqueued += 1
+            depth = len(self._rows)
+        if depth >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    def pending(self, campaign_id) -> int:
+        """Scans queued for ``campaign_id`` that are not yet counted in the DB."""
+        with self._lock:
+            return self._pending[campaign_id]
+
+    def flush(self) -> int:
+        """Write everything currently queued. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(self.flush_size, len(self._rows))
+                    rows = [self._rows.popleft() for _ in range(count)]
+                if not rows:
+                    return written
+                batch_written, ok = self._write_isolating(rows)
+                written += batch_written
+                if not ok:
+                    return written
+
+    def _write_isolating(self, rows: list):
+        """
+        Write ``rows``, splitting batches the database refuses until the
+        bad rows are isolated and dead-lettered. Returns ``(written, ok)``;
+        on any other failure the unwritten rows are queued again and ``ok``
+        is False.
+        """
+        written = 0
+        batches = [rows]
+        while batches:
+            batch = batches.pop()
+            try:
+                self._write(batch)
+            except _ROW_ERRORS as exc:
+                if len(batch) == 1:
+                    self._dead_letter(batch, f"refused by the database: {exc.orig!r}")
+                else:
+                    middle = len(batch) // 2
+                    batches += [batch[middle:], batch[:middle]]
+            except Exception:
+                # put the rows back in front so the next flush retries them
+                unwritten = batch + [row for rest in reversed(batches) for row in rest]
+                with self._lock:
+                    self._rows.extendleft(reversed(unwritten))
+                return written, False
+            else:
+                written += len(batch)
+        return written, True
+
+    def _dead_letter(self, rows: list, reason: str) -> None:
+        logger.error("Dead-lettering %d buffered scans (%s)", len(rows), reason)
+        try:
+            with open(self.dead_letter_file, "ab") as out:
+                for row in rows:
+                    out.write(dumps({**row, "reason": reason}) + b"\n")
+        except OSError:
+            logger.exception("Could not write %s; lost scans: %r", self.dead_letter_file, rows)
+        with self._lock:
+            self._pending -= Counter(row["campaign_id"] for row in rows)
+            self._dead_lettered += len(rows)
+
+    def _write(self, rows: list) -> None:
+        start = time.perf_counter()
+        per_campaign = Counter(row["campaign_id"] for row in rows)
+        db = self.session_factory()
+        try:
+            # retried client ids may already be stored; only count new rows
+            table = models.ScanEvent.__table__
+            inserted = set(
+                db.scalars(
+                    dialect_insert(db.get_bind(), table)
+                    .on_conflict_do_nothing()
+                    .returning(table.c.scan_event_id),
+                    rows,
+                )
+            )
+            new_rows = [row for row in rows if row["scan_event_id"] in inserted]
+            recorded = Counter(row["campaign_id"] for row in new_rows)
+            updated = {}
+            for campaign_id, count in recorded.items():
+                updated[campaign_id] = db.execute(
+                    update(models.Campaign)
+                    .where(models.Campaign.campaign_id == campaign_id)
+                    .values(scans_recorded=models.Campaign.scans_recorded + count)
+                    .returning(models.Campaign.scans_recorded, models.Campaign.units_allocated)
+                    .execution_options(synchronize_session=False)
+                ).one()
+            upsert = rollup_upsert(db.get_bind(), new_rows)
+            if upsert is not None:
+                db.execute(*upsert)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to flush %d buffered scans", len(rows))
+            with self._lock:
+                self._flush_errors += 1
+            raise
+        finally:
+            db.close()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._pending -= per_campaign
+            self._flushed += len(rows)
+            self._flushes += 1
+            self._last_flush_seconds = elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+            self._total_flush_seconds += elapsed
+        for campaign_id, (scans_recorded, units_allocated) in updated.items():
+            response_cache.bump(campaign_id)
+            live_hub.publish(campaign_id, scans_recorded, units_allocated)
+        reach_tracker.add_rows(new_rows)
+        scans_ingested.inc("buffered", amount=len(new_rows))
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="scan-buffer-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the flush thread and drain whatever is still queued; rows that
+        cannot be written are dead-lettered rather than dropped silently.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            rows = list(self._rows)
+            self._rows.clear()
+            self._dropped_at_shutdown += len(rows)
+        if rows:
+            self._dead_letter(rows, "not written before shutdown")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queue_depth": len(self._rows),
+                "max_size": self.max_size,
+                "enqueued": self._enqueued,
+                "rejected": self._rejected,
+                "flushed": self._flushed,
+                "flushes": self._flushes,
+                "flush_errors": self._flush_errors,
+                "dead_lettered": self._dead_lettered,
+                "dropped_at_shutdown": self._dropped_at_shutdown,
+                "dead_letter_file": self.dead_letter_file,
+                "last_flush_ms": round(self._last_flush_seconds * 1000, 3),
+                "max_flush_ms": round(self._max_flush_seconds * 1000, 3),
+                "avg_flush_ms": round(
+                    self._total_flush_seconds * 1000 / self._flushes, 3
+                )
+                if self._flushes
+                else 0.0,
+            }
+
+
+scan_buffer = ScanBuffer.from_env()
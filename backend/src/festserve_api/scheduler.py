@@ -0,0 +1,258 @@
+# festserve_api/scheduler.py
+"""
+Periodic jobs (hourly snapshots, nightly reconciliation) for a multi-worker
+deployment.
+
+Every worker starts a scheduler, but a job only runs in the worker that
+holds the leader lock: a session-level Postgres advisory lock on a
+dedicated connection, or an exclusive ``flock`` on SCHEDULER_LOCK_FILE for
+the SQLite stand-in. Leadership is claimed lazily when a job fires and kept
+for the life of the process; if the leader dies its lock is released and
+the next firing in another worker takes over.
+
+The advisory lock belongs to one server session, so it cannot go through
+PgBouncer in transaction mode (DB_POOL_PROFILE=pgbouncer). Set
+SCHEDULER_DATABASE_URL to a direct or session-mode URL there; the lock then
+gets its own unpooled engine. Without it no worker claims leadership under
+that profile, rather than several claiming it at once.
+
+Jobs added with ``leader_only=False`` skip the lock and run in every
+worker, for per-worker housekeeping such as persisting in-process state.
+
+Jobs run on a one-thread pool, never on the event loop, and at most one
+instance of each runs at a time. Per-job run counts, durations and the
+last outcome are reported by ``stats()``.
+"""
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from festserve_api.database import engine
+from festserve_api.metrics import job_duration, job_last_success, job_runs
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary 64-bit key shared by every worker of a deployment
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "7305149820611"))
+SCHEDULER_LOCK_FILE = os.getenv(
+    "SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "festserve-scheduler.lock")
+)
+# Direct or session-mode connection for the advisory lock (see above)
+SCHEDULER_DATABASE_URL = os.getenv("SCHEDULER_DATABASE_URL")
+
+
+class LeaderLock:
+    """Non-blocking, process-lifetime leadership among workers."""
+
+    def __init__(
+        self,
+        bind: Engine,
+        key: int = SCHEDULER_LOCK_KEY,
+        path: str = SCHEDULER_LOCK_FILE,
+        session_locks: bool = True,
+    ):
+        self.bind = bind
+        self.key = key
+        self.path = path
+        # False when ``bind`` may hand each transaction a different session
+        self.session_locks = session_locks
+        self._conn = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self) -> bool:
+        return self._conn is not None or self._file is not None
+
+    def acquire(self) -> bool:
+        """True if this process is (now) the leader."""
+        with self._lock:
+            if self.bind.dialect.name == "postgresql":
+                return self._acquire_advisory()
+            return self._acquire_file()
+
+    def _acquire_advisory(self) -> bool:
+        if not self.session_locks:
+            logger.warning(
+                "Scheduler leadership refused: advisory locks need SCHEDULER_DATABASE_URL "
+                "behind a transaction-mode pooler"
+            )
+            return False
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                # end the implicit transaction: an idle-in-transaction
+                # leader holds back vacuum and may be killed by the server
+                self._conn.commit()
+                return True
+            except Exception:
+                # connection lost, and the lock with it
+                logger.warning("Scheduler lost its leader connection")
+                self._drop_conn()
+        conn = self.bind.connect()
+        try:
+            got = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            ).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        self._conn = conn
+        logger.info("Scheduler leadership acquired (advisory lock %d)", self.key)
+        return True
+
+    def _acquire_file(self) -> bool:
+        if self._file is not None:
+            return True
+        handle = open(self.path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        logger.info("Scheduler leadership acquired (%s)", self.path)
+        return True
+
+    def _drop_conn(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def release(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+                    )
+                    self._conn.commit()
+                except Exception:
+                    pass  # closing the connection releases it anyway
+                self._drop_conn()
+            if self._file is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+
+
+class JobRunner:
+    """Schedules jobs, leader-only unless told otherwise, and records their runs."""
+
+    def __init__(self, leader: LeaderLock):
+        self.leader = leader
+        self.scheduler: Optional[AsyncIOScheduler] = None
+        self._jobs: dict = {}
+        self._stats: dict = {}
+        self._lock = threading.Lock()
+
+    def add_job(self, func: Callable, leader_only: bool = True, **cron) -> None:
+        name = func.__name__
+        self._jobs[name] = (func, cron, leader_only)
+        with self._lock:
+            self._stats[name] = {
+                "runs": 0,
+                "failures": 0,
+                "skipped_not_leader": 0,
+                "running": False,
+                "last_started": None,
+                "last_duration_seconds": None,
+                "last_result": None,
+                "last_error": None,
+            }
+
+    def run(self, name: str) -> None:
+        """
+        Run one job now, in the calling thread, if this worker leads (or
+        the job is not leader-only).
+        """
+        func, _, leader_only = self._jobs[name]
+        if leader_only:
+            try:
+                leader = self.leader.acquire()
+            except Exception:
+                logger.exception("Scheduler could not check leadership for %s", name)
+                leader = False
+            if not leader:
+                with self._lock:
+                    self._stats[name]["skipped_not_leader"] += 1
+                return
+
+        with self._lock:
+            stats = self._stats[name]
+            stats["running"] = True
+            stats["last_started"] = datetime.utcnow().isoformat()
+        started = time.monotonic()
+        result, error = None, None
+        try:
+            result = func()
+        except Exception as exc:
+            logger.exception("Scheduled job %s failed", name)
+            error = repr(exc)
+        duration = time.monotonic() - started
+        with self._lock:
+            stats["running"] = False
+            stats["runs"] += 1
+            stats["failures"] += error is not None
+            stats["last_duration_seconds"] = round(duration, 3)
+            stats["last_result"] = result
+            stats["last_error"] = error
+        job_duration.observe(duration, name)
+        job_runs.inc(name, "failure" if error else "success")
+        if error is None:
+            job_last_success.set(time.time(), name)
+        logger.info("Scheduled job %s finished in %.2fs", name, duration)
+
+    def start(self) -> None:
+        if self.scheduler is not None:
+            return
+        self.scheduler = AsyncIOScheduler(
+            executors={"default": ThreadPoolExecutor(max_workers=1)},
+            job_defaults={"coalesce": True, "max_instances": 1},
+        )
+        for name, (_, cron, _) in self._jobs.items():
+            self.scheduler.add_job(self.run, "cron", args=[name], id=name, **cron)
+        self.scheduler.start()
+
+    def stop(self) -> None:
+        """Stop scheduling, let a running job finish, then give up leadership."""
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=True)
+            self.scheduler = None
+        self.leader.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leader": self.leader.held,
+                "running": self.scheduler is not None,
+                "jobs": {name: dict(stats) for name, stats in self._stats.items()},
+            }
+
+
+def leader_lock_from_env() -> LeaderLock:
+    """The lock on SCHEDULER_DATABASE_URL if set, else on the app engine."""
+    if SCHEDULER_DATABASE_URL:
+        return LeaderLock(create_engine(SCHEDULER_DATABASE_URL, poolclass=NullPool))
+    profile = os.getenv("DB_POOL_PROFILE", "default")
+    return LeaderLock(engine, session_locks=profile != "pgbouncer")
+
+
+job_runner = JobRunner(leader_lock_from_env())
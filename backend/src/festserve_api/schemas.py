@@ -1,5 +1,8 @@
 from datetime import datetime, date
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, Field, UUID4
+
+# a window of a year already means "once per campaign"
+MAX_DEDUPE_WINDOW_MINUTES = 365 * 24 * 60
 
 class CampaignCreate(BaseModel):
     stall_id: UUID4
@@ -7,15 +10,19 @@ class CampaignCreate(BaseModel):
     units_allocated: int
     start_datetime: datetime
     end_datetime: datetime
+    dedupe_window_minutes: int | None = Field(None, ge=1, le=MAX_DEDUPE_WINDOW_MINUTES)
 
 class CampaignRead(BaseModel):
     campaign_id: UUID4
     stall_id: UUID4
     product_id: UUID4
     units_allocated: int
+    scans_recorded: int
+    units_remaining: int
     start_datetime: datetime
     end_datetime: datetime
     status: str
+    dedupe_window_minutes: int | None
 
     class Config:
         from_attributes = True
@@ -26,6 +33,7 @@ class CampaignUpdate(BaseModel):
     start_datetime: datetime | None = None
     end_datetime: datetime | None = None
     status: str | None = None
+    dedupe_window_minutes: int | None = Field(None, ge=1, le=MAX_DEDUPE_WINDOW_MINUTES)
 
     class Config:
         from_attributes = True
@@ -34,6 +42,10 @@ class CampaignUpdate(BaseModel):
 class ScanEventCreate(BaseModel):
     campaign_id: UUID4
     device_fingerprint: str | None = None
+    # optional client-generated id and timestamp for idempotent retries
+    # and offline sync
+    scan_event_id: UUID4 | None = None
+    scanned_at: datetime | None = None
 
 class ScanEventRead(BaseModel):
     scan_event_id: UUID4
@@ -46,6 +58,13 @@ class ScanEventRead(BaseModel):
         from_attributes = True
 
 
+class ScanBatchResult(BaseModel):
+    index: int
+    status: str  # "accepted", "duplicate" or "rejected"
+    scan_event_id: UUID4 | None = None
+    reason: str | None = None
+
+
 class StallCreate(BaseModel):
     location_name: str
     latitude: float
@@ -77,6 +96,38 @@ class SnapshotRead(BaseModel):
     snapshot_time: datetime
     total_scans: int
     remaining_units: int
+    estimated_reach: int | None = None
 
     class Config:
         from_attributes = True
+
+
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    scans: int
+
+
+class DashboardCampaign(BaseModel):
+    campaign_id: UUID4
+    stall_id: UUID4
+    product_id: UUID4
+    status: str
+    start_datetime: datetime
+    end_datetime: datetime
+    units_allocated: int
+    total_scans: int
+    remaining_units: int
+    scans_last_hour: int
+    latest_snapshot: SnapshotRead | None = None
+
+
+class DashboardSummary(BaseModel):
+    total_scans: int
+    scans_last_hour: int
+    campaigns: list[DashboardCampaign]
+
+
+class ReachEstimate(BaseModel):
+    estimated_reach: int
+    relative_error: float  # standard error of the estimate, as a fraction
+    margin_95: int  # +/- this many devices at ~95% confidence
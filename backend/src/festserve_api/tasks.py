@@ -1,34 +1,139 @@
 # festserve_api/tasks.py
 
+import logging
+import os
+import uuid
 from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Select, func, insert, select, update
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from festserve_api.database import SessionLocal
 from festserve_api import models
+from festserve_api.hll import HyperLogLog
+from festserve_api.reach import persist_reach
+from festserve_api.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
-def snapshot_all_campaigns() -> None:
+# Campaigns whose counters are locked and recounted per transaction
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "500"))
+
+def snapshot_all_campaigns(db: Optional[Session] = None) -> int:
     """
-    For every campaign in the DB, record a ReportingSnapshot
-    with the current total scans and remaining units.
+    Record a ReportingSnapshot with the current total scans, remaining
+    units and estimated reach for every campaign that is running (inside
+    its window and not completed). Persists pending reach sketches, reads
+    the counters and sketches in one query and writes all snapshots in one
+    bulk INSERT; returns the number of snapshots written.
     """
-    db: Session = SessionLocal()
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
     try:
-        campaigns = db.query(models.Campaign).all()
-        for campaign in campaigns:
-            total = (
-                db.query(func.count(models.ScanEvent.scan_event_id))
-                .filter(models.ScanEvent.campaign_id == campaign.campaign_id)
-                .scalar() or 0
+        persist_reach(db)
+        now = datetime.utcnow()
+        rows = db.execute(
+            select(
+                models.Campaign.campaign_id,
+                models.Campaign.scans_recorded,
+                models.Campaign.units_remaining,
+                models.CampaignReach.sketch,
+            )
+            .outerjoin(models.CampaignReach)
+            .where(
+                models.Campaign.status != models.CampaignStatus.completed,
+                models.Campaign.start_datetime <= now,
+                models.Campaign.end_datetime >= now,
             )
-            remaining = campaign.units_allocated - total
-            snap = models.ReportingSnapshot(
-                campaign_id=campaign.campaign_id,
-                snapshot_time=datetime.utcnow(),
-                total_scans=total,
-                remaining_units=remaining,
+        ).all()
+        if rows:
+            db.execute(
+                insert(models.ReportingSnapshot),
+                [
+                    {
+                        "snapshot_id": uuid.uuid4(),
+                        "campaign_id": campaign_id,
+                        "snapshot_time": now,
+                        "total_scans": total_scans,
+                        "remaining_units": remaining_units,
+                        "estimated_reach": HyperLogLog.from_bytes(sketch).estimate() if sketch else 0,
+                    }
+                    for campaign_id, total_scans, remaining_units, sketch in rows
+                ],
             )
-            db.add(snap)
         db.commit()
+        for campaign_id, *_ in rows:
+            response_cache.bump(campaign_id)
+        return len(rows)
+    finally:
+        if owns_session:
+            db.close()
+
+
+def counters_query(campaign_ids) -> Select:
+    """Stored ``scans_recorded`` of ``campaign_ids``, locked for correction."""
+    return (
+        select(models.Campaign.campaign_id, models.Campaign.scans_recorded)
+        .where(models.Campaign.campaign_id.in_(campaign_ids))
+        .with_for_update()
+    )
+
+
+def scan_counts_query(campaign_ids) -> Select:
+    """Scans actually stored per campaign in ``campaign_ids``."""
+    return (
+        select(models.ScanEvent.campaign_id, func.count())
+        .where(models.ScanEvent.campaign_id.in_(campaign_ids))
+        .group_by(models.ScanEvent.campaign_id)
+    )
+
+
+def reconcile_scan_counters(db: Optional[Session] = None) -> int:
+    """
+    Recount scan_events for every campaign that is not completed and
+    correct any ``scans_recorded`` counter that drifted from it. Snapshots
+    read the counters, so this is the full pass that keeps them honest.
+    Returns the number of campaigns corrected.
+
+    Works in chunks of RECONCILE_CHUNK_SIZE campaigns. Each chunk locks its
+    campaign rows before counting, so a scan being ingested concurrently is
+    either in the count or waits for the correction to commit.
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        campaign_ids = db.scalars(
+            select(models.Campaign.campaign_id)
+            .where(models.Campaign.status != models.CampaignStatus.completed)
+            .order_by(models.Campaign.campaign_id)
+        ).all()
+        corrected = 0
+        for start in range(0, len(campaign_ids), RECONCILE_CHUNK_SIZE):
+            chunk = campaign_ids[start:start + RECONCILE_CHUNK_SIZE]
+            recorded = dict(db.execute(counters_query(chunk)).all())
+            counted = dict(db.execute(scan_counts_query(chunk)).all())
+            fixes = [
+                {"campaign_id": campaign_id, "scans_recorded": counted.get(campaign_id, 0)}
+                for campaign_id, scans_recorded in recorded.items()
+                if counted.get(campaign_id, 0) != scans_recorded
+            ]
+            for fix in fixes:
+                logger.warning(
+                    "Campaign %s scans_recorded was %d, recounted %d",
+                    fix["campaign_id"],
+                    recorded[fix["campaign_id"]],
+                    fix["scans_recorded"],
+                )
+            if fixes:
+                db.execute(update(models.Campaign), fixes)
+            db.commit()
+            for fix in fixes:
+                response_cache.bump(fix["campaign_id"])
+            corrected += len(fixes)
+        return corrected
     finally:
-        db.close()
+        if owns_session:
+            db.close()
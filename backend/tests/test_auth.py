@@ -1,24 +1,37 @@
 # backend/tests/test_auth.py
 
+import os
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from festserve_api.main import app
 from festserve_api.create_users import create_users
-from festserve_api.database import Base, get_db
+from festserve_api.database import Base, get_async_db, get_db
 
-# Use an in-memory SQLite database for isolation
+# SQLite file shared by the sync and async test engines
+_db_dir = tempfile.mkdtemp(prefix="festserve-test-")
+_db_path = os.path.join(_db_dir, "test.sqlite")
 engine_test = create_engine(
-    "sqlite:///:memory:",
+    f"sqlite:///{_db_path}",
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine_test
 )
+# NullPool: the TestClient may serve each request on a fresh event loop
+async_engine_test = create_async_engine(
+    f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine_test, autoflush=False, expire_on_commit=False
+)
 
 
 def override_get_db():
@@ -29,6 +42,11 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 client = TestClient(app)
 
 
@@ -36,13 +54,17 @@ client = TestClient(app)
 def prepare_and_seed_db():
     """Create tables, override DB dependency, and seed test users."""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     Base.metadata.create_all(bind=engine_test)
     db = TestingSessionLocal()
     create_users(db)
     db.close()
     yield
     Base.metadata.drop_all(bind=engine_test)
+    engine_test.dispose()
     app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    shutil.rmtree(_db_dir, ignore_errors=True)
 
 
 def test_token_and_me_flow():
@@ -69,3 +91,97 @@ def test_token_and_me_flow():
     assert resp2.status_code == 200, resp2.text
     me = resp2.json()
     assert me["contact_email"] == "adv@example.com"
+
+
+def _scanner_token():
+    resp = client.post(
+        "/api/auth/token",
+        data={"username": "scanner1", "password": "scanpassword123", "scope": "scanner"},
+    )
+    assert resp.status_code == 200, resp.text
+    return resp.json()["access_token"]
+
+
+def test_principal_is_cached_and_evicted_on_password_change():
+    from festserve_api import models
+    from festserve_api.principals import principal_cache
+
+    token = _scanner_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    hits_before = principal_cache.stats()["hits"]
+    me = client.get("/api/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["username"] == "scanner1"
+    assert "password_hash" not in me.json()
+    assert principal_cache.stats()["hits"] == hits_before + 1
+
+    # a password change through the ORM evicts the cached principal
+    from festserve_api.auth import get_password_hash
+
+    db = TestingSessionLocal()
+    scanner = db.query(models.ScannerUser).filter_by(username="scanner1").one()
+    scanner_key = ("scanner", str(scanner.user_id))
+    assert principal_cache.get(scanner_key) is not None
+    scanner.password_hash = get_password_hash("scanpassword123")
+    db.commit()
+    db.close()
+    assert principal_cache.get(scanner_key) is None
+
+
+def test_deleted_user_is_not_served_from_cache():
+    from festserve_api import models
+
+    token = _scanner_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    db = TestingSessionLocal()
+    scanner = db.query(models.ScannerUser).filter_by(username="scanner1").one()
+    db.delete(scanner)
+    db.commit()
+    db.close()
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_malformed_subject_is_rejected():
+    from festserve_api.auth import create_access_token
+
+    token = create_access_token({"sub": "not-a-uuid", "role": "scanner"})
+    resp = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash():
+    from passlib.context import CryptContext
+
+    from festserve_api import models
+    from festserve_api.auth import pwd_context
+
+    weak = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    db = TestingSessionLocal()
+    db.add(models.ScannerUser(username="rehash-me", password_hash=weak.hash("pw-rehash")))
+    db.commit()
+    db.close()
+
+    resp = client.post(
+        "/api/auth/token",
+        data={"username": "rehash-me", "password": "pw-rehash", "scope": "scanner"},
+    )
+    assert resp.status_code == 200, resp.text
+
+    db = TestingSessionLocal()
+    stored = db.query(models.ScannerUser).filter_by(username="rehash-me").one().password_hash
+    db.close()
+    assert not pwd_context.needs_update(stored)
+    assert pwd_context.verify("pw-rehash", stored)
+
+
+def test_wrong_password_is_rejected():
+    resp = client.post(
+        "/api/auth/token",
+        data={"username": "adv@example.com", "password": "nope", "scope": "advertiser"},
+    )
+    assert resp.status_code == 401
@@ -1,28 +1,37 @@
+import os
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from festserve_api.main import app
-from festserve_api.database import Base, get_db
+from festserve_api.database import Base, get_async_db, get_db
 from festserve_api.create_users import create_users
 
-# Use in-memory SQLite for fast, isolated tests
-def _get_test_engine_url():
-    return "sqlite:///:memory:"
-
-# Create test engine and sessionmaker
+# SQLite file shared by the sync and async test engines
+_db_dir = tempfile.mkdtemp(prefix="festserve-test-")
+_db_path = os.path.join(_db_dir, "test.sqlite")
 engine_test = create_engine(
-    _get_test_engine_url(),
+    f"sqlite:///{_db_path}",
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine_test
 )
+# NullPool: the TestClient may serve each request on a fresh event loop
+async_engine_test = create_async_engine(
+    f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine_test, autoflush=False, expire_on_commit=False
+)
+
 
-# Override the FastAPI dependency to use our test DB sessions
 def override_get_db():
     db = TestingSessionLocal()
     try:
@@ -30,10 +39,16 @@ def override_get_db():
     finally:
         db.close()
 
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 # Fixture: override dependency, create tables, seed users, then drop tables
 @pytest.fixture(scope="module", autouse=True)
 def prepare_and_seed_db():
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     # Create all tables
     Base.metadata.create_all(bind=engine_test)
     # Seed with test advertiser and scanner using the test DB session
@@ -42,7 +57,10 @@ def prepare_and_seed_db():
     db.close()
     yield
     Base.metadata.drop_all(bind=engine_test)
+    engine_test.dispose()
     app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    shutil.rmtree(_db_dir, ignore_errors=True)
 
 # FastAPI test client using overridden DB
 client = TestClient(app)
@@ -0,0 +1,60 @@
+import gzip
+import io
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from festserve_api.export import export_columns, export_query, iter_export
+
+COLUMNS = export_columns(include_metadata=True)
+
+
+def _batches(count, size):
+    for b in range(count):
+        yield [
+            (
+                uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), datetime(2025, 7, 1, 12, b, i),
+                None if i % 2 else f"fp-{b}-{i}", uuid.uuid4(), datetime(2025, 7, 1),
+                datetime(2025, 7, 9), uuid.uuid4(), "Main gate", date(2025, 7, 1),
+                uuid.uuid4(), "Sample",
+            )
+            for i in range(size)
+        ]
+
+
+def test_csv_export_is_one_chunk_per_batch():
+    chunks = list(iter_export(_batches(3, 4), "csv", COLUMNS))
+    assert len(chunks) == 3
+    lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+    assert lines[0].startswith("scan_event_id,campaign_id")
+    assert len(lines) == 1 + 12
+    assert gzip.decompress(b"".join(iter_export([], "csv", COLUMNS))).decode().count("\n") == 1
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_arrow_exports_write_a_batch_at_a_time(fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    data = b"".join(iter_export(_batches(3, 4), fmt, COLUMNS))
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(io.BytesIO(data))
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 12
+    assert table.column("stall_date")[0].as_py() == date(2025, 7, 1)
+    assert table.column("device_fingerprint").null_count == 6
+
+
+def test_export_query_compares_aware_bounds_as_utc():
+    plus_two = timezone(timedelta(hours=2))
+    stmt = export_query(
+        COLUMNS,
+        since=datetime(2025, 7, 1, 14, tzinfo=plus_two),
+        until=datetime(2025, 7, 2, 2, tzinfo=plus_two),
+    )
+    params = stmt.compile().params
+    assert sorted(params.values()) == [datetime(2025, 7, 1, 12), datetime(2025, 7, 2)]
@@ -0,0 +1,28 @@
+from festserve_api.hll import RELATIVE_ERROR, HyperLogLog
+
+
+def test_estimate_is_exact_enough_for_small_sets():
+    sketch = HyperLogLog()
+    for i in range(50):
+        sketch.add(f"device-{i}")
+        sketch.add(f"device-{i}")
+    assert sketch.estimate() == 50
+
+
+def test_estimate_within_error_bound_for_large_sets():
+    sketch = HyperLogLog()
+    for i in range(100_000):
+        sketch.add(f"device-{i}")
+    # three standard errors
+    assert abs(sketch.estimate() - 100_000) <= 3 * RELATIVE_ERROR * 100_000
+
+
+def test_merge_counts_overlap_once_and_round_trips():
+    left, right = HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        left.add(f"device-{i}")
+    for i in range(2000, 5000):
+        right.add(f"device-{i}")
+    merged = HyperLogLog.from_bytes(left.to_bytes()).merge(right)
+    assert abs(merged.estimate() - 5000) <= 3 * RELATIVE_ERROR * 5000
+    assert HyperLogLog.from_bytes(merged.to_bytes()).registers == merged.registers
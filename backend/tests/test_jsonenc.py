@@ -0,0 +1,26 @@
+import uuid
+from datetime import datetime
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from festserve_api import jsonenc, schemas
+
+FIELDS = ("scan_event_id", "campaign_id", "scanner_user_id", "scanned_at", "device_fingerprint")
+
+ROWS = [
+    (uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), datetime(2025, 1, 2, 3, 4, 5), "phone-é"),
+    (uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), datetime(2025, 1, 2, 3, 4, 5, 120), None),
+]
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_rows_json_matches_pydantic(monkeypatch, fast):
+    if fast and jsonenc.orjson is None:
+        pytest.skip("orjson not installed")
+    if not fast:
+        monkeypatch.setattr(jsonenc, "orjson", None)
+    adapter = TypeAdapter(List[schemas.ScanEventRead])
+    expected = adapter.dump_json(adapter.validate_python([dict(zip(FIELDS, row)) for row in ROWS]))
+    assert jsonenc.rows_json(FIELDS, ROWS) == expected
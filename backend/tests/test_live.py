@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+import uuid
+
+from festserve_api.live import LiveHub, live_events
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_subscriber_gets_latest_counters_coalesced():
+    hub = LiveHub(max_updates_per_second=20)
+    campaign_id = uuid.uuid4()
+
+    async def scenario():
+        async with hub.subscribe(campaign_id) as next_update:
+            for scans in range(1, 101):
+                hub.publish(campaign_id, scans, 100)
+            first = await next_update()
+            await asyncio.sleep(0.2)
+            hub.publish(campaign_id, 101, 200)
+            second = await next_update()
+        return first, second
+
+    first, second = _run(scenario())
+    # the burst of 100 publishes reaches the subscriber as one update
+    assert first["total_scans"] == 100
+    assert second == {"campaign_id": str(campaign_id), "total_scans": 101, "remaining_units": 99}
+    assert hub.stats()["broadcasts"] <= 3
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_broadcast_rate_is_capped():
+    hub = LiveHub(max_updates_per_second=10)
+    campaign_id = uuid.uuid4()
+
+    async def scenario():
+        received = []
+        async with hub.subscribe(campaign_id) as next_update:
+
+            async def listen():
+                while True:
+                    received.append(await next_update())
+
+            listener = asyncio.create_task(listen())
+            for scans in range(500):
+                hub.publish(campaign_id, scans, 1000)
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.15)
+            listener.cancel()
+        return received
+
+    received = _run(scenario())
+    # ~0.6 s of publishing at 10 updates/s
+    assert 2 <= len(received) <= 9
+    assert received[-1]["total_scans"] == 499
+
+
+def test_many_idle_subscribers_share_one_wakeup():
+    hub = LiveHub(max_updates_per_second=50)
+    campaign_id = uuid.uuid4()
+
+    async def subscriber(ready):
+        async with hub.subscribe(campaign_id) as next_update:
+            ready.release()
+            return await next_update()
+
+    async def scenario():
+        ready = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(subscriber(ready)) for _ in range(2000)]
+        for _ in tasks:
+            await ready.acquire()
+        assert hub.stats()["subscribers"] == 2000
+        # published from another thread, as the scan buffer does
+        threading.Thread(target=hub.publish, args=(campaign_id, 7, 10)).start()
+        return await asyncio.gather(*tasks)
+
+    results = _run(scenario())
+    assert {r["total_scans"] for r in results} == {7}
+    assert hub.stats()["broadcasts"] == 1
+
+
+def test_live_events_stream_format():
+    hub = LiveHub(max_updates_per_second=20)
+    campaign_id = uuid.uuid4()
+    initial = {"campaign_id": str(campaign_id), "total_scans": 0, "remaining_units": 5}
+
+    async def scenario():
+        stream = live_events(campaign_id, initial, hub=hub)
+        first = await stream.__anext__()
+        hub.publish(campaign_id, 2, 5)
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second
+
+    first, second = _run(scenario())
+    assert first.startswith("event: counters\ndata: ")
+    assert json.loads(first.split("data: ", 1)[1]) == initial
+    assert json.loads(second.split("data: ", 1)[1])["remaining_units"] == 3
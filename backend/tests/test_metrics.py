@@ -0,0 +1,71 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from festserve_api.main import app
+from festserve_api.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MultiprocessStore,
+    Registry,
+    merge,
+    render,
+)
+
+client = TestClient(app)
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ("route",), registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    text = render(merge([(registry.snapshot(), True)]))
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a\\"b"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert "latency_seconds_sum 3.55" in text
+
+
+def test_multiprocess_sums_workers_and_drops_dead_gauges(tmp_path):
+    registry = Registry()
+    scans = Counter("scans_total", "Scans", registry=registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    scans.inc(amount=5)
+    in_flight.inc()
+
+    # another worker that has exited (no such pid)
+    other = Registry()
+    Counter("scans_total", "Scans", registry=other).inc(amount=7)
+    Gauge("in_flight", "In flight", registry=other).inc(amount=4)
+    with open(os.path.join(tmp_path, "metrics-999999999.json"), "w") as f:
+        json.dump(other.snapshot(), f)
+
+    store = MultiprocessStore(str(tmp_path), interval=60, registry=registry)
+    text = render(store.collect())
+    assert "scans_total 12" in text
+    assert "in_flight 1" in text
+    assert os.path.exists(os.path.join(tmp_path, f"metrics-{os.getpid()}.json"))
+
+
+def test_middleware_records_route_templates():
+    client.get("/api/healthz/")
+    resp = client.get("/api/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'festserve_http_requests_total{method="GET",route="/api/healthz/",status="200"}'
+        in resp.text
+    )
+    assert 'festserve_http_request_duration_seconds_count{method="GET",route="/api/healthz/"}' in resp.text
+    assert "festserve_http_requests_in_flight 1" in resp.text  # the scrape itself
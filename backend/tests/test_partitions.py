@@ -0,0 +1,67 @@
+import csv
+import gzip
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from festserve_api import models
+from festserve_api.database import Base
+from festserve_api.partitions import (
+    archive_completed_partitions,
+    create_partition_sql,
+    ensure_scan_partitions,
+    export_rows,
+    next_month,
+    partition_name,
+    partition_range,
+)
+
+
+def test_monthly_partition_bounds():
+    december = datetime(2025, 12, 1)
+    assert next_month(december) == datetime(2026, 1, 1)
+    assert partition_name(datetime(2025, 7, 19, 13)) == "scan_events_y2025m07"
+    assert partition_range("scan_events_y2025m12") == (december, datetime(2026, 1, 1))
+    assert partition_range("scan_events_default") is None
+    assert create_partition_sql(datetime(2025, 7, 19)) == (
+        "CREATE TABLE IF NOT EXISTS scan_events_y2025m07 PARTITION OF scan_events "
+        "FOR VALUES FROM ('2025-07-01 00:00:00') TO ('2025-08-01 00:00:00')"
+    )
+
+
+def test_export_and_sqlite_noop(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scans.sqlite'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        scans = [
+            models.ScanEvent(
+                scan_event_id=uuid.uuid4(),
+                campaign_id=uuid.uuid4(),
+                scanner_user_id=uuid.uuid4(),
+                scanned_at=datetime(2025, 7, day),
+                device_fingerprint="fp" if day % 2 else None,
+            )
+            for day in (3, 1, 2)
+        ]
+        db.add_all(scans)
+        db.commit()
+
+        path = tmp_path / "scan_events.csv.gz"
+        assert export_rows(db, "scan_events", str(path)) == 3
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [r["scanned_at"] for r in rows] == [
+            "2025-07-01T00:00:00", "2025-07-02T00:00:00", "2025-07-03T00:00:00"
+        ]
+        assert rows[0]["device_fingerprint"] == "fp"
+        assert rows[1]["device_fingerprint"] == ""
+
+        # scan_events is not partitioned on SQLite
+        assert ensure_scan_partitions(db) == []
+        assert archive_completed_partitions(db, directory=str(tmp_path)) == []
+    finally:
+        db.close()
+        engine.dispose()
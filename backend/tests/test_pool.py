@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+from festserve_api.pool import PoolMonitor, engine_options
+
+PG_URL = "postgresql+asyncpg://festserve:festserve@db:5432/festserve"
+
+
+def test_profiles_map_to_engine_options(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    options = engine_options(PG_URL, PoolMonitor("t"), is_async=True, profile="fast")
+    assert options["pool_pre_ping"] is False
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 10
+
+    options = engine_options(PG_URL, PoolMonitor("t"), is_async=True, profile="pgbouncer")
+    assert issubclass(options["poolclass"], NullPool)
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert "pool_size" not in options
+
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    assert engine_options(PG_URL, PoolMonitor("t"))["pool_pre_ping"] is False
+    with pytest.raises(ValueError):
+        engine_options(PG_URL, PoolMonitor("t"), profile="huge")
+
+
+def test_monitor_times_checkouts_and_timeouts(tmp_path):
+    monitor = PoolMonitor("test")
+    poolclass = engine_options(
+        "postgresql://x@db/x", monitor, profile="default"
+    )["poolclass"]
+    assert issubclass(poolclass, QueuePool)
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.sqlite'}",
+        poolclass=poolclass,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    try:
+        with engine.connect():
+            stats = monitor.stats(engine.pool)
+            assert stats["checked_out"] == 1
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        engine.dispose()
+        with engine.connect():
+            pass
+        stats = monitor.stats(engine.pool)
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["wait_seconds_max"] >= 0.05
+        assert sum(stats["checkout_latency"].values()) == 2
+        assert stats["checked_out"] == 0
+    finally:
+        engine.dispose()
@@ -0,0 +1,617 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from festserve_api import models
+from festserve_api.main import app
+from festserve_api.database import Base, get_async_db, get_db
+from festserve_api.create_users import create_users, pwd_ctx
+from festserve_api.tasks import reconcile_scan_counters, snapshot_all_campaigns
+
+# SQLite file shared by the sync and async test engines
+_db_dir = tempfile.mkdtemp(prefix="festserve-test-")
+_db_path = os.path.join(_db_dir, "test.sqlite")
+engine_test = create_engine(
+    f"sqlite:///{_db_path}",
+    connect_args={"check_same_thread": False},
+)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine_test
+)
+# NullPool: the TestClient may serve each request on a fresh event loop
+async_engine_test = create_async_engine(
+    f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine_test, autoflush=False, expire_on_commit=False
+)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def prepare_and_seed_db():
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    Base.metadata.create_all(bind=engine_test)
+    db = TestingSessionLocal()
+    create_users(db)
+    db.close()
+    yield
+    Base.metadata.drop_all(bind=engine_test)
+    engine_test.dispose()
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    shutil.rmtree(_db_dir, ignore_errors=True)
+
+
+client = TestClient(app)
+
+
+def _token(username, password, scope):
+    resp = client.post(
+        "/api/auth/token",
+        data={"username": username, "password": password, "scope": scope},
+    )
+    assert resp.status_code == 200, resp.text
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def advertiser_headers():
+    return _token("adv@example.com", "advpassword123", "advertiser")
+
+
+@pytest.fixture(scope="module")
+def scanner_headers():
+    return _token("scanner1", "scanpassword123", "scanner")
+
+
+_stall_counter = iter(range(1000))
+
+
+def _create_campaign(
+    headers,
+    units_allocated,
+    start="2025-01-02T00:00:00",
+    end="2025-01-10T00:00:00",
+):
+    stall_id = client.post(
+        "/api/stalls/",
+        json={
+            "location_name": f"Stall {next(_stall_counter)}",
+            "latitude": 0.0,
+            "longitude": 0.0,
+            "date": "2025-01-01",
+        },
+    ).json()["stall_id"]
+    product_id = client.post(
+        "/api/products/", json={"name": "Sample", "description": "desc"}
+    ).json()["product_id"]
+    resp = client.post(
+        "/api/campaigns/",
+        json={
+            "stall_id": stall_id,
+            "product_id": product_id,
+            "units_allocated": units_allocated,
+            "start_datetime": start,
+            "end_datetime": end,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 201, resp.text
+    return resp.json()["campaign_id"]
+
+
+def _scan(campaign_id, headers):
+    return client.post(
+        "/api/scan-events/", json={"campaign_id": campaign_id}, headers=headers
+    )
+
+
+def test_scan_count_reads_counter_and_stops_at_allocation(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=2)
+
+    assert _scan(campaign_id, scanner_headers).status_code == 201
+    assert _scan(campaign_id, scanner_headers).status_code == 201
+    exhausted = _scan(campaign_id, scanner_headers)
+    assert exhausted.status_code == 409
+    assert exhausted.json()["detail"] == "Campaign units exhausted"
+
+    count = client.get(f"/api/campaigns/{campaign_id}/scans/count", headers=advertiser_headers)
+    assert count.status_code == 200
+    assert count.json()["total_scans"] == 2
+    assert count.json()["remaining_units"] == 0
+
+    campaign = client.get(f"/api/campaigns/{campaign_id}", headers=advertiser_headers).json()
+    assert campaign["scans_recorded"] == 2
+    assert campaign["units_remaining"] == 0
+
+
+def test_batch_respects_remaining_units(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=2)
+
+    resp = client.post(
+        "/api/scan-events/batch",
+        json=[{"campaign_id": campaign_id}] * 3,
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 200, resp.text
+    results = resp.json()
+    assert [r["status"] for r in results] == ["accepted", "accepted", "rejected"]
+    assert results[2]["reason"] == "Campaign units exhausted"
+
+    count = client.get(f"/api/campaigns/{campaign_id}/scans/count", headers=advertiser_headers)
+    assert count.json()["total_scans"] == 2
+
+
+def test_snapshot_uses_counter(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=10)
+    _scan(campaign_id, scanner_headers)
+
+    resp = client.post(f"/api/campaigns/{campaign_id}/snapshots", headers=advertiser_headers)
+    assert resp.status_code == 201, resp.text
+    assert resp.json()["total_scans"] == 1
+    assert resp.json()["remaining_units"] == 9
+
+    listed = client.get(f"/api/campaigns/{campaign_id}/snapshots", headers=advertiser_headers)
+    assert [s["total_scans"] for s in listed.json()] == [1]
+
+
+def test_units_allocated_cannot_drop_below_recorded_scans(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=5)
+    _scan(campaign_id, scanner_headers)
+    _scan(campaign_id, scanner_headers)
+
+    resp = client.put(
+        f"/api/campaigns/{campaign_id}",
+        json={"units_allocated": 1},
+        headers=advertiser_headers,
+    )
+    assert resp.status_code == 422
+
+    nulled = client.put(
+        f"/api/campaigns/{campaign_id}",
+        json={"units_allocated": None},
+        headers=advertiser_headers,
+    )
+    assert nulled.status_code == 422
+    assert nulled.json()["detail"] == "units_allocated cannot be null"
+
+
+def test_campaign_scans_paginate_by_cursor(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=5)
+    client.post(
+        "/api/scan-events/batch",
+        json=[
+            {"campaign_id": campaign_id, "scanned_at": f"2025-01-0{day}T12:00:00"}
+            for day in (6, 2, 5, 3, 4)
+        ],
+        headers=scanner_headers,
+    )
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get(
+            f"/api/campaigns/{campaign_id}/scans", params=params, headers=advertiser_headers
+        )
+        assert resp.status_code == 200, resp.text
+        seen += [s["scanned_at"][:10] for s in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == ["2025-01-02", "2025-01-03", "2025-01-04", "2025-01-05", "2025-01-06"]
+
+    ranged = client.get(
+        f"/api/campaigns/{campaign_id}/scans",
+        params={"since": "2025-01-03T00:00:00", "until": "2025-01-05T00:00:00"},
+        headers=advertiser_headers,
+    )
+    assert [s["scanned_at"][:10] for s in ranged.json()] == ["2025-01-03", "2025-01-04"]
+
+    # aware bounds are compared as UTC: 14:00+02:00 is 12:00Z
+    aware = client.get(
+        f"/api/campaigns/{campaign_id}/scans",
+        params={"since": "2025-01-03T14:00:00+02:00", "until": "2025-01-04T14:00:01+02:00"},
+        headers=advertiser_headers,
+    )
+    assert [s["scanned_at"][:10] for s in aware.json()] == ["2025-01-03", "2025-01-04"]
+
+    bad = client.get(
+        f"/api/campaigns/{campaign_id}/scans",
+        params={"cursor": "not-a-cursor"},
+        headers=advertiser_headers,
+    )
+    assert bad.status_code == 400
+
+
+def test_campaign_scans_stream(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=3)
+    for _ in range(3):
+        _scan(campaign_id, scanner_headers)
+
+    ndjson = client.get(
+        f"/api/campaigns/{campaign_id}/scans/stream", headers=advertiser_headers
+    )
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert len(lines) == 3
+    assert {line["campaign_id"] for line in lines} == {campaign_id}
+
+    as_csv = client.get(
+        f"/api/campaigns/{campaign_id}/scans/stream",
+        params={"format": "csv"},
+        headers=advertiser_headers,
+    )
+    assert as_csv.status_code == 200
+    rows = list(csv.reader(io.StringIO(as_csv.text)))
+    assert rows[0][:2] == ["scan_event_id", "campaign_id"]
+    assert len(rows) == 4
+
+
+def test_scheduled_snapshot_covers_running_campaigns_only(advertiser_headers, scanner_headers):
+    now = datetime.utcnow()
+    window = {
+        "start": (now - timedelta(days=1)).isoformat(),
+        "end": (now + timedelta(days=1)).isoformat(),
+    }
+    running = _create_campaign(advertiser_headers, units_allocated=4, **window)
+    completed = _create_campaign(advertiser_headers, units_allocated=4, **window)
+    ended = _create_campaign(advertiser_headers, units_allocated=4)
+    _scan(running, scanner_headers)
+
+    db = TestingSessionLocal()
+    try:
+        db.get(models.Campaign, UUID(completed)).status = models.CampaignStatus.completed
+        db.commit()
+        snapshot_all_campaigns(db)
+    finally:
+        db.close()
+
+    def snapshots(campaign_id):
+        return client.get(
+            f"/api/campaigns/{campaign_id}/snapshots", headers=advertiser_headers
+        ).json()
+
+    assert [(s["total_scans"], s["remaining_units"]) for s in snapshots(running)] == [(1, 3)]
+    assert snapshots(completed) == []
+    assert snapshots(ended) == []
+
+
+def test_reconciliation_corrects_drifted_counter(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=10)
+    # a backdated offline scan counts like any other
+    client.post(
+        "/api/scan-events/batch",
+        json=[
+            {"campaign_id": campaign_id, "scanned_at": "2025-01-03T08:00:00"},
+            {"campaign_id": campaign_id},
+        ],
+        headers=scanner_headers,
+    )
+
+    db = TestingSessionLocal()
+    try:
+        assert reconcile_scan_counters(db) == 0
+        db.get(models.Campaign, UUID(campaign_id)).scans_recorded = 7
+        db.commit()
+        assert reconcile_scan_counters(db) == 1
+    finally:
+        db.close()
+
+    count = client.get(f"/api/campaigns/{campaign_id}/scans/count", headers=advertiser_headers)
+    assert count.json()["total_scans"] == 2
+    assert count.json()["remaining_units"] == 8
+
+
+def test_timeseries_reads_rollups(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=10)
+    times = ["2025-01-03T10:00:05", "2025-01-03T10:00:40", "2025-01-03T10:02:00", "2025-01-03T11:30:00"]
+    client.post(
+        "/api/scan-events/batch",
+        json=[{"campaign_id": campaign_id, "scanned_at": t} for t in times],
+        headers=scanner_headers,
+    )
+    _scan(campaign_id, scanner_headers)  # now, outside the range below
+
+    def series(**params):
+        resp = client.get(
+            f"/api/campaigns/{campaign_id}/timeseries",
+            params={"from": "2025-01-03T00:00:00", "to": "2025-01-04T00:00:00", **params},
+            headers=advertiser_headers,
+        )
+        assert resp.status_code == 200, resp.text
+        return [(p["bucket_start"], p["scans"]) for p in resp.json()]
+
+    assert series(granularity="minute") == [
+        ("2025-01-03T10:00:00", 2),
+        ("2025-01-03T10:02:00", 1),
+        ("2025-01-03T11:30:00", 1),
+    ]
+    assert series(granularity="hour") == [
+        ("2025-01-03T10:00:00", 3),
+        ("2025-01-03T11:00:00", 1),
+    ]
+    assert series(granularity="day") == [("2025-01-03T00:00:00", 4)]
+
+    too_wide = client.get(
+        f"/api/campaigns/{campaign_id}/timeseries",
+        params={"granularity": "minute", "from": "2025-01-01T00:00:00", "to": "2025-02-01T00:00:00"},
+        headers=advertiser_headers,
+    )
+    assert too_wide.status_code == 422
+
+    backwards = client.get(
+        f"/api/campaigns/{campaign_id}/timeseries",
+        params={"from": "2025-01-04T00:00:00", "to": "2025-01-03T00:00:00"},
+        headers=advertiser_headers,
+    )
+    assert backwards.status_code == 422
+
+
+def test_timeseries_of_a_future_campaign_is_empty(advertiser_headers):
+    start = datetime.utcnow() + timedelta(days=30)
+    campaign_id = _create_campaign(
+        advertiser_headers,
+        units_allocated=10,
+        start=start.isoformat(),
+        end=(start + timedelta(days=1)).isoformat(),
+    )
+    resp = client.get(f"/api/campaigns/{campaign_id}/timeseries", headers=advertiser_headers)
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == []
+
+
+def test_dashboard_summary_uses_fixed_statement_count(advertiser_headers, scanner_headers):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def summary():
+        statements.clear()
+        event.listen(async_engine_test.sync_engine, "before_cursor_execute", count)
+        try:
+            resp = client.get("/api/dashboard/summary", headers=advertiser_headers)
+        finally:
+            event.remove(async_engine_test.sync_engine, "before_cursor_execute", count)
+        assert resp.status_code == 200, resp.text
+        return resp.json(), len(statements)
+
+    now = datetime.utcnow()
+    window = {
+        "start": (now - timedelta(days=1)).isoformat(),
+        "end": (now + timedelta(days=1)).isoformat(),
+    }
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=5, **window)
+    _scan(campaign_id, scanner_headers)
+    _scan(campaign_id, scanner_headers)
+    client.post(f"/api/campaigns/{campaign_id}/snapshots", headers=advertiser_headers)
+    _scan(campaign_id, scanner_headers)
+
+    before, queries_before = summary()
+    entry = next(c for c in before["campaigns"] if c["campaign_id"] == campaign_id)
+    assert entry["total_scans"] == 3
+    assert entry["remaining_units"] == 2
+    assert entry["scans_last_hour"] == 3
+    assert entry["latest_snapshot"]["total_scans"] == 2
+
+    for _ in range(3):
+        _create_campaign(advertiser_headers, units_allocated=1)
+    after, queries_after = summary()
+    assert len(after["campaigns"]) == len(before["campaigns"]) + 3
+    assert queries_after == queries_before == 1
+    assert after["total_scans"] == sum(c["total_scans"] for c in after["campaigns"])
+
+    assert client.get("/api/dashboard/summary", headers=scanner_headers).status_code == 403
+
+
+def test_live_endpoint_checks_ownership(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=1)
+    assert client.get(f"/api/campaigns/{campaign_id}/live", headers=scanner_headers).status_code == 403
+    missing = client.get(
+        "/api/campaigns/00000000-0000-4000-8000-000000000000/live", headers=advertiser_headers
+    )
+    assert missing.status_code == 404
+
+
+def test_reporting_routes_answer_conditional_gets(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=5)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for path in ("", "/scans/count", "/snapshots"):
+        url = f"/api/campaigns/{campaign_id}{path}"
+        first = client.get(url, headers=advertiser_headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+
+        statements.clear()
+        event.listen(async_engine_test.sync_engine, "before_cursor_execute", count)
+        try:
+            again = client.get(url, headers={**advertiser_headers, "If-None-Match": etag})
+        finally:
+            event.remove(async_engine_test.sync_engine, "before_cursor_execute", count)
+        assert again.status_code == 304
+        assert again.headers["ETag"] == etag
+        assert statements == []
+
+    count_url = f"/api/campaigns/{campaign_id}/scans/count"
+    etag = client.get(count_url, headers=advertiser_headers).headers["ETag"]
+    _scan(campaign_id, scanner_headers)
+    changed = client.get(count_url, headers={**advertiser_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["total_scans"] == 1
+    assert changed.headers["ETag"] != etag
+
+    snapshots_url = f"/api/campaigns/{campaign_id}/snapshots"
+    etag = client.get(snapshots_url, headers=advertiser_headers).headers["ETag"]
+    client.post(snapshots_url, headers=advertiser_headers)
+    changed = client.get(snapshots_url, headers={**advertiser_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 1
+
+    campaign_url = f"/api/campaigns/{campaign_id}"
+    etag = client.get(campaign_url, headers=advertiser_headers).headers["ETag"]
+    client.put(campaign_url, json={"units_allocated": 9}, headers=advertiser_headers)
+    changed = client.get(campaign_url, headers={**advertiser_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["units_allocated"] == 9
+
+
+def test_reach_counts_distinct_devices(advertiser_headers, scanner_headers):
+    first = _create_campaign(advertiser_headers, units_allocated=100)
+    second = _create_campaign(advertiser_headers, units_allocated=100)
+    scans = [{"campaign_id": first, "device_fingerprint": f"reach-{i}"} for i in range(30)]
+    scans += [{"campaign_id": second, "device_fingerprint": f"reach-{i}"} for i in range(20, 40)]
+    resp = client.post("/api/scan-events/batch", json=scans, headers=scanner_headers)
+    assert {r["status"] for r in resp.json()} == {"accepted"}
+
+    # estimates include registers not yet persisted
+    reach = client.get(f"/api/campaigns/{first}/reach", headers=advertiser_headers).json()
+    assert reach["estimated_reach"] == 30
+    assert reach["relative_error"] > 0
+
+    snapshot = client.post(f"/api/campaigns/{first}/snapshots", headers=advertiser_headers)
+    assert snapshot.json()["estimated_reach"] == 30
+    db = TestingSessionLocal()
+    try:
+        assert db.get(models.CampaignReach, UUID(second)) is not None
+        stall_id = db.get(models.Campaign, UUID(first)).stall_id
+        day = db.query(models.ScanEvent.scanned_at).filter_by(campaign_id=UUID(first)).first()[0].date()
+    finally:
+        db.close()
+    assert client.get(f"/api/campaigns/{second}/reach", headers=advertiser_headers).json()[
+        "estimated_reach"
+    ] == 20
+
+    stall = client.get(
+        f"/api/stalls/{stall_id}/reach", params={"day": day.isoformat()}, headers=advertiser_headers
+    )
+    assert stall.json()["estimated_reach"] == 30
+
+    # devices shared by both campaigns count once across the advertiser
+    total = client.get("/api/dashboard/reach", headers=advertiser_headers).json()
+    assert total["estimated_reach"] >= 40
+    assert client.get(f"/api/campaigns/{first}/reach", headers=scanner_headers).status_code == 403
+
+
+def test_stall_reach_counts_only_the_callers_campaigns(advertiser_headers, scanner_headers):
+    own = _create_campaign(advertiser_headers, units_allocated=100)
+    db = TestingSessionLocal()
+    try:
+        stall_id = db.get(models.Campaign, UUID(own)).stall_id
+        db.add(
+            models.Advertiser(
+                name="Other Advertiser",
+                contact_email="other-adv@example.com",
+                password_hash=pwd_ctx.hash("otherpassword123"),
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+    other_headers = _token("other-adv@example.com", "otherpassword123", "advertiser")
+    product_id = client.post(
+        "/api/products/", json={"name": "Rival", "description": "desc"}
+    ).json()["product_id"]
+    other = client.post(
+        "/api/campaigns/",
+        json={
+            "stall_id": str(stall_id),
+            "product_id": product_id,
+            "units_allocated": 100,
+            "start_datetime": "2025-01-02T00:00:00",
+            "end_datetime": "2025-01-10T00:00:00",
+        },
+        headers=other_headers,
+    ).json()["campaign_id"]
+
+    scans = [{"campaign_id": own, "device_fingerprint": f"own-{i}"} for i in range(10)]
+    scans += [{"campaign_id": other, "device_fingerprint": f"other-{i}"} for i in range(25)]
+    resp = client.post("/api/scan-events/batch", json=scans, headers=scanner_headers)
+    assert {r["status"] for r in resp.json()} == {"accepted"}
+    day = datetime.utcnow().date().isoformat()
+
+    def stall_reach(headers):
+        return client.get(f"/api/stalls/{stall_id}/reach", params={"day": day}, headers=headers)
+
+    # pending registers, then the persisted per-advertiser sketches
+    assert stall_reach(advertiser_headers).json()["estimated_reach"] == 10
+    client.post(f"/api/campaigns/{own}/snapshots", headers=advertiser_headers)
+    assert stall_reach(advertiser_headers).json()["estimated_reach"] == 10
+    assert stall_reach(other_headers).json()["estimated_reach"] == 25
+
+    # advertisers without a campaign at a stall learn nothing about it
+    elsewhere = _create_campaign(advertiser_headers, units_allocated=1)
+    db = TestingSessionLocal()
+    try:
+        elsewhere_stall = db.get(models.Campaign, UUID(elsewhere)).stall_id
+    finally:
+        db.close()
+    assert client.get(
+        f"/api/stalls/{elsewhere_stall}/reach", params={"day": day}, headers=other_headers
+    ).status_code == 404
+
+
+def test_scan_export_streams_csv_and_parquet(advertiser_headers, scanner_headers):
+    campaign_id = _create_campaign(advertiser_headers, units_allocated=10)
+    for i in range(3):
+        client.post(
+            "/api/scan-events/",
+            json={"campaign_id": campaign_id, "device_fingerprint": f"export-{i}"},
+            headers=scanner_headers,
+        )
+    params = {"campaign_id": campaign_id, "metadata": "true"}
+
+    resp = client.get("/api/exports/scans", params=params, headers=advertiser_headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-disposition"].endswith('.csv.gz"')
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(resp.content).decode())))
+    assert [r["device_fingerprint"] for r in rows] == ["export-0", "export-1", "export-2"]
+    assert {r["campaign_id"] for r in rows} == {campaign_id}
+    assert rows[0]["product_name"] == "Sample"
+
+    assert client.get("/api/exports/scans", headers=scanner_headers).status_code == 403
+    other = {"campaign_id": "00000000-0000-4000-8000-000000000000"}
+    assert client.get("/api/exports/scans", params=other, headers=advertiser_headers).status_code == 404
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    resp = client.get(
+        "/api/exports/scans", params={**params, "format": "parquet"}, headers=advertiser_headers
+    )
+    assert resp.status_code == 200
+    table = pq.read_table(io.BytesIO(resp.content))
+    assert table.num_rows == 3
+    assert table.column("stall_location_name")[0].as_py().startswith("Stall ")
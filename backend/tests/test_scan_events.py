@@ -0,0 +1,518 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from festserve_api.main import app
+from festserve_api.database import Base, get_async_db, get_db
+from festserve_api.create_users import create_users
+
+# SQLite file shared by the sync and async test engines
+_db_dir = tempfile.mkdtemp(prefix="festserve-test-")
+_db_path = os.path.join(_db_dir, "test.sqlite")
+engine_test = create_engine(
+    f"sqlite:///{_db_path}",
+    connect_args={"check_same_thread": False},
+)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine_test
+)
+# NullPool: the TestClient may serve each request on a fresh event loop
+async_engine_test = create_async_engine(
+    f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine_test, autoflush=False, expire_on_commit=False
+)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def prepare_and_seed_db():
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    Base.metadata.create_all(bind=engine_test)
+    db = TestingSessionLocal()
+    create_users(db)
+    db.close()
+    yield
+    Base.metadata.drop_all(bind=engine_test)
+    engine_test.dispose()
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    shutil.rmtree(_db_dir, ignore_errors=True)
+
+
+client = TestClient(app)
+
+
+def _token(username, password, scope):
+    resp = client.post(
+        "/api/auth/token",
+        data={"username": username, "password": password, "scope": scope},
+    )
+    assert resp.status_code == 200, resp.text
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def scanner_headers():
+    return _token("scanner1", "scanpassword123", "scanner")
+
+
+@pytest.fixture(scope="module")
+def campaign_id():
+    stall_id = client.post(
+        "/api/stalls/",
+        json={"location_name": "Gate A", "latitude": 0.0, "longitude": 0.0, "date": "2025-01-01"},
+    ).json()["stall_id"]
+    product_id = client.post(
+        "/api/products/", json={"name": "Sample", "description": "desc"}
+    ).json()["product_id"]
+    headers = _token("adv@example.com", "advpassword123", "advertiser")
+    resp = client.post(
+        "/api/campaigns/",
+        json={
+            "stall_id": stall_id,
+            "product_id": product_id,
+            "units_allocated": 100,
+            "start_datetime": "2025-01-02T00:00:00",
+            "end_datetime": "2025-01-10T00:00:00",
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 201, resp.text
+    return resp.json()["campaign_id"]
+
+
+def test_create_and_list_scan_event(scanner_headers, campaign_id):
+    resp = client.post(
+        "/api/scan-events/",
+        json={"campaign_id": campaign_id, "device_fingerprint": "fp-1"},
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 201, resp.text
+    scan_id = resp.json()["scan_event_id"]
+
+    listed = client.get("/api/scan-events/", headers=scanner_headers)
+    assert listed.status_code == 200
+    assert any(s["scan_event_id"] == scan_id for s in listed.json())
+
+
+def test_batch_reports_per_item_results(scanner_headers, campaign_id):
+    unknown = str(uuid.uuid4())
+    resp = client.post(
+        "/api/scan-events/batch",
+        json=[
+            {"campaign_id": campaign_id, "device_fingerprint": "fp-2"},
+            {"campaign_id": unknown},
+            {"campaign_id": campaign_id},
+        ],
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 200, resp.text
+    results = resp.json()
+    assert [r["status"] for r in results] == ["accepted", "rejected", "accepted"]
+    assert results[1]["reason"] == "Campaign not found"
+    assert results[0]["scan_event_id"] and results[2]["scan_event_id"]
+
+    listed = client.get("/api/scan-events/", headers=scanner_headers).json()
+    listed_ids = {s["scan_event_id"] for s in listed}
+    assert {results[0]["scan_event_id"], results[2]["scan_event_id"]} <= listed_ids
+
+
+def test_batch_rejects_oversized_payload(scanner_headers, campaign_id):
+    from festserve_api.routes.scan_events import MAX_SCAN_BATCH
+
+    resp = client.post(
+        "/api/scan-events/batch",
+        json=[{"campaign_id": campaign_id}] * (MAX_SCAN_BATCH + 1),
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 413
+
+
+@pytest.fixture
+def buffered_mode():
+    from festserve_api.scan_buffer import scan_buffer
+
+    saved = (scan_buffer.enabled, scan_buffer.max_size, scan_buffer.session_factory)
+    scan_buffer.enabled = True
+    scan_buffer.session_factory = TestingSessionLocal
+    yield scan_buffer
+    scan_buffer.flush()
+    scan_buffer.enabled, scan_buffer.max_size, scan_buffer.session_factory = saved
+
+
+def test_buffered_scan_is_acknowledged_then_flushed(scanner_headers, campaign_id, buffered_mode):
+    resp = client.post(
+        "/api/scan-events/",
+        json={"campaign_id": campaign_id, "device_fingerprint": "fp-buffered"},
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 202, resp.text
+    scan_id = resp.json()["scan_event_id"]
+    assert buffered_mode.stats()["queue_depth"] == 1
+
+    listed = client.get("/api/scan-events/", headers=scanner_headers).json()
+    assert scan_id not in {s["scan_event_id"] for s in listed}
+
+    assert buffered_mode.flush() == 1
+    listed = client.get("/api/scan-events/", headers=scanner_headers).json()
+    assert scan_id in {s["scan_event_id"] for s in listed}
+
+    stats = client.get("/api/healthz/stats").json()["scan_buffer"]
+    assert stats["queue_depth"] == 0
+    assert stats["flushed"] >= 1
+    # the endpoint is public: counters only, no filesystem paths
+    assert "dead_letter_file" not in stats
+
+
+def test_shutdown_persists_reach_of_buffered_scans(scanner_headers, campaign_id, buffered_mode, monkeypatch):
+    import asyncio
+    from uuid import UUID
+
+    from festserve_api import main, models, reach
+    from festserve_api.hll import HyperLogLog
+
+    monkeypatch.setattr(reach, "SessionLocal", TestingSessionLocal)
+    resp = client.post(
+        "/api/scan-events/",
+        json={"campaign_id": campaign_id, "device_fingerprint": "fp-shutdown"},
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 202, resp.text
+
+    asyncio.run(main.shutdown_background_work())
+    assert buffered_mode.stats()["queue_depth"] == 0
+    assert reach.reach_tracker.stats()["pending_keys"] == 0
+    db = TestingSessionLocal()
+    try:
+        row = db.get(models.CampaignReach, UUID(campaign_id))
+        assert row is not None and HyperLogLog.from_bytes(row.sketch).estimate() >= 1
+    finally:
+        db.close()
+
+
+def test_buffered_scan_backpressure(scanner_headers, campaign_id, buffered_mode):
+    buffered_mode.max_size = 1
+    first = client.post(
+        "/api/scan-events/", json={"campaign_id": campaign_id}, headers=scanner_headers
+    )
+    assert first.status_code == 202
+    second = client.post(
+        "/api/scan-events/", json={"campaign_id": campaign_id}, headers=scanner_headers
+    )
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == "1"
+
+
+def _buffer_row(campaign_id, **overrides):
+    from datetime import datetime
+
+    from festserve_api import models
+
+    db = TestingSessionLocal()
+    scanner_id = db.query(models.ScannerUser.user_id).filter_by(username="scanner1").scalar()
+    db.close()
+    row = {
+        "scan_event_id": uuid.uuid4(),
+        "campaign_id": uuid.UUID(campaign_id),
+        "scanner_user_id": scanner_id,
+        "scanned_at": datetime(2025, 1, 3, 12, 0, 0),
+        "device_fingerprint": None,
+    }
+    return {**row, **overrides}
+
+
+def test_buffer_dead_letters_rows_the_database_refuses(campaign_id, tmp_path):
+    import json
+
+    from festserve_api.scan_buffer import ScanBuffer
+
+    buffer = ScanBuffer(session_factory=TestingSessionLocal, dead_letter_file=str(tmp_path / "dead.jsonl"))
+    good = [_buffer_row(campaign_id) for _ in range(3)]
+    bad = _buffer_row(campaign_id, scanned_at=None)  # NOT NULL violation
+    for row in (good[0], bad, good[1], good[2]):
+        assert buffer.put(row)
+
+    assert buffer.flush() == 3
+    stats = buffer.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["dead_lettered"] == 1
+    dead = [json.loads(line) for line in open(tmp_path / "dead.jsonl")]
+    assert [d["scan_event_id"] for d in dead] == [str(bad["scan_event_id"])]
+
+    # later flushes are not blocked by the bad row
+    assert buffer.put(_buffer_row(campaign_id))
+    assert buffer.flush() == 1
+
+
+def test_buffer_keeps_rows_while_the_database_is_down_and_dead_letters_at_shutdown(campaign_id, tmp_path):
+    from sqlalchemy.exc import OperationalError
+
+    from festserve_api.scan_buffer import ScanBuffer
+
+    def unavailable():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    buffer = ScanBuffer(session_factory=unavailable, dead_letter_file=str(tmp_path / "dead.jsonl"))
+    for _ in range(3):
+        buffer.put(_buffer_row(campaign_id))
+    assert buffer.flush() == 0
+    assert buffer.stats()["queue_depth"] == 3
+    assert buffer.stats()["dead_lettered"] == 0
+
+    buffer.stop()
+    stats = buffer.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["dropped_at_shutdown"] == 3
+    assert len(open(tmp_path / "dead.jsonl").readlines()) == 3
+
+
+def test_retried_client_scan_id_returns_original(scanner_headers, campaign_id):
+    advertiser_headers = _token("adv@example.com", "advpassword123", "advertiser")
+    count_url = f"/api/campaigns/{campaign_id}/scans/count"
+    before = client.get(count_url, headers=advertiser_headers).json()["total_scans"]
+
+    scan = {"campaign_id": campaign_id, "scan_event_id": str(uuid.uuid4())}
+    first = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    assert first.status_code == 201, first.text
+    retry = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    assert retry.status_code == 200, retry.text
+    assert retry.json() == first.json()
+
+    after = client.get(count_url, headers=advertiser_headers).json()["total_scans"]
+    assert after == before + 1
+
+
+def test_retried_client_scan_id_is_found_before_reserving_a_unit(scanner_headers, campaign_id):
+    # On Postgres the key is (scan_event_id, scanned_at), so a retry whose
+    # scanned_at defaults to a later server time must be caught up front
+    from sqlalchemy import event
+
+    scan = {"campaign_id": campaign_id, "scan_event_id": str(uuid.uuid4())}
+    first = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    assert first.status_code == 201, first.text
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine_test.sync_engine, "before_cursor_execute", record)
+    try:
+        retry = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    finally:
+        event.remove(async_engine_test.sync_engine, "before_cursor_execute", record)
+    assert retry.status_code == 200, retry.text
+    assert retry.json() == first.json()
+    assert not [s for s in statements if s.lstrip().upper().startswith(("UPDATE", "INSERT"))]
+
+
+def test_offline_sync_keeps_timestamps_and_skips_replays(scanner_headers, campaign_id):
+    backlog = [
+        {
+            "campaign_id": campaign_id,
+            "scan_event_id": str(uuid.uuid4()),
+            "scanned_at": f"2025-01-03T10:00:0{i}",
+            "device_fingerprint": f"offline-{i}",
+        }
+        for i in range(3)
+    ]
+    first = client.post("/api/scan-events/batch", json=backlog[:2], headers=scanner_headers)
+    assert [r["status"] for r in first.json()] == ["accepted", "accepted"]
+
+    # the device retries the whole backlog after the connection dropped
+    sync = client.post("/api/scan-events/batch", json=backlog, headers=scanner_headers)
+    assert sync.status_code == 200, sync.text
+    assert [r["status"] for r in sync.json()] == ["duplicate", "duplicate", "accepted"]
+    assert [r["scan_event_id"] for r in sync.json()] == [s["scan_event_id"] for s in backlog]
+
+    listed = {
+        s["scan_event_id"]: s
+        for s in client.get("/api/scan-events/", headers=scanner_headers).json()
+    }
+    for scan in backlog:
+        assert listed[scan["scan_event_id"]]["scanned_at"] == scan["scanned_at"]
+
+
+def test_batch_rejects_client_ids_used_by_another_scanner(scanner_headers, campaign_id):
+    from festserve_api import models
+    from festserve_api.create_users import pwd_ctx
+
+    db = TestingSessionLocal()
+    try:
+        db.add(
+            models.ScannerUser(
+                username="scanner2",
+                password_hash=pwd_ctx.hash("scanpassword456"),
+                assigned_stall_id=None,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+    other_headers = _token("scanner2", "scanpassword456", "scanner")
+    scan = {"campaign_id": campaign_id, "scan_event_id": str(uuid.uuid4())}
+    assert client.post("/api/scan-events/batch", json=[scan], headers=scanner_headers).json()[0][
+        "status"
+    ] == "accepted"
+
+    # same id from another scanner is a conflict, as on the single-scan route
+    clash = client.post("/api/scan-events/batch", json=[scan], headers=other_headers).json()
+    assert clash == [
+        {"index": 0, "status": "rejected", "scan_event_id": None, "reason": "Scan id already used"}
+    ]
+    assert client.post("/api/scan-events/", json=scan, headers=other_headers).status_code == 409
+
+
+def test_future_scanned_at_is_rejected(scanner_headers, campaign_id):
+    resp = client.post(
+        "/api/scan-events/",
+        json={"campaign_id": campaign_id, "scanned_at": "2999-01-01T00:00:00"},
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 422
+
+
+@pytest.fixture(scope="module")
+def dedupe_campaign_id():
+    stall_id = client.post(
+        "/api/stalls/",
+        json={"location_name": "Gate B", "latitude": 0.0, "longitude": 0.0, "date": "2025-01-01"},
+    ).json()["stall_id"]
+    product_id = client.post(
+        "/api/products/", json={"name": "Sample", "description": "desc"}
+    ).json()["product_id"]
+    headers = _token("adv@example.com", "advpassword123", "advertiser")
+    resp = client.post(
+        "/api/campaigns/",
+        json={
+            "stall_id": stall_id,
+            "product_id": product_id,
+            "units_allocated": 100,
+            "start_datetime": "2025-01-02T00:00:00",
+            "end_datetime": "2025-01-10T00:00:00",
+            "dedupe_window_minutes": 10,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 201, resp.text
+    assert resp.json()["dedupe_window_minutes"] == 10
+    return resp.json()["campaign_id"]
+
+
+def test_dedupe_window_refuses_repeat_scans(scanner_headers, dedupe_campaign_id):
+    from festserve_api.dedupe import dedupe_cache
+
+    scan = {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-1"}
+    assert client.post("/api/scan-events/", json=scan, headers=scanner_headers).status_code == 201
+
+    hits_before = dedupe_cache.stats()["hits"]
+    repeat = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    assert repeat.status_code == 409
+    assert repeat.json()["detail"] == "Duplicate scan"
+    assert dedupe_cache.stats()["hits"] == hits_before + 1
+
+    # after a restart the DB still enforces the window
+    dedupe_cache.clear()
+    db_before = dedupe_cache.stats()["db_duplicates"]
+    repeat = client.post("/api/scan-events/", json=scan, headers=scanner_headers)
+    assert repeat.status_code == 409
+    assert dedupe_cache.stats()["db_duplicates"] == db_before + 1
+
+    other = {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-2"}
+    assert client.post("/api/scan-events/", json=other, headers=scanner_headers).status_code == 201
+
+    # outside the window the same device is accepted again
+    later = dict(scan, scanned_at="2025-01-03T12:00:00")
+    assert client.post("/api/scan-events/", json=later, headers=scanner_headers).status_code == 201
+
+
+def test_dedupe_window_in_batch(scanner_headers, dedupe_campaign_id):
+    resp = client.post(
+        "/api/scan-events/batch",
+        json=[
+            {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-3", "scanned_at": "2025-01-04T10:00:00"},
+            {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-3", "scanned_at": "2025-01-04T10:05:00"},
+            {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-3", "scanned_at": "2025-01-04T10:20:00"},
+        ],
+        headers=scanner_headers,
+    )
+    assert resp.status_code == 200, resp.text
+    assert [r["status"] for r in resp.json()] == ["accepted", "rejected", "accepted"]
+    assert resp.json()[1]["reason"] == "Duplicate scan"
+
+
+def test_dedupe_window_must_be_positive(dedupe_campaign_id):
+    advertiser_headers = _token("adv@example.com", "advpassword123", "advertiser")
+    for minutes in (-5, 0, 10**9):
+        resp = client.put(
+            f"/api/campaigns/{dedupe_campaign_id}",
+            json={"dedupe_window_minutes": minutes},
+            headers=advertiser_headers,
+        )
+        assert resp.status_code == 422, minutes
+    campaign = client.get(f"/api/campaigns/{dedupe_campaign_id}", headers=advertiser_headers)
+    assert campaign.json()["dedupe_window_minutes"] == 10
+
+    create = client.post(
+        "/api/campaigns/",
+        json={
+            "stall_id": str(uuid.uuid4()),
+            "product_id": str(uuid.uuid4()),
+            "units_allocated": 1,
+            "start_datetime": "2025-01-02T00:00:00",
+            "end_datetime": "2025-01-10T00:00:00",
+            "dedupe_window_minutes": 0,
+        },
+        headers=advertiser_headers,
+    )
+    assert create.status_code == 422
+
+
+def test_changing_the_dedupe_window_applies_to_cached_scans(scanner_headers, dedupe_campaign_id):
+    advertiser_headers = _token("adv@example.com", "advpassword123", "advertiser")
+    scan = {"campaign_id": dedupe_campaign_id, "device_fingerprint": "phone-window"}
+    assert client.post("/api/scan-events/", json=scan, headers=scanner_headers).status_code == 201
+    assert client.post("/api/scan-events/", json=scan, headers=scanner_headers).status_code == 409
+
+    resp = client.put(
+        f"/api/campaigns/{dedupe_campaign_id}",
+        json={"dedupe_window_minutes": None},
+        headers=advertiser_headers,
+    )
+    assert resp.status_code == 200, resp.text
+    assert client.post("/api/scan-events/", json=scan, headers=scanner_headers).status_code == 201
+
+
+def test_dedupe_cache_entries_expire():
+    from datetime import datetime, timedelta
+
+    from festserve_api.dedupe import DedupeCache
+
+    cache = DedupeCache(ttl=0)
+    now = datetime(2025, 1, 2)
+    cache.record("campaign", "phone", now, timedelta(minutes=10))
+    assert not cache.seen_recently("campaign", "phone", now)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from festserve_api import scheduler
+from festserve_api.scheduler import JobRunner, LeaderLock
+
+engine = create_engine("sqlite://")
+
+
+def test_only_one_worker_leads(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first, second = LeaderLock(engine, path=path), LeaderLock(engine, path=path)
+    assert first.acquire()
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_jobs_run_only_on_the_leader_and_record_stats(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    leader, follower = JobRunner(LeaderLock(engine, path=path)), JobRunner(LeaderLock(engine, path=path))
+    calls = []
+
+    def snapshot_job():
+        calls.append(1)
+        return 3
+
+    def broken_job():
+        raise RuntimeError("boom")
+
+    for runner in (leader, follower):
+        runner.add_job(snapshot_job, minute=0)
+        runner.add_job(broken_job, minute=0)
+
+    leader.run("snapshot_job")
+    follower.run("snapshot_job")
+    leader.run("broken_job")
+    assert calls == [1]
+
+    stats = leader.stats()
+    assert stats["leader"] is True
+    assert stats["jobs"]["snapshot_job"]["runs"] == 1
+    assert stats["jobs"]["snapshot_job"]["last_result"] == 3
+    assert stats["jobs"]["snapshot_job"]["last_duration_seconds"] >= 0
+    assert stats["jobs"]["broken_job"]["failures"] == 1
+    assert "boom" in stats["jobs"]["broken_job"]["last_error"]
+    assert follower.stats()["jobs"]["snapshot_job"]["skipped_not_leader"] == 1
+    leader.stop()
+
+
+def test_jobs_not_leader_only_run_on_every_worker(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    leader, follower = JobRunner(LeaderLock(engine, path=path)), JobRunner(LeaderLock(engine, path=path))
+    calls = []
+
+    def flush_job():
+        calls.append(1)
+
+    for runner in (leader, follower):
+        runner.add_job(flush_job, leader_only=False, minute="*/5")
+    assert leader.leader.acquire()
+
+    follower.run("flush_job")
+    leader.run("flush_job")
+    assert calls == [1, 1]
+    assert follower.stats()["jobs"]["flush_job"]["skipped_not_leader"] == 0
+    assert follower.stats()["leader"] is False
+    leader.stop()
+
+
+def test_stop_shuts_down_the_running_scheduler(tmp_path):
+    runner = JobRunner(LeaderLock(engine, path=str(tmp_path / "scheduler.lock")))
+    runner.add_job(lambda: None, minute=0)
+
+    async def scenario():
+        runner.start()
+        scheduler = runner.scheduler
+        assert scheduler.running
+        runner.stop()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert not scheduler.running
+    assert runner.stats()["running"] is False
+
+
+def test_advisory_lock_needs_a_session_connection(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_DATABASE_URL", None)
+    monkeypatch.setenv("DB_POOL_PROFILE", "pgbouncer")
+    lock = scheduler.leader_lock_from_env()
+    assert lock.bind is scheduler.engine and not lock.session_locks
+
+    # behind a transaction-mode pooler nobody leads, instead of everybody
+    pooled = LeaderLock(create_engine("postgresql://festserve@db/festserve"), session_locks=False)
+    assert not pooled.acquire()
+    assert not pooled.held
+
+    monkeypatch.setattr(scheduler, "SCHEDULER_DATABASE_URL", "postgresql://festserve@db-direct/festserve")
+    lock = scheduler.leader_lock_from_env()
+    assert lock.session_locks
+    assert lock.bind.url.host == "db-direct"
+    assert isinstance(lock.bind.pool, NullPool)